@@ -1,7 +1,21 @@
 import openai
+import contextlib
 import logging
 from datetime import datetime
 
+try:
+    from github_pr_mcp_server.triage import local_summary
+    from github_pr_mcp_server.model_routing import TIER_MODELS, plan_model
+    from github_pr_mcp_server.core import CHUNK_MAX_TOKENS, CHUNK_SYSTEM_PROMPT, prepare_diff_chunks
+    from github_pr_mcp_server import metrics, tracing
+except ImportError:  # 未安装 github_pr_mcp_server 包时所有 PR 都交给 gpt-4 单次总结，不记录指标和追踪
+    local_summary = None
+    plan_model = None
+    metrics = None
+    tracing = None
+
+SYSTEM_PROMPT = "你是一个专业的开发日记记录员，负责将 GitHub PR 信息转换为简洁的日记格式。请用中文简体记录，格式为：'今天 [作者] 提交了一个 PR，主要完成了 [总结]...'"
+
 class AISummarizer:
     """
     AI 总结器，使用 OpenAI API 来总结 PR 内容
@@ -21,38 +35,47 @@ class AISummarizer:
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
     
-    def summarize_pr(self, pr_info):
+    def summarize_pr(self, pr_info, model=None, repository=''):
         """
         总结 PR 内容
         
         Args:
             pr_info (dict): PR 信息
+            model (str): 使用的模型，默认按 PR 规模选择（见 _select_plan）
+            repository (str): 仓库全名，用于指标标签
             
         Returns:
             str: 总结文本
         """
+        # 文档、依赖升级、拼写修正等简单 PR 直接用本地模板总结
+        local = self._local_summary(pr_info)
+        if local:
+            return local
+        
         try:
-            # 构建提示词
+            plan = self._select_plan(pr_info)
+            
+            # 构建提示词；大 PR 先分块提取差异要点
             prompt = self._build_prompt(pr_info)
+            if plan is not None and plan.strategy == 'chunked':
+                prompt += self._chunk_notes(pr_info, repository)
             
             # 调用 OpenAI API
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
+            summary = self._complete(
+                model or (plan.model if plan is not None else "gpt-4"),
+                [
                     {
                         "role": "system",
-                        "content": "你是一个专业的开发日记记录员，负责将 GitHub PR 信息转换为简洁的日记格式。请用中文简体记录，格式为：'今天 [作者] 提交了一个 PR，主要完成了 [总结]...'"
+                        "content": SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
                         "content": prompt
                     }
                 ],
-                max_tokens=500,
-                temperature=0.7
+                plan.max_tokens if plan is not None else 500,
+                repository
             )
-            
-            summary = response.choices[0].message.content.strip()
             self.logger.info(f"AI 总结完成，长度: {len(summary)} 字符")
             
             return summary
@@ -83,6 +106,12 @@ class AISummarizer:
             if len(pr_info['changed_files_list']) > 10:
                 files_text += f"\n... 还有 {len(pr_info['changed_files_list']) - 10} 个文件"
         
+        # 变更的函数、类和方法（由 GitHubWebhookHandler 根据差异提取）
+        if pr_info.get('changed_symbols'):
+            files_text += "\n变更的函数/类/方法：\n" + "\n".join(pr_info['changed_symbols'][:20])
+            if len(pr_info['changed_symbols']) > 20:
+                files_text += f"\n... 还有 {len(pr_info['changed_symbols']) - 20} 个文件"
+        
         prompt = f"""
 请根据以下 GitHub PR 信息，生成一段简洁的开发日记：
 
@@ -103,12 +132,106 @@ PR 链接：{pr_info['url']}{files_text}
  2. 语言自然流畅
  3. 突出主要工作内容
  4. 包含作者和 PR 编号信息
- 5. 如果有重要文件修改，可以简要提及
+ 5. 如果有重要文件或函数修改，可以简要提及
  6. 长度控制在 100-200 字之间
 """
         
         return prompt
     
+    def _complete(self, model, messages, max_tokens, repository=''):
+        """
+        调用一次 OpenAI API，并记录耗时、token 用量和追踪 span（本地总结不经过这里）
+        
+        Args:
+            model (str): 模型名称
+            messages (list): 对话消息
+            max_tokens (int): 最大输出 token 数
+            repository (str): 仓库全名，用于指标标签
+            
+        Returns:
+            str: 回复文本
+        """
+        with contextlib.ExitStack() as stack:
+            if metrics is not None:
+                stack.enter_context(metrics.LLM_SECONDS.time(repository=repository, model=model))
+                llm_span = stack.enter_context(tracing.span('llm_call', model=model))
+            response = openai.ChatCompletion.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=0.7
+            )
+        usage = response.get('usage') if metrics is not None else None
+        if usage:
+            llm_span.set_attribute('prompt_tokens', usage['prompt_tokens'])
+            llm_span.set_attribute('completion_tokens', usage['completion_tokens'])
+            metrics.TOKENS_TOTAL.inc(usage['prompt_tokens'], repository=repository, model=model, kind='prompt')
+            metrics.TOKENS_TOTAL.inc(usage['completion_tokens'], repository=repository, model=model, kind='completion')
+        return response.choices[0].message.content.strip()
+    
+    def _chunk_notes(self, pr_info, repository=''):
+        """
+        分块摘要：按文件把差异分块，逐块用 fast 档位提取变更要点
+        
+        Args:
+            pr_info (dict): PR 信息，需要包含 diff_content
+            repository (str): 仓库全名，用于指标标签
+            
+        Returns:
+            str: 追加到提示词的各部分变更要点；没有差异时为空
+        """
+        preamble, chunks = prepare_diff_chunks(pr_info.get('diff_content', ''))
+        notes = []
+        for index, chunk in enumerate(chunks):
+            note = self._complete(TIER_MODELS['fast'], [
+                {"role": "system", "content": CHUNK_SYSTEM_PROMPT},
+                {"role": "user", "content": f"第 {index + 1}/{len(chunks)} 部分：\n\n{chunk}"}
+            ], CHUNK_MAX_TOKENS, repository)
+            notes.append(f"第 {index + 1} 部分：\n{note}")
+        if not notes:
+            return ""
+        self.logger.info(f"分块摘要完成，共 {len(notes)} 块")
+        return (f"\n\n{preamble}" if preamble else "") + "\n\n各部分变更要点：\n" + "\n\n".join(notes)
+    
+    def _select_plan(self, pr_info):
+        """
+        按 PR 的增删行数、文件数和差异特征选择模型、max_tokens 和摘要策略
+        
+        Args:
+            pr_info (dict): PR 信息
+            
+        Returns:
+            ModelPlan: 模型选择；未安装 github_pr_mcp_server 包时返回 None（使用 gpt-4 单次调用）
+        """
+        if plan_model is None:
+            return None
+        plan = plan_model(pr_info, pr_info.get('diff_content', ''))
+        self.logger.info(f"选择模型 {plan.model}（{plan.tier}，{plan.strategy}）: {'，'.join(plan.reasons)}")
+        return plan
+    
+    def _local_summary(self, pr_info):
+        """
+        简单 PR 的本地总结（不调用 AI）
+        
+        Args:
+            pr_info (dict): PR 信息，需要包含 diff_content
+            
+        Returns:
+            str: 总结文本；需要 AI 总结时返回 None
+        """
+        if local_summary is None or not pr_info.get('diff_content'):
+            return None
+        try:
+            local = local_summary(pr_info['diff_content'], pr_info)
+        except Exception as e:
+            self.logger.error(f"本地总结失败: {str(e)}")
+            return None
+        if local is None:
+            return None
+        kind, summary = local
+        self.logger.info(f"识别为简单 PR（{kind}），跳过 AI 总结")
+        return f"今天 {pr_info['author']} 提交了一个 PR (#{pr_info['number']})：{pr_info['title']}。\n\n{summary}"
+    
     def _fallback_summary(self, pr_info):
         """
         备用总结方法（当 AI API 调用失败时使用）
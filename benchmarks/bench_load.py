@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+GitHub PR MCP Server 端到端负载基准
+
+启动 GitHub / OpenAI / 飞书的本地替身服务和被测的 Flask 服务器，
+以目标速率向 /webhook/github 发送带签名的 pull_request 事件，
+统计吞吐量以及各阶段的 p50/p95/p99 延迟。
+
+用法:
+  python benchmarks/bench_load.py --rate 20 --duration 30
+  python benchmarks/bench_load.py --openai-latency lognormal:800,0.4 --openai-error-rate 0.05
+  python benchmarks/bench_load.py --workers 4 --report load.json
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List
+
+import requests
+
+from bench_startup import ROOT, child_env, free_port
+from stubs import GitHubStub, OpenAIStub, FeishuStub
+
+
+WEBHOOK_SECRET = 'bench-secret'
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近秩法计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    """耗时列表（秒）转为毫秒统计"""
+    return {
+        'count': len(values),
+        'p50_ms': percentile(values, 50) * 1000,
+        'p95_ms': percentile(values, 95) * 1000,
+        'p99_ms': percentile(values, 99) * 1000,
+    }
+
+
+def build_payload(number: int, github_url: str) -> Dict[str, Any]:
+    """构造一个 pull_request opened 事件载荷"""
+    return {
+        'action': 'opened',
+        'number': number,
+        'pull_request': {
+            'number': number,
+            'title': f'基准测试 PR #{number}',
+            'body': '负载基准自动生成',
+            'html_url': f'https://github.com/bench/repo/pull/{number}',
+            'diff_url': f'{github_url}/repos/bench/repo/pulls/{number}.diff',
+            'user': {'login': 'bench-bot'},
+            'additions': 120,
+            'deletions': 10,
+            'changed_files': 3,
+        },
+        'repository': {'full_name': 'bench/repo'},
+    }
+
+
+def sign(body: bytes, secret: str) -> str:
+    """计算 X-Hub-Signature-256"""
+    return 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def start_server(port: int, github: GitHubStub, openai_stub: OpenAIStub,
+                 feishu: FeishuStub, workers: int) -> subprocess.Popen:
+    """启动被测的 Flask MCP 服务器，并把上游地址指向替身服务"""
+    env = child_env({
+        'MCP_SERVER_TYPE': 'flask',
+        'WEBHOOK_PORT': str(port),
+        'WEBHOOK_SECRET': WEBHOOK_SECRET,
+        'OPENAI_API_KEY': 'sk-bench',
+        'OPENAI_BASE_URL': f'{openai_stub.url}/v1',
+        'FEISHU_WEBHOOK_URL': f'{feishu.url}/hook',
+        'GITHUB_TOKEN': 'bench-token',
+        'GITHUB_API_URL': github.url,
+        'MCP_WORKERS': str(workers),
+        'MCP_QUEUE_PATH': os.path.join(tempfile.mkdtemp(prefix='mcp-bench-'), 'jobs.sqlite3'),
+    })
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'github_pr_mcp_server'],
+        env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/health', timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("被测服务器未能在 60 秒内就绪")
+
+
+def drive(target: str, github_url: str, rate: float, duration: float,
+          concurrency: int) -> Dict[str, Any]:
+    """
+    以固定速率（开环）发送 Webhook 事件
+
+    Args:
+        target: Webhook 地址
+        github_url: GitHub 替身地址，写入载荷的 diff_url
+        rate: 每秒事件数
+        duration: 持续时间（秒）
+        concurrency: 最大并发请求数
+
+    Returns:
+        请求耗时和状态码统计
+    """
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+    session = requests.Session()
+
+    def send(number: int):
+        body = json.dumps(build_payload(number, github_url)).encode()
+        headers = {
+            'Content-Type': 'application/json',
+            'X-GitHub-Event': 'pull_request',
+            'X-Hub-Signature-256': sign(body, WEBHOOK_SECRET),
+        }
+        start = time.perf_counter()
+        try:
+            status = str(session.post(target, data=body, headers=headers, timeout=120).status_code)
+        except requests.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    total = int(rate * duration)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for number in range(1, total + 1):
+            # 按计划时间发送，不因响应变慢而降低发送速率
+            delay = start + (number - 1) / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, number)
+    return {'sent': total, 'elapsed': time.perf_counter() - start,
+            'latencies': latencies, 'statuses': statuses}
+
+
+def wait_for_drain(feishu: FeishuStub, expected: int, timeout: float):
+    """等待飞书替身收到全部通知（工作进程模式下 Webhook 只负责入队）"""
+    deadline = time.time() + timeout
+    while time.time() < deadline and len(feishu.timings) < expected:
+        time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端负载基准")
+    parser.add_argument('--rate', type=float, default=10, help="每秒发送的事件数")
+    parser.add_argument('--duration', type=float, default=10, help="发送持续时间（秒）")
+    parser.add_argument('--concurrency', type=int, default=64, help="最大并发请求数")
+    parser.add_argument('--workers', type=int, default=0, help="被测服务器的 MCP_WORKERS")
+    parser.add_argument('--target', help="使用已运行的服务器（跳过启动），如 http://host:5000/webhook/github")
+    parser.add_argument('--drain-timeout', type=float, default=120, help="等待全部通知送达的最长时间")
+    for name, default in (('github', 'fixed:20'), ('openai', 'lognormal:300,0.5'), ('feishu', 'fixed:20')):
+        parser.add_argument(f'--{name}-latency', default=default, help=f"{name} 替身延迟分布")
+        parser.add_argument(f'--{name}-error-rate', type=float, default=0.0, help=f"{name} 替身错误率")
+    parser.add_argument('--report', type=Path, help="将报告写入 JSON 文件")
+    args = parser.parse_args()
+
+    github = GitHubStub(args.github_latency, args.github_error_rate).start()
+    openai_stub = OpenAIStub(args.openai_latency, args.openai_error_rate).start()
+    feishu = FeishuStub(args.feishu_latency, args.feishu_error_rate).start()
+
+    process = None
+    try:
+        target = args.target
+        if not target:
+            port = free_port()
+            process = start_server(port, github, openai_stub, feishu, args.workers)
+            target = f'http://127.0.0.1:{port}/webhook/github'
+
+        print(f"🚀 以 {args.rate}/s 的速率发送 {args.duration}s 到 {target}")
+        bench_start = time.perf_counter()
+        result = drive(target, github.url, args.rate, args.duration, args.concurrency)
+        if args.workers:
+            wait_for_drain(feishu, result['sent'], args.drain_timeout)
+        wall_seconds = time.perf_counter() - bench_start
+
+        report = {
+            'config': {k: v for k, v in vars(args).items() if k != 'report'},
+            'sent': result['sent'],
+            'statuses': result['statuses'],
+            'notifications': len(feishu.timings),
+            'wall_seconds': wall_seconds,
+            'throughput_per_s': len(feishu.timings) / max(wall_seconds, 1e-9),
+            'stages': {
+                'webhook_request': summarize(result['latencies']),
+                'github_diff': summarize(github.timings),
+                'openai_chat': summarize(openai_stub.timings),
+                'feishu_send': summarize(feishu.timings),
+            },
+            'upstream_statuses': {
+                'github': github.status_counts,
+                'openai': openai_stub.status_counts,
+                'feishu': feishu.status_counts,
+            },
+        }
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+        for stub in (github, openai_stub, feishu):
+            stub.stop()
+
+    print(f"📨 发送: {report['sent']}  状态: {report['statuses']}")
+    print(f"📬 飞书通知: {report['notifications']}  吞吐量: {report['throughput_per_s']:.2f}/s")
+    print(f"{'阶段':<18}{'次数':>8}{'p50(ms)':>12}{'p95(ms)':>12}{'p99(ms)':>12}")
+    for stage, stats in report['stages'].items():
+        print(f"{stage:<18}{stats['count']:>8}{stats['p50_ms']:>12.1f}{stats['p95_ms']:>12.1f}{stats['p99_ms']:>12.1f}")
+
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+GitHub PR MCP Server CPU 热路径微基准
+
+对签名校验、载荷解析、飞书文档构建、飞书消息格式化、提示词构建和
+差异预处理等每个事件都要付出的 CPU 开销，分别在 small / median / huge
+三档 PR 样本上计时。结果追加到 JSON 历史文件，compare 子命令会标出
+超过阈值的回归。
+
+用法:
+  python benchmarks/bench_micro.py run                    # 运行并追加到历史
+  python benchmarks/bench_micro.py run -k feishu --rounds 11
+  python benchmarks/bench_micro.py compare --threshold 0.15
+  python benchmarks/bench_micro.py compare --baseline 0    # 与第一条记录比较
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / 'src'), str(ROOT)]
+
+from fixtures import SIZES, make_diff, make_payload, make_legacy_pr_info  # noqa: E402
+from github_pr_mcp_server.core import (  # noqa: E402
+    verify_webhook_signature,
+    extract_pr_info,
+    format_feishu_message,
+    prepare_diff_for_prompt,
+)
+from feishu_handler import FeishuHandler  # noqa: E402
+from ai_summarizer import AISummarizer  # noqa: E402
+
+
+HISTORY_PATH = Path(__file__).resolve().parent / 'micro_history.json'
+SECRET = 'bench-secret'
+
+
+def build_cases() -> List[Tuple[str, Callable[[], Any]]]:
+    """构建 (名称, 无参调用) 列表；样本在计时之外准备"""
+    feishu = FeishuHandler(token='bench', url='http://127.0.0.1/unused')
+    summarizer = AISummarizer(api_key='bench')
+    summary = '今天 octocat 提交了一个 PR，主要重构了数据处理流水线。' * 5
+
+    cases = []
+    for size, spec in SIZES.items():
+        payload = make_payload(size)
+        body = json.dumps(payload).encode()
+        signature = 'sha256=' + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+        pr_info = extract_pr_info(payload)
+        legacy_pr_info = make_legacy_pr_info(size)
+        diff = make_diff(spec['files'], spec['lines'])
+
+        cases.extend([
+            (f'verify_webhook_signature[{size}]',
+             lambda b=body, s=signature: verify_webhook_signature(b, s, SECRET)),
+            (f'extract_pr_info[{size}]',
+             lambda b=body: extract_pr_info(json.loads(b))),
+            (f'feishu_build_document_content[{size}]',
+             lambda p=legacy_pr_info: feishu._build_document_content(summary, p)),
+            (f'format_feishu_message[{size}]',
+             lambda p=pr_info: format_feishu_message(p, summary)),
+            (f'ai_build_prompt[{size}]',
+             lambda p=legacy_pr_info: summarizer._build_prompt(p)),
+            (f'prepare_diff_for_prompt[{size}]',
+             lambda d=diff: prepare_diff_for_prompt(d)),
+        ])
+    return cases
+
+
+def time_case(func: Callable[[], Any], rounds: int, min_round_seconds: float) -> Dict[str, Any]:
+    """
+    自动校准每轮调用次数后计时
+
+    Returns:
+        单次调用耗时统计（微秒）
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        if time.perf_counter() - start >= min_round_seconds or loops >= 1_000_000:
+            break
+        loops *= 2
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops * 1e6)
+
+    return {
+        'median_us': statistics.median(samples),
+        'min_us': min(samples),
+        'stdev_us': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'loops': loops,
+        'rounds': rounds,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def load_history(path: Path) -> List[Dict[str, Any]]:
+    return json.loads(path.read_text()) if path.exists() else []
+
+
+def cmd_run(args):
+    results = {}
+    for name, func in build_cases():
+        if args.k and args.k not in name:
+            continue
+        results[name] = time_case(func, args.rounds, args.min_round_seconds)
+        print(f"{name:<45}{results[name]['median_us']:>14.2f} µs")
+
+    history = load_history(args.history)
+    history.append({
+        'timestamp': datetime.now().isoformat(),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    })
+    args.history.write_text(json.dumps(history, indent=2, ensure_ascii=False))
+    print(f"✅ 已追加到 {args.history}（共 {len(history)} 条记录）")
+
+
+def cmd_compare(args):
+    history = load_history(args.history)
+    if len(history) < 2:
+        print("⚠️ 历史记录不足两条，无法比较")
+        return
+
+    baseline, current = history[args.baseline], history[args.current]
+    print(f"基线 {baseline['commit'] or '?'} ({baseline['timestamp']}) → "
+          f"当前 {current['commit'] or '?'} ({current['timestamp']})")
+
+    regressions = []
+    for name, result in current['results'].items():
+        reference = baseline['results'].get(name)
+        if not reference:
+            continue
+        change = result['median_us'] / reference['median_us'] - 1
+        flag = '❌' if change > args.threshold else ('✅' if change < -args.threshold else '  ')
+        print(f"{flag} {name:<45}{reference['median_us']:>12.2f} → {result['median_us']:>12.2f} µs "
+              f"({change:+.1%})")
+        if change > args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"❌ {len(regressions)} 项回归超过 {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"✅ 没有超过 {args.threshold:.0%} 的回归")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU 热路径微基准")
+    parser.add_argument('--history', type=Path, default=HISTORY_PATH, help="JSON 历史文件")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="运行基准并追加到历史")
+    run_parser.add_argument('-k', help="只运行名称包含该字符串的基准")
+    run_parser.add_argument('--rounds', type=int, default=7, help="计时轮数")
+    run_parser.add_argument('--min-round-seconds', type=float, default=0.02, help="每轮最短耗时")
+    run_parser.set_defaults(func=cmd_run)
+
+    compare_parser = subparsers.add_parser('compare', help="比较两条历史记录")
+    compare_parser.add_argument('--baseline', type=int, default=-2, help="基线记录下标（默认倒数第二条）")
+    compare_parser.add_argument('--current', type=int, default=-1, help="当前记录下标（默认最后一条）")
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help="回归阈值（相对变化）")
+    compare_parser.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
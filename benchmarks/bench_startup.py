@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+GitHub PR MCP Server 启动与导入耗时基准
+
+对每种服务器类型记录：
+  - 从启动 `python -m github_pr_mcp_server` 到第一次健康检查成功的耗时
+  - `-X importtime` 解析出的各模块导入耗时
+  - 服务进程的峰值内存（RSS）
+
+并与存储的基线比较，超过阈值时以非零状态退出。
+
+用法:
+  python benchmarks/bench_startup.py                  # 运行并与基线比较
+  python benchmarks/bench_startup.py --update-baseline
+  python benchmarks/bench_startup.py --server-type flask --runs 5 --report report.json
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import requests
+
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).resolve().parent / "startup_baseline.json"
+
+# 各服务器类型的就绪检查路径和该模式会加载的导入
+SERVER_TYPES = {
+    'flask': {
+        'ready_path': '/health',
+        'port_env': 'WEBHOOK_PORT',
+        'import_stmt': 'import github_pr_mcp_server.cli; from github_pr_mcp_server.server import FlaskMCPServer',
+    },
+    'gradio': {
+        'ready_path': '/health',
+        'port_env': 'GRADIO_PORT',
+        'import_stmt': 'import github_pr_mcp_server.cli; from github_pr_mcp_server.server import GradioMCPServer; import gradio',
+    },
+}
+
+METRICS = ('ready_seconds', 'import_ms', 'peak_rss_mb')
+
+
+def child_env(extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """子进程环境：使用源码目录，避免读取真实凭据"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(ROOT / 'src'), env.get('PYTHONPATH', '')]))
+    for var in ('OPENAI_API_KEY', 'WEBHOOK_SECRET', 'FEISHU_WEBHOOK_URL', 'GITHUB_TOKEN'):
+        env.pop(var, None)
+    env.update(extra or {})
+    return env
+
+
+def free_port() -> int:
+    """获取一个空闲的本地端口"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """
+    解析 `-X importtime` 输出
+
+    Args:
+        stderr: 子进程标准错误输出
+
+    Returns:
+        每个模块的 self/cumulative 耗时（微秒），按 cumulative 降序
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            modules.append({
+                'module': name.strip(),
+                'depth': (len(name) - len(name.lstrip())) // 2,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+            })
+        except ValueError:
+            continue
+    return sorted(modules, key=lambda m: m['cumulative_us'], reverse=True)
+
+
+def measure_import(import_stmt: str) -> Dict[str, Any]:
+    """在全新解释器中测量导入耗时"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', import_stmt],
+        env=child_env(), capture_output=True, text=True, cwd=ROOT
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入失败: {result.stderr.strip().splitlines()[-1:]}")
+
+    modules = parse_importtime(result.stderr)
+    # 顶层模块（depth=0）的 cumulative 之和即总导入耗时
+    total_us = sum(m['cumulative_us'] for m in modules if m['depth'] == 0)
+    return {'import_ms': total_us / 1000, 'top_modules': modules[:20]}
+
+
+def _peak_rss_mb(pid: int) -> Optional[float]:
+    """读取进程峰值 RSS（仅 Linux）"""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def measure_startup(server_type: str, timeout: float = 120) -> Dict[str, Any]:
+    """启动服务器并测量到第一次健康检查成功的耗时和峰值内存"""
+    spec = SERVER_TYPES[server_type]
+    port = free_port()
+    env = child_env({'MCP_SERVER_TYPE': server_type, spec['port_env']: str(port)})
+    url = f"http://127.0.0.1:{port}{spec['ready_path']}"
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'github_pr_mcp_server'],
+        env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"服务器进程提前退出，返回码 {process.returncode}")
+            try:
+                if requests.get(url, timeout=1).status_code == 200:
+                    ready_seconds = time.perf_counter() - start
+                    return {'ready_seconds': ready_seconds, 'peak_rss_mb': _peak_rss_mb(process.pid)}
+            except requests.RequestException:
+                pass
+            time.sleep(0.05)
+        raise RuntimeError(f"{timeout} 秒内未就绪")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run_benchmark(server_type: str, runs: int) -> Dict[str, Any]:
+    """多次测量取中位数"""
+    spec = SERVER_TYPES[server_type]
+    imports = [measure_import(spec['import_stmt']) for _ in range(runs)]
+    startups = [measure_startup(server_type) for _ in range(runs)]
+
+    rss_values = [s['peak_rss_mb'] for s in startups if s['peak_rss_mb'] is not None]
+    return {
+        'ready_seconds': statistics.median(s['ready_seconds'] for s in startups),
+        'import_ms': statistics.median(i['import_ms'] for i in imports),
+        'peak_rss_mb': statistics.median(rss_values) if rss_values else None,
+        'top_modules': imports[-1]['top_modules'],
+    }
+
+
+def compare_with_baseline(server_type: str, result: Dict[str, Any],
+                          baseline: Dict[str, Any]) -> List[str]:
+    """返回超过阈值的指标说明"""
+    tolerance = baseline.get('tolerance', 0.2)
+    reference = baseline.get('servers', {}).get(server_type)
+    if not reference:
+        return []
+
+    regressions = []
+    for metric in METRICS:
+        current, expected = result.get(metric), reference.get(metric)
+        if current is None or expected is None:
+            continue
+        limit = expected * (1 + tolerance)
+        if current > limit:
+            regressions.append(f"{server_type}.{metric}: {current:.2f} > {limit:.2f} (基线 {expected:.2f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动与导入耗时基准")
+    parser.add_argument('--server-type', choices=sorted(SERVER_TYPES), action='append',
+                        help="要测量的服务器类型，可重复指定（默认全部）")
+    parser.add_argument('--runs', type=int, default=3, help="每项测量的次数（取中位数）")
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH, help="基线文件")
+    parser.add_argument('--update-baseline', action='store_true', help="用本次结果更新基线")
+    parser.add_argument('--report', type=Path, help="将完整报告写入 JSON 文件")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {'tolerance': 0.2, 'servers': {}}
+    report = {}
+    regressions = []
+
+    for server_type in args.server_type or sorted(SERVER_TYPES):
+        print(f"⏱️ 测量 {server_type} ...")
+        try:
+            result = run_benchmark(server_type, args.runs)
+        except Exception as e:
+            print(f"⚠️ 跳过 {server_type}: {e}")
+            continue
+
+        report[server_type] = result
+        rss = f"{result['peak_rss_mb']:.1f} MB" if result['peak_rss_mb'] is not None else "N/A"
+        print(f"   就绪耗时: {result['ready_seconds']:.2f} s")
+        print(f"   导入耗时: {result['import_ms']:.1f} ms")
+        print(f"   峰值内存: {rss}")
+        print("   导入耗时最高的模块:")
+        for module in result['top_modules'][:5]:
+            print(f"     {module['cumulative_us'] / 1000:8.1f} ms  {module['module']}")
+
+        regressions.extend(compare_with_baseline(server_type, result, baseline))
+
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.update_baseline:
+        for server_type, result in report.items():
+            baseline['servers'][server_type] = {metric: result[metric] for metric in METRICS}
+        args.baseline.write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + "\n")
+        print(f"✅ 基线已更新: {args.baseline}")
+        return
+
+    if regressions:
+        print("❌ 以下指标超过基线阈值:")
+        for line in regressions:
+            print(f"   - {line}")
+        sys.exit(1)
+    print("✅ 所有指标均在基线阈值内")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+基准测试用的 PR 样本
+
+按 small / median / huge 三档规模生成 Webhook 载荷、旧版处理器使用的
+pr_info 字典以及 unified diff。载荷结构仿照 GitHub 真实的 pull_request
+事件（包含完整的 head/base 仓库对象），以便反映解析真实载荷的开销。
+"""
+
+from typing import Dict, Any
+
+
+# 各档规模：修改文件数、每个文件的新增行数、PR 描述长度
+SIZES = {
+    'small': {'files': 2, 'lines': 10, 'body_chars': 200},
+    'median': {'files': 12, 'lines': 60, 'body_chars': 1500},
+    'huge': {'files': 400, 'lines': 200, 'body_chars': 20000},
+}
+
+
+def _user(login: str) -> Dict[str, Any]:
+    return {
+        'login': login,
+        'id': 1000,
+        'node_id': 'MDQ6VXNlcjEwMDA=',
+        'avatar_url': 'https://avatars.githubusercontent.com/u/1000?v=4',
+        'html_url': f'https://github.com/{login}',
+        'type': 'User',
+        'site_admin': False,
+        **{f'{name}_url': f'https://api.github.com/users/{login}/{name}'
+           for name in ('followers', 'following', 'gists', 'starred', 'subscriptions',
+                        'organizations', 'repos', 'events', 'received_events')},
+    }
+
+
+def _repository(full_name: str) -> Dict[str, Any]:
+    owner = full_name.split('/')[0]
+    api = f'https://api.github.com/repos/{full_name}'
+    return {
+        'id': 123456,
+        'node_id': 'MDEwOlJlcG9zaXRvcnkxMjM0NTY=',
+        'name': full_name.split('/')[1],
+        'full_name': full_name,
+        'private': False,
+        'owner': _user(owner),
+        'html_url': f'https://github.com/{full_name}',
+        'description': '基准测试仓库',
+        'fork': False,
+        'default_branch': 'main',
+        'stargazers_count': 4200,
+        'watchers_count': 4200,
+        'forks_count': 300,
+        'open_issues_count': 42,
+        'topics': ['mcp', 'github', 'benchmark'],
+        **{f'{name}_url': f'{api}/{name}'
+           for name in ('forks', 'keys', 'collaborators', 'teams', 'hooks', 'issue_events',
+                        'events', 'assignees', 'branches', 'tags', 'blobs', 'git_tags',
+                        'git_refs', 'trees', 'statuses', 'languages', 'stargazers',
+                        'contributors', 'subscribers', 'subscription', 'commits',
+                        'git_commits', 'comments', 'issue_comment', 'contents', 'compare',
+                        'merges', 'archive', 'downloads', 'issues', 'pulls', 'milestones',
+                        'notifications', 'labels', 'releases', 'deployments')},
+    }
+
+
+def make_diff(files: int, lines: int) -> str:
+    """生成 unified diff：每个文件包含新增、删除和上下文行"""
+    chunks = []
+    for index in range(files):
+        path = f'src/pkg_{index % 7}/module_{index}.py'
+        added = '\n'.join(f'+    result_{i} = transform(data, step={i})' for i in range(lines))
+        removed = '\n'.join(f'-    result_{i} = legacy(data)' for i in range(lines // 4))
+        chunks.append(
+            f'diff --git a/{path} b/{path}\n'
+            f'index 83db48f..f735c3e 100644\n'
+            f'--- a/{path}\n+++ b/{path}\n'
+            f'@@ -10,{lines // 4 + 6} +10,{lines + 6} @@ def process(data):\n'
+            f'     """处理数据"""\n     data = load(data)\n     validate(data)\n'
+            f'{removed}\n{added}\n'
+            f'     return data\n\n \n'
+        )
+    return ''.join(chunks)
+
+
+def make_payload(size: str, number: int = 4242) -> Dict[str, Any]:
+    """生成 pull_request opened 事件载荷"""
+    spec = SIZES[size]
+    full_name = 'bench-org/bench-repo'
+    body = ('本 PR 重构了数据处理流水线并补充测试。' * (spec['body_chars'] // 19 + 1))[:spec['body_chars']]
+    pr_url = f'https://github.com/{full_name}/pull/{number}'
+    branch = {
+        'label': 'bench-org:feature',
+        'ref': 'feature/refactor-pipeline',
+        'sha': '6dcb09b5b57875f334f61aebed695e2e4193db5e',
+        'user': _user('bench-org'),
+        'repo': _repository(full_name),
+    }
+    return {
+        'action': 'opened',
+        'number': number,
+        'pull_request': {
+            'url': f'https://api.github.com/repos/{full_name}/pulls/{number}',
+            'id': 1,
+            'html_url': pr_url,
+            'diff_url': f'{pr_url}.diff',
+            'patch_url': f'{pr_url}.patch',
+            'number': number,
+            'state': 'open',
+            'locked': False,
+            'title': '重构数据处理流水线',
+            'user': {**_user('octocat'), 'name': 'Octo Cat'},
+            'body': body,
+            'labels': [{'id': i, 'name': f'label-{i}', 'color': 'f29513'} for i in range(5)],
+            'created_at': '2024-01-15T10:30:00Z',
+            'updated_at': '2024-01-15T10:30:00Z',
+            'head': branch,
+            'base': {**branch, 'label': 'bench-org:main', 'ref': 'main'},
+            'requested_reviewers': [_user(f'reviewer{i}') for i in range(3)],
+            'additions': spec['files'] * spec['lines'],
+            'deletions': spec['files'] * (spec['lines'] // 4),
+            'changed_files': spec['files'],
+            'commits': 3,
+        },
+        'repository': _repository(full_name),
+        'sender': _user('octocat'),
+    }
+
+
+def make_legacy_pr_info(size: str) -> Dict[str, Any]:
+    """生成 GitHubWebhookHandler._extract_pr_info 格式的 pr_info"""
+    spec = SIZES[size]
+    pr = make_payload(size)['pull_request']
+    return {
+        'title': pr['title'],
+        'description': pr['body'],
+        'author': pr['user']['login'],
+        'author_name': pr['user']['name'],
+        'number': pr['number'],
+        'url': pr['html_url'],
+        'state': pr['state'],
+        'created_at': pr['created_at'],
+        'updated_at': pr['updated_at'],
+        'base_branch': pr['base']['ref'],
+        'head_branch': pr['head']['ref'],
+        'additions': pr['additions'],
+        'deletions': pr['deletions'],
+        'changed_files': pr['changed_files'],
+        'changed_files_list': [f'src/pkg_{i % 7}/module_{i}.py' for i in range(spec['files'])],
+    }
@@ -0,0 +1,212 @@
+"""
+基准测试用的本地替身服务
+
+提供 GitHub（diff / files API）、OpenAI（chat completions）和飞书 Webhook 的
+本地替身，每个替身都可配置延迟分布和错误率，并记录每次请求的处理耗时。
+
+延迟分布写法:
+  fixed:50             固定 50ms
+  uniform:20,80        20~80ms 均匀分布
+  lognormal:200,0.5    中位数 200ms、sigma=0.5 的对数正态分布
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Any, List, Tuple
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """
+    解析延迟分布
+
+    Args:
+        spec: 延迟分布描述
+
+    Returns:
+        每次调用返回一个延迟秒数的函数
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',') if v]
+
+    if kind == 'fixed':
+        return lambda: values[0] / 1000
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == 'lognormal':
+        mu, sigma = math.log(values[0]), values[1]
+        return lambda: random.lognormvariate(mu, sigma) / 1000
+    raise ValueError(f"未知的延迟分布: {spec}")
+
+
+def make_diff(files: int = 3, lines_per_file: int = 40) -> str:
+    """生成一段合成的 unified diff"""
+    chunks = []
+    for index in range(files):
+        path = f"src/module_{index}.py"
+        body = "\n".join(f"+value_{i} = compute({i})" for i in range(lines_per_file))
+        chunks.append(
+            f"diff --git a/{path} b/{path}\n"
+            f"index 83db48f..f735c3e 100644\n"
+            f"--- a/{path}\n+++ b/{path}\n"
+            f"@@ -1,3 +1,{lines_per_file + 3} @@\n{body}\n"
+            f" def main():\n     pass\n"
+        )
+    return "".join(chunks)
+
+
+class StubService:
+    """单个替身服务：在后台线程中运行 HTTP 服务器"""
+
+    def __init__(self, name: str, latency: str = 'fixed:0', error_rate: float = 0.0):
+        self.name = name
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.timings: List[float] = []
+        self.status_counts: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle(self, method: str, path: str, body: bytes) -> Tuple[int, str, Any]:
+        """子类实现：返回 (状态码, Content-Type, 响应体)"""
+        raise NotImplementedError
+
+    def _record(self, status: int, elapsed: float):
+        with self._lock:
+            self.timings.append(elapsed)
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> 'StubService':
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _serve(self):
+                start = time.perf_counter()
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                time.sleep(service.sample_latency())
+
+                if random.random() < service.error_rate:
+                    status, content_type, payload = 503, 'application/json', {'error': 'injected'}
+                else:
+                    status, content_type, payload = service.handle(self.command, self.path, body)
+
+                data = payload if isinstance(payload, bytes) else (
+                    payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+                )
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                service._record(status, time.perf_counter() - start)
+
+            do_GET = _serve
+            do_POST = _serve
+            do_PATCH = _serve
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.timings = []
+            self.status_counts = {}
+
+
+class GitHubStub(StubService):
+    """GitHub 替身：PR 差异（{n}.diff 或 API /pulls/{n}）和 /pulls/{n}/files"""
+
+    def __init__(self, latency: str = 'fixed:0', error_rate: float = 0.0,
+                 diff_files: int = 3, diff_lines: int = 40):
+        super().__init__('github', latency, error_rate)
+        self.diff = make_diff(diff_files, diff_lines)
+        self.files = [{'filename': f"src/module_{i}.py"} for i in range(diff_files)]
+
+    def handle(self, method, path, body):
+        # 网页 diff_url，或带 diff Accept 头的 API 地址
+        if re.search(r'/pulls?/\d+(\.diff)?$', path):
+            return 200, 'text/plain', self.diff
+        if re.search(r'/pulls/\d+/files', path):
+            return 200, 'application/json', self.files
+        return 404, 'application/json', {'message': 'Not Found'}
+
+
+class OpenAIStub(StubService):
+    """OpenAI 替身：POST /v1/chat/completions（支持 stream=True）"""
+
+    SUMMARY = '## 变更摘要\n替身服务生成的摘要\n\n## 建议\n无'
+
+    def __init__(self, latency: str = 'fixed:0', error_rate: float = 0.0):
+        super().__init__('openai', latency, error_rate)
+
+    def handle(self, method, path, body):
+        if not path.rstrip('/').endswith('/chat/completions'):
+            return 404, 'application/json', {'error': {'message': 'Not Found'}}
+        request = json.loads(body or b'{}')
+        prompt_chars = sum(len(m.get('content', '')) for m in request.get('messages', []))
+        usage = {
+            'prompt_tokens': prompt_chars // 4,
+            'completion_tokens': 16,
+            'total_tokens': prompt_chars // 4 + 16,
+        }
+        if request.get('stream'):
+            return 200, 'text/event-stream', self._stream_body(request, usage)
+        return 200, 'application/json', {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': self.SUMMARY},
+                'finish_reason': 'stop',
+            }],
+            'usage': usage,
+        }
+
+    def _stream_body(self, request: Dict[str, Any], usage: Dict[str, int]) -> str:
+        """stream=True 时按 SSE 分块返回，最后一块带 usage（stream_options.include_usage）"""
+        base = {'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk',
+                'created': int(time.time()), 'model': request.get('model', 'stub')}
+        chunks = [dict(base, choices=[{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}])
+                  for piece in self.SUMMARY.split('\n')]
+        for chunk in chunks[:-1]:
+            chunk['choices'][0]['delta']['content'] += '\n'
+        chunks.append(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))
+        if request.get('stream_options', {}).get('include_usage'):
+            chunks.append(dict(base, choices=[], usage=usage))
+        return ''.join(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n" for chunk in chunks) + 'data: [DONE]\n\n'
+
+
+class FeishuStub(StubService):
+    """飞书 Webhook 替身：接收任意 POST 并返回成功"""
+
+    def __init__(self, latency: str = 'fixed:0', error_rate: float = 0.0):
+        super().__init__('feishu', latency, error_rate)
+
+    def handle(self, method, path, body):
+        return 200, 'application/json', {'code': 0, 'msg': 'success', 'data': {}}
@@ -1,13 +1,25 @@
 import requests
 import json
+import contextlib
 import hmac
 import hashlib
 import logging
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from urllib.parse import urlparse
 import threading
 import time
 
+try:
+    from github_pr_mcp_server.capture import WebhookRecorder
+    from github_pr_mcp_server import metrics, profiling, tracing
+    from github_pr_mcp_server.core import changed_symbols
+except ImportError:  # 未安装 github_pr_mcp_server 包时不支持录制、指标、诊断、追踪和变更符号提取
+    WebhookRecorder = None
+    metrics = None
+    profiling = None
+    tracing = None
+    changed_symbols = None
+
 class GitHubWebhookHandler:
     """
     GitHub Webhook 处理器，用于接收和处理 GitHub PR 事件
@@ -29,10 +41,17 @@ class GitHubWebhookHandler:
         self.server_thread = None
         self.is_running = False
         
+        # 设置了 MCP_CAPTURE_PATH 时录制 Webhook 流量
+        self.recorder = WebhookRecorder.from_env() if WebhookRecorder else None
+        
         # 设置日志
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         
+        # 配置 span 导出（MCP_TRACE_PATH），并在日志中带上 trace ID
+        if tracing is not None:
+            tracing.configure_from_env()
+        
         # 设置 Flask 路由
         self._setup_routes()
     
@@ -47,34 +66,71 @@ class GitHubWebhookHandler:
             Returns:
                 json: 响应结果
             """
-            try:
-                # 验证 webhook 签名
-                if not self._verify_signature(request):
-                    self.logger.error("Webhook 签名验证失败")
-                    return jsonify({"error": "签名验证失败"}), 401
-                
-                # 解析事件类型
-                event_type = request.headers.get('X-GitHub-Event')
-                payload = request.json
-                
-                self.logger.info(f"收到 GitHub 事件: {event_type}")
-                
-                # 处理 PR 事件
-                if event_type == 'pull_request':
-                    return self._handle_pull_request(payload)
-                else:
-                    self.logger.info(f"忽略事件类型: {event_type}")
-                    return jsonify({"message": "事件已接收"}), 200
+            start = time.perf_counter()
+            with self._span('webhook', route=request.path):
+                try:
+                    # 验证 webhook 签名
+                    with self._span('signature_verification'):
+                        verified = self._verify_signature(request)
+                    if not verified:
+                        self.logger.error("Webhook 签名验证失败")
+                        return jsonify({"error": "签名验证失败"}), 401
+                    
+                    if self.recorder is not None:
+                        self.recorder.record(request.path, request.data, request.headers)
+                    
+                    # 解析事件类型
+                    with self._span('payload_parse'):
+                        event_type = request.headers.get('X-GitHub-Event')
+                        payload = request.json
+                    
+                    self.logger.info(f"收到 GitHub 事件: {event_type}")
                     
-            except Exception as e:
-                self.logger.error(f"处理 webhook 时发生错误: {str(e)}")
-                return jsonify({"error": str(e)}), 500
+                    # 处理 PR 事件
+                    if event_type == 'pull_request':
+                        return self._handle_pull_request(payload)
+                    else:
+                        self.logger.info(f"忽略事件类型: {event_type}")
+                        return jsonify({"message": "事件已接收"}), 200
+                        
+                except Exception as e:
+                    self.logger.error(f"处理 webhook 时发生错误: {str(e)}")
+                    return jsonify({"error": str(e)}), 500
+                finally:
+                    if metrics is not None:
+                        payload = request.get_json(silent=True) or {}
+                        repository = payload.get('repository', {}).get('full_name', '')
+                        metrics.WEBHOOK_SECONDS.observe(time.perf_counter() - start, repository=repository)
+        
+        @self.app.route('/metrics', methods=['GET'])
+        def metrics_endpoint():
+            """Prometheus 指标端点"""
+            if metrics is None:
+                return jsonify({"error": "未安装 github_pr_mcp_server，指标不可用"}), 404
+            return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+        
+        @self.app.route('/debug/profile', methods=['GET'])
+        def debug_profile():
+            """采样分析端点（需要管理员令牌）"""
+            return self._debug_response(profiling.profile_endpoint if profiling else None)
+        
+        @self.app.route('/debug/memory', methods=['GET'])
+        def debug_memory():
+            """内存快照对比端点（需要管理员令牌）"""
+            return self._debug_response(profiling.memory_endpoint if profiling else None)
         
         @self.app.route('/health', methods=['GET'])
         def health():
             """健康检查端点"""
             return jsonify({"status": "healthy", "service": "github_webhook_handler"}), 200
     
+    def _debug_response(self, handler):
+        """调用诊断处理函数并转换为 Flask 响应"""
+        if handler is None:
+            return jsonify({"error": "未安装 github_pr_mcp_server，诊断端点不可用"}), 404
+        status, body, content_type = handler(request.args, request.headers)
+        return Response(body, status=status, content_type=content_type)
+    
     def _verify_signature(self, request):
         """
         验证 GitHub Webhook 签名
@@ -171,6 +227,18 @@ class GitHubWebhookHandler:
         Returns:
             list: 修改的文件列表
         """
+        return [file['filename'] for file in self._get_pr_file_entries(pr_number)]
+    
+    def _get_pr_file_entries(self, pr_number):
+        """
+        获取 PR 修改的文件（GitHub 返回的完整条目，包含 status 和 patch）
+        
+        Args:
+            pr_number (int): PR 编号
+            
+        Returns:
+            list: 文件条目列表
+        """
         try:
             # 解析仓库信息
             repo_path = urlparse(self.repo_url).path.strip('/')
@@ -186,13 +254,69 @@ class GitHubWebhookHandler:
             response = requests.get(api_url, headers=headers)
             response.raise_for_status()
             
-            files = response.json()
-            return [file['filename'] for file in files]
+            return response.json()
             
         except Exception as e:
             self.logger.error(f"获取 PR 文件列表失败: {str(e)}")
             return []
     
+    def _patch_diff(self, file_entries):
+        """
+        把文件条目中的 patch 拼接为 git diff 格式的文本（GitHub 省略 patch 的大文件和二进制文件除外）
+        
+        Args:
+            file_entries (list): _get_pr_file_entries 返回的文件条目
+            
+        Returns:
+            str: 差异文本
+        """
+        diff_lines = []
+        for file in file_entries:
+            if not file.get('patch'):
+                continue
+            old_path = file.get('previous_filename') or file['filename']
+            diff_lines.append(f"diff --git a/{old_path} b/{file['filename']}")
+            if file.get('status') == 'added':
+                diff_lines.append('new file mode 100644')
+            elif file.get('status') == 'removed':
+                diff_lines.append('deleted file mode 100644')
+            diff_lines.append(file['patch'])
+        return '\n'.join(diff_lines)
+    
+    def _changed_symbols(self, diff_content):
+        """
+        列出差异中变更的函数、类和方法；未安装 github_pr_mcp_server 包时返回空列表
+        
+        Args:
+            diff_content (str): _patch_diff 生成的差异文本
+            
+        Returns:
+            list: 每个文件一行的变更符号
+        """
+        if changed_symbols is None:
+            return []
+        try:
+            return changed_symbols(diff_content)
+        except Exception as e:
+            self.logger.error(f"提取变更符号失败: {str(e)}")
+            return []
+    
+    def _repository_name(self):
+        """仓库全名（owner/repo），用作指标标签"""
+        return urlparse(self.repo_url).path.strip('/')
+    
+    def _timer(self, histogram_name, **labels):
+        """按阶段计时；未安装 github_pr_mcp_server 包时不记录"""
+        if metrics is None:
+            return contextlib.nullcontext()
+        return getattr(metrics, histogram_name).time(repository=self._repository_name(), **labels)
+    
+    def _span(self, name, **attributes):
+        """记录追踪 span；未安装 github_pr_mcp_server 包时不记录"""
+        if tracing is None:
+            return contextlib.nullcontext()
+        return tracing.span(name, **attributes)
+    
     def start_webhook_server(self, feishu_handler=None, ai_summarizer=None):
         """
         启动 Webhook 服务器
@@ -208,29 +332,40 @@ class GitHubWebhookHandler:
         # 设置回调函数
         def on_pr_event(pr_info):
             """PR 事件回调函数"""
-            try:
-                self.logger.info(f"处理 PR #{pr_info['number']}: {pr_info['title']}")
-                
-                # 获取修改的文件
-                changed_files = self._get_pr_files(pr_info['number'])
-                pr_info['changed_files_list'] = changed_files
-                
-                # 使用 AI 总结 PR 内容
-                if ai_summarizer:
-                    summary = ai_summarizer.summarize_pr(pr_info)
-                    self.logger.info(f"AI 总结完成: {summary[:100]}...")
+            start = time.perf_counter()
+            with self._span('on_pr_event', repository=self._repository_name(), pr_number=pr_info['number']):
+                try:
+                    self.logger.info(f"处理 PR #{pr_info['number']}: {pr_info['title']}")
                     
-                    # 发送到飞书
-                    if feishu_handler:
-                        feishu_handler.send_summary(summary, pr_info)
-                        self.logger.info("总结已发送到飞书")
-                    else:
-                        self.logger.warning("飞书处理器未配置")
-                else:
-                    self.logger.warning("AI 总结器未配置")
+                    # 获取修改的文件
+                    with self._span('diff_fetch'), self._timer('DIFF_FETCH_SECONDS'):
+                        file_entries = self._get_pr_file_entries(pr_info['number'])
+                    pr_info['changed_files_list'] = [file['filename'] for file in file_entries]
+                    pr_info['diff_content'] = self._patch_diff(file_entries)
+                    pr_info['changed_symbols'] = self._changed_symbols(pr_info['diff_content'])
                     
-            except Exception as e:
-                self.logger.error(f"处理 PR 事件时发生错误: {str(e)}")
+                    # 使用 AI 总结 PR 内容
+                    if ai_summarizer:
+                        # LLM 调用的耗时和 span 由 AISummarizer 记录，本地总结不计入
+                        summary = ai_summarizer.summarize_pr(pr_info, repository=self._repository_name())
+                        self.logger.info(f"AI 总结完成: {summary[:100]}...")
+                        
+                        # 发送到飞书
+                        if feishu_handler:
+                            with self._span('notification', sink='feishu'), self._timer('FEISHU_SEND_SECONDS'):
+                                feishu_handler.send_summary(summary, pr_info)
+                            self.logger.info("总结已发送到飞书")
+                        else:
+                            self.logger.warning("飞书处理器未配置")
+                    else:
+                        self.logger.warning("AI 总结器未配置")
+                        
+                except Exception as e:
+                    self.logger.error(f"处理 PR 事件时发生错误: {str(e)}")
+                finally:
+                    if metrics is not None:
+                        metrics.END_TO_END_SECONDS.observe(time.perf_counter() - start,
+                                                           repository=self._repository_name())
         
         self.on_pr_event = on_pr_event
         self.is_running = True
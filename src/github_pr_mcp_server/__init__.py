@@ -8,9 +8,23 @@ __version__ = "1.0.0"
 __author__ = "MCP&Agent Challenge"
 __description__ = "GitHub PR MCP Server - MCP&Agent Challenge"
 
-from .server import GradioMCPServer, FlaskMCPServer
 from .core import analyze_code_changes, process_github_pr
 
+# 服务器类按需加载：导入包本身不会引入 Gradio / Flask
+_LAZY_ATTRIBUTES = {
+    "GradioMCPServer": ".server",
+    "FlaskMCPServer": ".server",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __all__ = [
     "GradioMCPServer",
     "FlaskMCPServer", 
@@ -0,0 +1,344 @@
+"""
+GitHub PR MCP Server 历史 PR 回填
+
+通过 GitHub API 分页列出指定时间范围内创建的 PR，每个 PR 作为回填任务走与 Webhook 事件相同的处理流程
+（仓库路由、差异过滤规则、模型选择），在本进程中以有限并发执行，或放入工作进程的任务队列按回填优先级处理。
+结果追加写入 JSONL 文件。进度追加写入检查点文件，中断后重新运行同一命令会跳过已完成的 PR。
+
+用法:
+  github-pr-mcp-server backfill --repo owner/repo --since 2024-01-01 --until 2024-06-30
+  github-pr-mcp-server backfill --repo owner/repo --since 2024-01-01 --concurrency 8 --feishu
+  github-pr-mcp-server backfill --repo owner/repo --since 2024-01-01 --queue
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Iterator, Optional
+
+import requests
+
+from .core import GITHUB_API_URL
+from .job_queue import JobQueue
+from .routing import current_routes
+from .scheduling import SOURCE_BACKFILL, webhook_priority
+from .tracing import span, traceparent
+from .worker import POLL_INTERVAL, handle_job
+
+
+# 剩余请求数低于该值时等待限流窗口重置
+RATE_LIMIT_RESERVE = 5
+
+
+def parse_date(value: str, end_of_day: bool = False) -> datetime:
+    """解析 ISO 日期或时间（UTC）；只有日期且 end_of_day 为真时取当天结束"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1) - timedelta(microseconds=1)
+    return parsed
+
+
+class GitHubClient:
+    """带限流处理的 GitHub API 客户端（线程安全）"""
+
+    def __init__(self, token: str = '', api_url: str = GITHUB_API_URL, max_retries: int = 5):
+        self.token = token
+        self.api_url = api_url.rstrip('/')
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def _headers(self, accept: str = 'application/vnd.github+json') -> Dict[str, str]:
+        headers = {'Accept': accept}
+        if self.token:
+            headers['Authorization'] = f'token {self.token}'
+        return headers
+
+    def wait_for_rate_limit(self):
+        """所有线程共享的限流等待"""
+        with self._lock:
+            delay = self._resume_at - time.time()
+        if delay > 0:
+            print(f"⏳ GitHub 限流，等待 {delay:.0f}s")
+            time.sleep(delay)
+
+    def _update_rate_limit(self, response: requests.Response):
+        """根据响应头更新限流状态，返回是否需要重试"""
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        retry_after = response.headers.get('Retry-After')
+
+        resume_at = 0.0
+        if retry_after:
+            resume_at = time.time() + float(retry_after)
+        elif remaining is not None and reset and int(remaining) <= RATE_LIMIT_RESERVE:
+            resume_at = float(reset) + 1
+        if resume_at:
+            with self._lock:
+                self._resume_at = max(self._resume_at, resume_at)
+
+        return response.status_code == 429 or (response.status_code == 403 and bool(resume_at))
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None,
+            accept: str = 'application/vnd.github+json') -> requests.Response:
+        """GET 请求；遇到限流时等待重置后重试"""
+        for attempt in range(self.max_retries):
+            self.wait_for_rate_limit()
+            response = requests.get(url, params=params, headers=self._headers(accept), timeout=30)
+            if not self._update_rate_limit(response):
+                response.raise_for_status()
+                return response
+            if attempt == self.max_retries - 1:
+                response.raise_for_status()
+        return response
+
+    def list_pull_requests(self, repo: str, since: datetime, until: datetime) -> Iterator[Dict[str, Any]]:
+        """按创建时间倒序分页列出 [since, until] 内创建的 PR"""
+        url = f"{self.api_url}/repos/{repo}/pulls"
+        params = {'state': 'all', 'sort': 'created', 'direction': 'desc', 'per_page': 100}
+        while url:
+            response = self.get(url, params)
+            for pr in response.json():
+                created = parse_date(pr['created_at'])
+                if created > until:
+                    continue
+                if created < since:
+                    return
+                yield pr
+            url = response.links.get('next', {}).get('url')
+            params = None  # next 链接已包含查询参数
+
+
+class Checkpoint:
+    """
+    回填进度检查点：追加写入每个 PR 的结果（JSONL），重新打开时按顺序回放，后写入的记录覆盖先前的
+
+    第一行记录仓库；之后每行为 {"number": N} 或 {"number": N, "error": "..."}。
+    """
+
+    def __init__(self, path: str, repo: str):
+        self.path = path
+        self.repo = repo
+        self.done = set()
+        self.failed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._load()
+        else:
+            self._append({'repo': repo, 'created_at': datetime.now(timezone.utc).isoformat()})
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        if not lines:
+            raise ValueError(f"检查点 {self.path} 为空")
+        header = json.loads(lines[0])
+        if header.get('repo') != self.repo:
+            raise ValueError(f"检查点 {self.path} 属于仓库 {header.get('repo')}，与 {self.repo} 不符")
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 写入中途退出时最后一行可能不完整
+                continue
+            self._apply(record['number'], record.get('error', ''))
+
+    def _apply(self, number: int, error: str):
+        if error:
+            self.failed[str(number)] = error
+        else:
+            self.done.add(number)
+            self.failed.pop(str(number), None)
+
+    def _append(self, record: Dict[str, Any]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record(self, number: int, error: str = ''):
+        with self._lock:
+            self._apply(number, error)
+            self._append({'number': number, 'error': error} if error else {'number': number})
+
+
+def backfill_job(repo: str, pr: Dict[str, Any], notify: bool = False) -> Dict[str, Any]:
+    """
+    把列出的 PR 包装成回填任务载荷（与 Webhook 事件入队的载荷相同）
+
+    Args:
+        repo: 仓库全名
+        pr: GitHub API 返回的 PR
+        notify: 是否发送到仓库路由中的飞书地址
+
+    Returns:
+        任务载荷；回填任务不发送草稿卡片
+    """
+    webhook_payload = {
+        'action': 'opened',
+        'number': pr['number'],
+        'pull_request': pr,
+        'repository': {'full_name': repo},
+    }
+    return {
+        'webhook_payload': json.dumps(webhook_payload, ensure_ascii=False),
+        'repository': repo,
+        'source': SOURCE_BACKFILL,
+        'notify': notify,
+    }
+
+
+def run_job(payload: Dict[str, Any], job_queue: Optional[JobQueue] = None) -> Dict[str, Any]:
+    """
+    执行回填任务：给出任务队列时按回填优先级入队并等待工作进程完成，否则在本进程中执行
+
+    Returns:
+        处理结果
+    """
+    if job_queue is None:
+        return handle_job({'id': 0, 'kind': 'process_webhook', 'attempts': 1, 'payload': payload})
+
+    priority = webhook_priority(json.loads(payload['webhook_payload']), SOURCE_BACKFILL)
+    job_id = job_queue.enqueue('process_webhook', dict(payload, traceparent=traceparent()), priority=priority)
+    while True:
+        job = job_queue.get(job_id)
+        if job['status'] == 'done':
+            return job['result']
+        if job['status'] == 'failed':
+            return {'status': 'error', 'error': job['error']}
+        time.sleep(POLL_INTERVAL)
+
+
+def backfill(repo: str, since: datetime, until: datetime, output: str, checkpoint: Checkpoint,
+             client: GitHubClient, notify: bool = False, concurrency: int = 4, limit: int = 0,
+             job_queue: Optional[JobQueue] = None) -> Dict[str, int]:
+    """
+    回填一个仓库的历史 PR 摘要
+
+    Args:
+        repo: 仓库全名 owner/repo
+        since: 起始时间（含）
+        until: 结束时间（含）
+        output: 摘要输出的 JSONL 文件（追加写入）
+        checkpoint: 进度检查点
+        client: GitHub API 客户端
+        notify: 为 True 时同时发送到仓库路由中的飞书地址
+        concurrency: 同时处理的 PR 数
+        limit: 本次最多处理的 PR 数（0 表示不限）
+        job_queue: 工作进程的任务队列（可选），给出时 PR 入队由工作进程处理
+
+    Returns:
+        统计：listed / skipped / succeeded / failed
+    """
+    stats = {'listed': 0, 'skipped': 0, 'succeeded': 0, 'failed': 0}
+    output_lock = threading.Lock()
+    # 限制已提交但未完成的任务数，避免一次性把上万个 PR 都放进线程池队列（或任务队列）
+    slots = threading.BoundedSemaphore(concurrency * 2)
+
+    def process(pr: Dict[str, Any]):
+        number = pr['number']
+        try:
+            with span('backfill_pr', repository=repo, pr_number=number):
+                result = run_job(backfill_job(repo, pr, notify), job_queue)
+            if result.get('status') != 'success' or result.get('summary', '').startswith("❌"):
+                raise RuntimeError(result.get('error') or result.get('summary') or result.get('message'))
+            if result.get('degraded'):
+                # 积压时降级生成的摘要不完整，留给下次运行重试
+                raise RuntimeError(f"队列积压，降级处理（{result['degraded']}）")
+
+            entry = {
+                'repository': repo,
+                'number': number,
+                'title': pr.get('title', ''),
+                'html_url': pr.get('html_url', ''),
+                'user': (pr.get('user') or {}).get('login', ''),
+                'created_at': pr.get('created_at'),
+                'merged_at': pr.get('merged_at'),
+                'summary': result['summary'],
+                'triage': result.get('triage'),
+                'timings': result.get('timings'),
+            }
+            # 先记录检查点再写输出：中断后重新运行不会重复写入同一个 PR
+            checkpoint.record(number)
+            with output_lock:
+                with open(output, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                stats['succeeded'] += 1
+            print(f"✅ #{number} {entry['title'][:60]}")
+        except Exception as e:
+            with output_lock:
+                stats['failed'] += 1
+            checkpoint.record(number, str(e))
+            print(f"❌ #{number} 失败: {e}")
+        finally:
+            slots.release()
+
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='mcp-backfill')
+    try:
+        submitted = 0
+        for pr in client.list_pull_requests(repo, since, until):
+            stats['listed'] += 1
+            if pr['number'] in checkpoint.done:
+                stats['skipped'] += 1
+                continue
+            if limit and submitted >= limit:
+                break
+            slots.acquire()
+            pool.submit(process, pr)
+            submitted += 1
+    except KeyboardInterrupt:
+        print("⏹️ 已中断，等待进行中的 PR 完成；进度已保存到检查点")
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    pool.shutdown(wait=True)
+
+    return stats
+
+
+def main(argv: Optional[list] = None):
+    """backfill 子命令入口"""
+    parser = argparse.ArgumentParser(prog='github-pr-mcp-server backfill',
+                                     description="回填仓库历史 PR 的摘要")
+    parser.add_argument('--repo', required=True, help="仓库全名 owner/repo")
+    parser.add_argument('--since', required=True, help="起始日期（含），如 2024-01-01")
+    parser.add_argument('--until', default='', help="结束日期（含），默认到现在")
+    parser.add_argument('--output', default='', help="摘要输出 JSONL（默认 backfill-<owner>-<repo>.jsonl）")
+    parser.add_argument('--checkpoint', default='', help="检查点文件（默认 <output>.checkpoint.jsonl）")
+    parser.add_argument('--concurrency', type=int, default=4, help="同时处理的 PR 数（默认 4）")
+    parser.add_argument('--limit', type=int, default=0, help="本次最多处理 N 个 PR")
+    parser.add_argument('--feishu', action='store_true', help="同时把摘要发送到仓库路由中的飞书地址")
+    parser.add_argument('--queue', action='store_true',
+                        help="放入工作进程的任务队列（MCP_QUEUE_PATH）按回填优先级处理，需要运行中的工作进程")
+    args = parser.parse_args(argv)
+
+    if '/' not in args.repo:
+        parser.error("--repo 格式应为 owner/repo")
+    since = parse_date(args.since)
+    until = parse_date(args.until, end_of_day=True) if args.until else datetime.now(timezone.utc)
+    output = args.output or f"backfill-{args.repo.replace('/', '-')}.jsonl"
+    checkpoint = Checkpoint(args.checkpoint or f"{output}.checkpoint.jsonl", args.repo)
+
+    route = current_routes().resolve(args.repo)
+    if route is None:
+        print(f"❌ 仓库 {args.repo} 未配置路由")
+        return
+    if not route.openai_api_key and not args.queue:
+        print("❌ 未设置 OPENAI_API_KEY（或仓库路由中的 openai_api_key）")
+        return
+    job_queue = JobQueue() if args.queue else None
+
+    print(f"📚 回填 {args.repo}: {since.date()} ~ {until.date()}，并发 {args.concurrency}"
+          + (f"，任务队列 {job_queue.path}" if job_queue is not None else ""))
+    if checkpoint.done:
+        print(f"↩️ 从检查点继续：已完成 {len(checkpoint.done)} 个，失败待重试 {len(checkpoint.failed)} 个")
+
+    stats = backfill(args.repo, since, until, output, checkpoint, GitHubClient(route.github_token),
+                     args.feishu, max(1, args.concurrency), args.limit, job_queue)
+    print(f"📊 列出 {stats['listed']} 个，跳过 {stats['skipped']} 个，"
+          f"成功 {stats['succeeded']} 个，失败 {stats['failed']} 个 → {output}")
@@ -0,0 +1,222 @@
+"""
+GitHub PR MCP Server 批量分析
+
+一次请求分析多个 PR：以有限并发分发各项，同一批次内相同的差异只获取一次、
+相同的差异内容只分析一次，结果按输入顺序返回并带有逐项状态。
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
+
+from .core import (
+    GITHUB_API_URL, GITHUB_DIFF_MEDIA_TYPE, MICROBATCHER, extract_pr_info, get_pr_diff, get_pull_request,
+    is_github_url, load_diff_rules, summarize_changes
+)
+from .model_routing import plan_model
+from .routing import current_routes
+from .timings import Timings, collect, record_cache
+from .tracing import span
+
+
+BATCH_CONCURRENCY = int(os.getenv('MCP_BATCH_CONCURRENCY', 4))
+BATCH_MAX_ITEMS = int(os.getenv('MCP_BATCH_MAX_ITEMS', 50))
+
+# owner/repo#123
+PR_REFERENCE_PATTERN = re.compile(r'^([\w.-]+/[\w.-]+)#(\d+)$')
+
+
+def resolve_batch_item(item: Union[str, Dict[str, Any]]) -> Dict[str, str]:
+    """
+    解析批量请求中的一项
+
+    支持的形式：
+      - 差异文本，或 {"diff_content": "..."}
+      - PR 引用 "owner/repo#123"，或 {"repository": "owner/repo", "number": 123}
+      - 差异地址 "https://github.com/owner/repo/pull/123.diff"，或 {"diff_url": "..."}；
+        只接受 GitHub 上的地址（见 core.GITHUB_HOSTS）
+
+    Returns:
+        {'source', 'repository', 以及 'diff_content' 或 'diff_url'（PR 引用时带 'number' 和 'accept'）}
+    """
+    if isinstance(item, str):
+        text = item.strip()
+        match = PR_REFERENCE_PATTERN.match(text)
+        if match:
+            item = {'repository': match.group(1), 'number': match.group(2)}
+        elif text.startswith(('http://', 'https://')):
+            item = {'diff_url': text}
+        else:
+            item = {'diff_content': item}
+
+    if not isinstance(item, dict):
+        raise ValueError(f"无法识别的批量项: {item!r}")
+
+    repository = str(item.get('repository', ''))
+    if item.get('diff_content'):
+        return {'source': 'diff', 'repository': repository, 'diff_content': item['diff_content']}
+    if item.get('diff_url'):
+        if not is_github_url(item['diff_url']):
+            raise ValueError(f"差异地址不在 GitHub 上: {item['diff_url']}")
+        return {'source': item['diff_url'], 'repository': repository, 'diff_url': item['diff_url']}
+    if repository and str(item.get('number', '')).isdigit():
+        return {
+            'source': f"{repository}#{item['number']}",
+            'repository': repository,
+            'number': str(item['number']),
+            'diff_url': f"{GITHUB_API_URL}/repos/{repository}/pulls/{item['number']}",
+            'accept': GITHUB_DIFF_MEDIA_TYPE,
+        }
+    raise ValueError("批量项需要 diff_content、diff_url 或 repository + number")
+
+
+def parse_batch_items(items: Union[str, List[Any]]) -> List[Any]:
+    """解析 MCP 工具传入的批量项：JSON 数组，或每行一个 PR 引用/差异地址"""
+    if not isinstance(items, str):
+        return list(items)
+    text = items.strip()
+    if text.startswith('['):
+        return json.loads(text)
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def _fetch_item(resolved: Dict[str, str], github_token: str) -> Tuple[Optional[str], Dict[str, Any]]:
+    """获取差异；PR 引用同时获取 PR 元数据，用于读取 .gitattributes、提取变更符号和选择模型"""
+    repository = resolved['repository']
+    diff_content = get_pr_diff(resolved['diff_url'], github_token, repository, resolved.get('accept', ''))
+    pull_request = {}
+    if diff_content and 'number' in resolved:
+        pull_request = get_pull_request(repository, resolved['number'], github_token) or {}
+    return diff_content, pull_request
+
+
+class _SharedResults:
+    """批次内共享的计算结果：同一个键只计算一次，并发请求等待首个计算完成"""
+
+    def __init__(self, cache: str):
+        self.cache = cache
+        self._futures: Dict[Any, Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, compute: Callable[[], Any], repository: str = '') -> Any:
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = Future()
+        record_cache(self.cache, not owner, repository)
+
+        if owner:
+            try:
+                future.set_result(compute())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+
+def analyze_prs_batch(items: List[Any], openai_api_key: str = "", github_token: str = "",
+                      max_concurrency: int = 0) -> Dict[str, Any]:
+    """
+    批量分析多个 PR
+
+    Args:
+        items: 差异文本、PR 引用或差异地址的列表（见 resolve_batch_item）
+        openai_api_key: OpenAI API 密钥，未提供时使用各项仓库路由中的密钥
+        github_token: GitHub 令牌，未提供时使用各项仓库路由中的令牌
+        max_concurrency: 最大并发数，默认 MCP_BATCH_CONCURRENCY
+
+    Returns:
+        批量结果；results 与输入顺序一致，每项带 status 和各自的 timings。
+        顶层 timings 中各阶段为所有项的累计耗时，total_ms 为整个批次的实际用时
+    """
+    if not items:
+        return {'status': 'error', 'error': 'items 不能为空'}
+    if len(items) > BATCH_MAX_ITEMS:
+        return {'status': 'error', 'error': f'单次最多 {BATCH_MAX_ITEMS} 项，收到 {len(items)} 项'}
+
+    concurrency = max(1, min(max_concurrency or BATCH_CONCURRENCY, len(items)))
+    diffs = _SharedResults('batch_diff')
+    analyses = _SharedResults('batch_analysis')
+
+    def run_item(index: int, item: Any) -> Tuple[Dict[str, Any], Timings]:
+        with MICROBATCHER.track(), collect(fresh=True) as timings, span('batch_item', index=index) as item_span:
+            result: Dict[str, Any] = {'index': index}
+            try:
+                resolved = resolve_batch_item(item)
+                repository = resolved['repository']
+                result['source'] = resolved['source']
+                item_span.set_attribute('source', resolved['source'])
+
+                route = current_routes().resolve(repository)
+                if route is None:
+                    raise ValueError(f"仓库 {repository} 未配置路由")
+                token = github_token or route.github_token
+
+                if 'diff_content' in resolved:
+                    diff_content, pull_request = resolved['diff_content'], {}
+                else:
+                    diff_content, pull_request = diffs.get(
+                        resolved['diff_url'], lambda: _fetch_item(resolved, token), repository
+                    )
+                if not diff_content:
+                    result.update({'status': 'error', 'error': '获取 PR 差异失败'})
+                else:
+                    head_sha = (pull_request.get('head') or {}).get('sha', '')
+                    base_sha = (pull_request.get('base') or {}).get('sha', '')
+                    pr_info = extract_pr_info({'pull_request': pull_request,
+                                               'repository': {'full_name': repository}})
+                    digest = hashlib.sha256(diff_content.encode('utf-8')).hexdigest()
+                    triage, summary = analyses.get(
+                        (repository, head_sha, digest),
+                        lambda: summarize_changes(
+                            diff_content, pr_info, openai_api_key or route.openai_api_key,
+                            load_diff_rules(repository, token, head_sha, base_sha),
+                            plan_model(pull_request, diff_content)
+                        ),
+                        repository
+                    )
+                    if summary.startswith("❌"):
+                        result.update({'status': 'error', 'error': summary})
+                    else:
+                        result.update({'status': 'success', 'summary': summary, 'triage': triage})
+            except Exception as e:
+                result.update({'status': 'error', 'error': str(e)})
+            result['timings'] = timings.to_dict()
+            return result, timings
+
+    start = time.perf_counter()
+    with span('analyze_prs_batch', items=len(items), concurrency=concurrency):
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='mcp-batch') as pool:
+            # 每项在当前上下文的副本中执行，使其 span 挂在批量 span 之下
+            futures = [pool.submit(contextvars.copy_context().run, run_item, index, item)
+                       for index, item in enumerate(items)]
+            outcomes = [future.result() for future in futures]
+
+    total = Timings()
+    for _, item_timings in outcomes:
+        total.merge(item_timings)
+    timings = total.to_dict()
+    timings['total_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    results = [result for result, _ in outcomes]
+    succeeded = sum(1 for result in results if result['status'] == 'success')
+    if succeeded == len(results):
+        status = 'success'
+    elif succeeded:
+        status = 'partial'
+    else:
+        status = 'error'
+    return {
+        'status': status,
+        'total': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'results': results,
+        'timings': timings,
+    }
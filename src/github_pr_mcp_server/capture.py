@@ -0,0 +1,107 @@
+"""
+GitHub PR MCP Server Webhook 流量录制
+
+将收到的 Webhook 原始请求体和请求头追加到 gzip 压缩的 JSONL 语料中，
+录制时去除密钥类字段，并用测试密钥重新签名，便于在实验环境中回放。
+"""
+
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Mapping, Optional
+
+
+DEFAULT_CAPTURE_SECRET = 'replay-secret'
+
+# 录制时丢弃的请求头（签名会用测试密钥重新生成）
+DROPPED_HEADERS = {
+    'authorization', 'cookie', 'x-hub-signature', 'x-hub-signature-256',
+    'x-forwarded-for', 'x-real-ip', 'host', 'content-length',
+}
+
+# 载荷中值需要脱敏的字段名片段
+SENSITIVE_KEYS = ('token', 'secret', 'password', 'private_key', 'client_id')
+
+REDACTED = '[REDACTED]'
+
+
+def sign_payload(body: bytes, secret: str) -> str:
+    """计算 X-Hub-Signature-256"""
+    return f"sha256={hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()}"
+
+
+def _redact(value: Any) -> bool:
+    """原地脱敏，返回是否有字段被修改"""
+    changed = False
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, str) and any(part in key.lower() for part in SENSITIVE_KEYS):
+                value[key] = REDACTED
+                changed = True
+            else:
+                changed = _redact(item) or changed
+    elif isinstance(value, list):
+        for item in value:
+            changed = _redact(item) or changed
+    return changed
+
+
+def redact_body(body: bytes) -> bytes:
+    """脱敏 JSON 载荷；没有敏感字段时原样返回，保留原始字节"""
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return body
+    if not _redact(payload):
+        return body
+    return json.dumps(payload, ensure_ascii=False).encode()
+
+
+class WebhookRecorder:
+    """线程安全的 Webhook 录制器"""
+
+    def __init__(self, path: str, test_secret: str = DEFAULT_CAPTURE_SECRET):
+        self.path = path
+        self.test_secret = test_secret
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional['WebhookRecorder']:
+        """设置了 MCP_CAPTURE_PATH 时启用录制"""
+        path = os.getenv('MCP_CAPTURE_PATH', '')
+        if not path:
+            return None
+        return cls(path, os.getenv('MCP_CAPTURE_SECRET', DEFAULT_CAPTURE_SECRET))
+
+    def record(self, route: str, body: bytes, headers: Mapping[str, str]) -> Dict[str, Any]:
+        """
+        追加一条录制记录
+
+        Args:
+            route: 请求路径，回放时使用
+            body: 原始请求体
+            headers: 请求头
+
+        Returns:
+            写入的记录
+        """
+        body = redact_body(body)
+        kept_headers = {k: v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS}
+        kept_headers['X-Hub-Signature-256'] = sign_payload(body, self.test_secret)
+
+        entry = {
+            'ts': time.time(),
+            'route': route,
+            'headers': kept_headers,
+            'body': body.decode('utf-8'),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            # gzip 支持多成员追加，读取时会自动拼接
+            with gzip.open(self.path, 'at', encoding='utf-8') as corpus:
+                corpus.write(line)
+        return entry
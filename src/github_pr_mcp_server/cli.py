@@ -3,14 +3,35 @@ GitHub PR MCP Server 命令行接口
 """
 
 import os
+import signal
 import sys
 from typing import Optional
 
-from .server import GradioMCPServer, FlaskMCPServer
+from .job_queue import JobQueue
+from . import tracing
+from .worker import start_workers, stop_workers
 
 
 def main():
     """主函数"""
+    args = sys.argv[1:]
+    if args and args[0] in ['-h', '--help', 'help']:
+        show_help()
+        return
+    if args and args[0] == 'replay':
+        from .replay import main as replay_main
+        replay_main(args[1:])
+        return
+    if args and args[0] == 'backfill':
+        from .backfill import main as backfill_main
+        backfill_main(args[1:])
+        return
+    
+    run_server()
+
+
+def run_server():
+    """启动 MCP 服务器"""
     print("🚀 GitHub PR MCP Server - MCP&Agent Challenge")
     print("=" * 50)
     
@@ -21,21 +42,40 @@ def main():
     webhook_port = int(os.getenv('WEBHOOK_PORT', 5000))
     gradio_port = int(os.getenv('GRADIO_PORT', 8080))
     
+    # 获取工作进程配置
+    worker_count = int(os.getenv('MCP_WORKERS', 0))
+    
     print(f"🔧 服务器类型: {server_type}")
     print(f"📡 Webhook 端口: {webhook_port}")
     print(f"🌐 Gradio 端口: {gradio_port}")
+    print(f"👷 工作进程数: {worker_count}")
     print("=" * 50)
     
     # 验证环境变量
     validate_environment()
     
+    # 配置追踪导出（MCP_TRACE_PATH）
+    tracing.configure_from_env()
+    
+    workers = []
     try:
         if server_type == 'flask':
-            # 启动 Flask MCP 服务器
-            server = FlaskMCPServer()
+            # 启动工作进程和 Flask MCP 服务器
+            from .server import FlaskMCPServer
+            job_queue = None
+            if worker_count > 0:
+                job_queue = JobQueue()
+                workers = start_workers(worker_count, job_queue)
+                # SIGTERM 时也走 finally 清理工作进程，避免遗留孤儿进程
+                signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+                print(f"🗂️ 任务队列: {job_queue.path}")
+            server = FlaskMCPServer(job_queue=job_queue)
             server.run(port=webhook_port)
         else:
             # 启动 Gradio MCP 服务器
+            if worker_count > 0:
+                print("⚠️ 工作进程模式仅支持 flask 服务器类型，已忽略 MCP_WORKERS")
+            from .server import GradioMCPServer
             server = GradioMCPServer()
             server.launch(port=gradio_port)
             
@@ -45,6 +85,8 @@ def main():
     except Exception as e:
         print(f"❌ 启动服务器失败: {e}")
         sys.exit(1)
+    finally:
+        stop_workers(workers)
 
 
 def validate_environment():
@@ -84,14 +126,40 @@ def show_help():
     print("  OPENAI_API_KEY     - OpenAI API 密钥")
     print("  WEBHOOK_SECRET     - GitHub Webhook 密钥")
     print("  FEISHU_WEBHOOK_URL - 飞书 Webhook URL")
+    print("  FEISHU_APP_ID      - 飞书应用 ID，与 FEISHU_APP_SECRET、FEISHU_CHAT_ID 一起启用草稿卡片通知")
     print("  GITHUB_TOKEN       - GitHub 令牌")
     print("  MCP_SERVER_TYPE    - 服务器类型 (gradio/flask)")
     print("  WEBHOOK_PORT       - Webhook 端口 (默认: 5000)")
     print("  GRADIO_PORT        - Gradio 端口 (默认: 8080)")
+    print("  MCP_WORKERS        - 工作进程数，仅 flask 模式 (默认: 0，同步处理)")
+    print("  MCP_QUEUE_PATH     - 任务队列 SQLite 文件 (默认: mcp_jobs.sqlite3)")
+    print("  MCP_LEASE_SECONDS  - 任务租约时长 (默认: 60)")
+    print("  MCP_METRICS_PUSH_INTERVAL - 工作进程写入指标快照的间隔，秒 (默认: 5)")
+    print("  MCP_SCHED_AGING_SECONDS - 排队任务的优先级老化间隔，秒 (默认: 30)")
+    print("  MCP_DIFF_EXCLUDE   - 送入 LLM 前排除的文件通配符，逗号分隔 (可选)")
+    print("  MCP_DIFF_CONTEXT_LINES - 精简差异时每处变更保留的上下文行数 (默认: 1)")
+    print("  MCP_DIFF_SYMBOLS   - 在提示词中列出变更的函数/类/方法，0 关闭 (默认: 1)")
+    print("  MCP_TRIAGE         - 简单 PR 使用本地模板摘要、不调用 LLM，0 关闭 (默认: 1)")
+    print("  MCP_MODEL_ROUTING  - 按 PR 规模和复杂度选择模型档位，0 关闭 (默认: 1)")
+    print("  MCP_MICROBATCH     - 同一仓库的小 PR 合并为一次 LLM 请求，1 开启 (默认: 0)")
+    print("  MCP_DEGRADE_DEPTH  - 进入 cheap/heuristic/digest 降级模式的积压任务数 (默认: 50,150,400)")
+    print("  MCP_DEGRADE_UPGRADE - 积压消除后为降级处理的 PR 补发完整摘要，1 开启 (默认: 0)")
+    print("  MCP_ROUTES_PATH    - 多仓库路由表 JSON (凭据、飞书地址、并发配额，可选)")
+    print("  MCP_REPO_CONCURRENCY - 每个仓库同时处理的事件数 (默认: 4)")
+    print("  MCP_CAPTURE_PATH   - 录制 Webhook 流量的语料文件 (.jsonl.gz，可选)")
+    print("  MCP_CAPTURE_SECRET - 录制时重新签名使用的测试密钥 (默认: replay-secret)")
+    print("  MCP_BATCH_CONCURRENCY - 批量分析的最大并发数 (默认: 4)")
+    print("  MCP_ASYNC_WORKERS  - 异步 MCP 任务的执行线程数 (默认: 4)")
+    print("  MCP_ASYNC_JOB_TTL  - 已结束的异步任务保留时间，秒 (默认: 3600)")
+    print("  MCP_TRACE_PATH     - span 导出文件 (JSONL，可选)")
+    print("  MCP_TRACE_FORMAT   - span 格式 jsonl/otlp (默认: jsonl)")
+    print("  MCP_ADMIN_TOKEN    - 诊断端点 /debug/profile、/debug/memory 的管理员令牌 (可选)")
     print()
     print("使用方法:")
     print("  python -m github_pr_mcp_server")
     print("  github-pr-mcp-server")
+    print("  github-pr-mcp-server replay <corpus.jsonl.gz> --target <url> [--speed 1|N|max]")
+    print("  github-pr-mcp-server backfill --repo owner/repo --since 2024-01-01 [--until 2024-06-30]")
     print()
     print("MCP 客户端配置:")
     print("  {")
@@ -111,7 +179,4 @@ def show_help():
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help', 'help']:
-        show_help()
-    else:
-        main() 
\ No newline at end of file
+    main() 
\ No newline at end of file
@@ -0,0 +1,309 @@
+"""
+GitHub PR MCP Server 按文件类型压缩差异
+
+笔记本、锁文件、SVG 和数据文件的差异体积大、信息量低，送入 LLM 之前转换为紧凑的语义变更：
+
+  *.ipynb    单元格级别的源码变更（输出只统计行数）
+  锁文件     新增、移除和升级的依赖
+  *.svg      变更的元素统计
+  *.csv/tsv  行数、列数和表头变更
+
+差异只包含变更附近的片段，压缩器分别按旧文件视图（上下文行和删除行）与新文件视图
+（上下文行和新增行）解析，两个视图各自是连续的原文片段。
+通过 register_condenser 可以注册其他文件类型的压缩器。
+"""
+
+import csv
+import fnmatch
+import json
+import re
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+
+# 压缩器：参数为文件路径和差异正文（@@ 开始的各行），返回压缩后的说明；无法识别时返回 None
+Condenser = Callable[[str, List[str]], Optional[str]]
+
+# 每个列表最多列出的条目数
+MAX_ITEMS = 30
+
+_CONDENSERS: List[Tuple[Tuple[str, ...], str, Condenser]] = []
+
+
+def register_condenser(patterns: Tuple[str, ...], label: str, condenser: Condenser, first: bool = False):
+    """
+    注册压缩器
+
+    Args:
+        patterns: 文件名通配符（匹配不含目录的文件名）
+        label: 文件类型说明
+        condenser: 压缩函数
+        first: 优先于已注册的压缩器匹配
+    """
+    entry = (tuple(patterns), label, condenser)
+    if first:
+        _CONDENSERS.insert(0, entry)
+    else:
+        _CONDENSERS.append(entry)
+
+
+def find_condenser(path: str) -> Optional[Tuple[str, Condenser]]:
+    """查找匹配文件的压缩器，返回 (类型说明, 压缩函数)"""
+    name = path.rsplit('/', 1)[-1]
+    for patterns, label, condenser in _CONDENSERS:
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns):
+            return label, condenser
+    return None
+
+
+def condense(path: str, body: List[str]) -> Optional[str]:
+    """压缩文件差异；没有匹配的压缩器时返回 None"""
+    found = find_condenser(path)
+    if found is None:
+        return None
+    label, condenser = found
+    try:
+        summary = condenser(path, body)
+    except Exception:
+        summary = None
+    if summary is None:
+        additions = sum(1 for line in body if line.startswith('+'))
+        deletions = sum(1 for line in body if line.startswith('-'))
+        summary = f"+{additions} -{deletions} 行（未能解析内容）"
+    return f"### {path}（{label}，已压缩）\n{summary}"
+
+
+def _views(body: List[str]) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """
+    拆分旧文件视图和新文件视图
+
+    Returns:
+        (旧视图, 新视图)，每项为 (行类型, 内容)；行类型为 ' '、'-'、'+' 或 '@'（片段开始）
+    """
+    old, new = [], []
+    for line in body:
+        kind, content = line[:1], line[1:]
+        if kind == '@':
+            old.append(('@', line))
+            new.append(('@', line))
+        elif kind == ' ':
+            old.append((' ', content))
+            new.append((' ', content))
+        elif kind == '-':
+            old.append(('-', content))
+        elif kind == '+':
+            new.append(('+', content))
+    return old, new
+
+
+def _limited(items: List[str], separator: str = '; ') -> str:
+    text = separator.join(items[:MAX_ITEMS])
+    if len(items) > MAX_ITEMS:
+        text += f"{separator}…另有 {len(items) - MAX_ITEMS} 项"
+    return text
+
+
+# ---------- Jupyter 笔记本 ----------
+
+def _scan_notebook(view: List[Tuple[str, str]], changed: str) -> Tuple[List[str], Dict[str, int], int]:
+    """
+    扫描笔记本 JSON 片段
+
+    Returns:
+        (变更的源码行, 变更的单元格类型计数, 变更的输出行数)
+    """
+    source_lines: List[str] = []
+    cells: Dict[str, int] = {}
+    output_lines = 0
+    section, depth = None, 0
+    for kind, raw in view:
+        if kind == '@':
+            section, depth = None, 0
+            continue
+        content = raw.strip()
+        if section == 'outputs':
+            if kind == changed:
+                output_lines += 1
+            if content.endswith(('[', '{')):
+                depth += 1
+            if content.startswith((']', '}')):
+                depth -= 1
+            if depth <= 0:
+                section = None
+            continue
+        if section == 'source':
+            if content.startswith(']'):
+                section = None
+            elif kind == changed and content.startswith('"'):
+                source_lines.append(json.loads(content.rstrip(',')).rstrip('\n'))
+            continue
+
+        if content.startswith('"cell_type":') and kind == changed:
+            cell_type = json.loads('{' + content.rstrip(',') + '}')['cell_type']
+            cells[cell_type] = cells.get(cell_type, 0) + 1
+        elif content.startswith('"source": ['):
+            section = None if content.rstrip(',').endswith(']') else 'source'
+        elif content.startswith('"source": "') and kind == changed:
+            value = json.loads('{' + content.rstrip(',') + '}')['source']
+            source_lines.extend(value.splitlines())
+        elif content.startswith('"outputs": ['):
+            if not content.rstrip(',').endswith(']'):
+                section, depth = 'outputs', 1
+        elif kind == changed and content.startswith('"') and not re.match(r'"[\w-]+": ', content):
+            # 片段从源码数组中间开始：较短的字符串行视为源码，base64 等长行视为输出
+            if len(content) < 200:
+                source_lines.append(json.loads(content.rstrip(',')).rstrip('\n'))
+            else:
+                output_lines += 1
+    return source_lines, cells, output_lines
+
+
+def condense_notebook(path: str, body: List[str]) -> Optional[str]:
+    """笔记本：单元格增删、源码行变更，输出只统计行数"""
+    old, new = _views(body)
+    removed, removed_cells, old_outputs = _scan_notebook(old, '-')
+    added, added_cells, new_outputs = _scan_notebook(new, '+')
+
+    def cell_counts(cells: Dict[str, int]) -> str:
+        return '、'.join(f"{count} 个 {cell_type}" for cell_type, count in cells.items()) or '0 个'
+
+    lines = [f"单元格：新增 {cell_counts(added_cells)}，删除 {cell_counts(removed_cells)}；"
+             f"输出变更 {old_outputs + new_outputs} 行（已省略）"]
+    changes = [f"- {line}" for line in removed if line.strip()] + [f"+ {line}" for line in added if line.strip()]
+    if changes:
+        lines.append("源码变更：")
+        lines.extend(changes[:MAX_ITEMS * 2])
+        if len(changes) > MAX_ITEMS * 2:
+            lines.append(f"…另有 {len(changes) - MAX_ITEMS * 2} 行源码变更")
+    return '\n'.join(lines)
+
+
+# ---------- 锁文件 ----------
+
+# 锁文件格式：(包名行, 版本行) 或 (包名与版本在同一行, None)
+LOCKFILE_FORMATS: Dict[str, Tuple[str, Optional[str]]] = {
+    'package-lock.json': (r'^\s*"(?:[^"]*node_modules/)?(@?[^"/][^"]*)": \{$', r'^\s*"version": "([^"]+)"'),
+    'npm-shrinkwrap.json': (r'^\s*"(?:[^"]*node_modules/)?(@?[^"/][^"]*)": \{$', r'^\s*"version": "([^"]+)"'),
+    'yarn.lock': (r'^"?(@?[^@"\s]+)@', r'^\s+version:? "?([^"\s]+)"?'),
+    'poetry.lock': (r'^name = "([^"]+)"', r'^version = "([^"]+)"'),
+    'Cargo.lock': (r'^name = "([^"]+)"', r'^version = "([^"]+)"'),
+    'uv.lock': (r'^name = "([^"]+)"', r'^version = "([^"]+)"'),
+    'Pipfile.lock': (r'^\s*"([^"]+)": \{$', r'^\s*"version": "=*([^"]+)"'),
+    'composer.lock': (r'^\s*"name": "([^"]+)"', r'^\s*"version": "([^"]+)"'),
+    'Gemfile.lock': (r'^ {4}([\w.-]+) \(([^)]+)\)$', None),
+    'go.sum': (r'^(\S+) v?([^\s/]+)(?:/go\.mod)? ', None),
+    'pnpm-lock.yaml': (r"^\s+'?/?(@?[^@\s'/][^@\s']*)@([^:(\s']+)", None),
+}
+
+# JSON 锁文件中不是包名的键
+LOCKFILE_KEYS = {
+    'packages', 'dependencies', 'devDependencies', 'optionalDependencies', 'peerDependencies',
+    'peerDependenciesMeta', 'requires', 'engines', 'bin', 'funding', '_meta', 'default', 'develop',
+    'hashes', 'sources', 'pipfile-spec', 'dist', 'source', 'autoload', 'extra', 'support',
+}
+
+
+def _scan_lockfile(view: List[Tuple[str, str]], changed: str, name_pattern: 're.Pattern',
+                   version_pattern: Optional['re.Pattern']) -> Dict[str, Set[str]]:
+    """收集视图中变更行涉及的包版本"""
+    versions: Dict[str, Set[str]] = {}
+    current = ''
+    for kind, content in view:
+        if kind == '@':
+            current = ''
+            continue
+        match = name_pattern.match(content)
+        if match and version_pattern is None:
+            if kind == changed:
+                versions.setdefault(match.group(1), set()).add(match.group(2))
+            continue
+        if match and match.group(1) not in LOCKFILE_KEYS:
+            current = match.group(1)
+            continue
+        match = version_pattern.match(content) if version_pattern else None
+        if match and current and kind == changed:
+            versions.setdefault(current, set()).add(match.group(1))
+    return versions
+
+
+def condense_lockfile(path: str, body: List[str]) -> Optional[str]:
+    """锁文件：新增、移除和升级的依赖"""
+    name_regex, version_regex = LOCKFILE_FORMATS[path.rsplit('/', 1)[-1]]
+    name_pattern = re.compile(name_regex)
+    version_pattern = re.compile(version_regex) if version_regex else None
+    old, new = _views(body)
+    before = _scan_lockfile(old, '-', name_pattern, version_pattern)
+    after = _scan_lockfile(new, '+', name_pattern, version_pattern)
+    if not before and not after:
+        return None
+
+    upgraded, added, removed = [], [], []
+    for name in sorted(set(before) | set(after)):
+        old_versions, new_versions = before.get(name, set()), after.get(name, set())
+        if old_versions and new_versions:
+            if old_versions != new_versions:
+                upgraded.append(f"{name} {', '.join(sorted(old_versions))} → {', '.join(sorted(new_versions))}")
+        elif new_versions:
+            added.append(f"{name} {', '.join(sorted(new_versions))}")
+        else:
+            removed.append(f"{name} {', '.join(sorted(old_versions))}")
+
+    lines = [f"依赖变更：新增 {len(added)} 个，移除 {len(removed)} 个，升级 {len(upgraded)} 个"]
+    for title, items in (('升级', upgraded), ('新增', added), ('移除', removed)):
+        if items:
+            lines.append(f"{title}: {_limited(items)}")
+    return '\n'.join(lines)
+
+
+# ---------- SVG ----------
+
+def condense_svg(path: str, body: List[str]) -> Optional[str]:
+    """SVG：按元素统计变更"""
+    counts: Dict[str, Dict[str, int]] = {'+': {}, '-': {}}
+    lines = {'+': 0, '-': 0}
+    for line in body:
+        kind = line[:1]
+        if kind not in counts:
+            continue
+        lines[kind] += 1
+        for tag in re.findall(r'<([A-Za-z][\w:-]*)', line):
+            counts[kind][tag] = counts[kind].get(tag, 0) + 1
+
+    def describe(tags: Dict[str, int]) -> str:
+        return ', '.join(f"{tag}×{count}" for tag, count in sorted(tags.items(), key=lambda item: -item[1])) or '无'
+
+    return (f"+{lines['+']} -{lines['-']} 行；新增元素: {describe(counts['+'])}；"
+            f"删除元素: {describe(counts['-'])}")
+
+
+# ---------- 数据文件 ----------
+
+def _header(view: List[Tuple[str, str]], delimiter: str) -> Optional[List[str]]:
+    """片段从第 1 行开始时返回表头"""
+    for index, (kind, content) in enumerate(view):
+        if kind == '@' and re.match(r'^@@ -1(,\d+)? \+1(,\d+)? @@', content) and index + 1 < len(view):
+            return next(csv.reader([view[index + 1][1]], delimiter=delimiter))
+    return None
+
+
+def condense_data_file(path: str, body: List[str]) -> Optional[str]:
+    """数据文件：行数、列数和表头变更"""
+    delimiter = '\t' if path.endswith('.tsv') else ','
+    old, new = _views(body)
+    old_header, new_header = _header(old, delimiter), _header(new, delimiter)
+    header_changed = old_header is not None and new_header is not None and old_header != new_header
+
+    added = sum(1 for kind, _ in new if kind == '+') - (1 if header_changed else 0)
+    removed = sum(1 for kind, _ in old if kind == '-') - (1 if header_changed else 0)
+    line = f"数据行：+{added} -{removed}"
+    header = new_header or old_header
+    if header:
+        line += f"；列 ({len(header)}): {_limited(header, ', ')}"
+    if header_changed:
+        line += f"\n表头变更: {', '.join(old_header)} → {', '.join(new_header)}"
+    return line
+
+
+register_condenser(('*.ipynb',), 'Jupyter 笔记本', condense_notebook)
+register_condenser(tuple(LOCKFILE_FORMATS), '锁文件', condense_lockfile)
+register_condenser(('*.svg',), 'SVG 图像', condense_svg)
+register_condenser(('*.csv', '*.tsv'), '数据文件', condense_data_file)
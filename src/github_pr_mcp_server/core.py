@@ -2,14 +2,107 @@
 GitHub PR MCP Server 核心功能模块
 """
 
+import contextvars
 import json
 import hmac
 import hashlib
 import requests
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Optional, Any
-from openai import OpenAI
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+from urllib.parse import urlparse
+
+from .metrics import (
+    DIFF_FETCH_SECONDS,
+    LLM_SECONDS,
+    LLM_FIRST_TOKEN_SECONDS,
+    FEISHU_SEND_SECONDS,
+    END_TO_END_SECONDS,
+    FIRST_NOTIFICATION_SECONDS,
+    EVENTS_TOTAL,
+    UPSTREAM_ERRORS_TOTAL,
+    TOKENS_TOTAL,
+    TRIAGE_TOTAL,
+    DEGRADED_TOTAL,
+    MICROBATCH_SIZE,
+    error_code
+)
+from .tracing import current_span, span, trace_tag
+from .timings import collect, stage, record_cache, record_compression
+from .diffs import (
+    DiffRules, GitAttributes, GitAttributesCache, filter_diff, format_filtered_stats, split_file_diffs
+)
+from .symbols import (
+    SYMBOLS_ENABLED, OutlineCache, OutlineLoader, Symbol, extract_changed_symbols, format_changed_symbols,
+    git_blob_sha, outline
+)
+from .model_routing import TIER_MODELS, ModelPlan, plan_model
+from .routing import current_routes
+from .scheduling import SOURCE_LIVE
+from .triage import heuristic_summary, local_summary
+from .degradation import DigestBuffer
+from . import drafts
+from .microbatch import MAX_TOKENS as MICROBATCH_MAX_TOKENS, MicroBatcher
+
+
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+
+# 可以携带 GitHub 令牌的主机（GitHub API 或企业版 API 所在主机，以及 github.com）
+GITHUB_HOSTS = {urlparse(GITHUB_API_URL).hostname, 'github.com'}
+
+# 通过 GitHub API 获取 PR 差异时使用的媒体类型
+GITHUB_DIFF_MEDIA_TYPE = 'application/vnd.github.v3.diff'
+
+# 按 (仓库, 提交) 缓存的 .gitattributes
+GITATTRIBUTES_CACHE = GitAttributesCache()
+
+# 按仓库和 blob SHA 缓存的文件大纲
+OUTLINE_CACHE = OutlineCache()
+
+# 提示词中差异的最大长度（分块摘要时为每块的最大长度）
+PROMPT_DIFF_CHARS = 4000
+
+# 分块摘要的最大块数、并发数和每块要点的 max_tokens
+MAX_CHUNKS = int(os.getenv('MCP_MODEL_MAX_CHUNKS', 8))
+CHUNK_CONCURRENCY = int(os.getenv('MCP_MODEL_CHUNK_CONCURRENCY', 4))
+CHUNK_MAX_TOKENS = 300
+
+# 预处理后差异中每个文件的开头：原始差异或压缩后的文件
+_FILE_SEGMENT = re.compile(r'(?m)^(?=diff --git |### )')
+
+ANALYSIS_SYSTEM_PROMPT = """你是一个专业的代码审查助手。请分析以下 GitHub PR 的代码变更，并提供简洁、专业的摘要。
+
+要求：
+1. 识别主要的代码变更类型（新增、修改、删除）
+2. 分析变更的功能影响
+3. 指出潜在的问题或改进建议
+4. 使用中文回复
+5. 保持客观、专业的语调
+
+请按照以下格式输出：
+## 变更摘要
+[简要描述主要变更]
+
+## 详细分析
+[详细分析代码变更]
+
+## 建议
+[如果有的话，提供改进建议]"""
+
+
+CHUNK_SYSTEM_PROMPT = """你是一个专业的代码审查助手。以下是一个较大 GitHub PR 的部分代码变更。
+请用中文列出这部分变更的要点（每条一行，不超过 8 条），包括涉及的文件、函数和潜在问题，不要输出其他内容。"""
+
+MICROBATCH_SYSTEM_PROMPT = ANALYSIS_SYSTEM_PROMPT.replace(
+    "请分析以下 GitHub PR 的代码变更，并提供简洁、专业的摘要。",
+    "以下是同一仓库的多个小型 GitHub PR，请分别分析每个 PR 的代码变更，并为每个 PR 提供简洁、专业的摘要。"
+).replace("请按照以下格式输出：", "每个 PR 的摘要按照以下格式：") + """
+
+以 JSON 对象输出，每个 PR 一项，id 与输入中的编号一致：
+{"summaries": [{"id": "1", "summary": "该 PR 的摘要"}]}"""
 
 
 def verify_webhook_signature(payload: bytes, signature: str, secret: str) -> bool:
@@ -34,28 +127,330 @@ def extract_pr_info(payload: Dict[str, Any]) -> Dict[str, str]:
     }
 
 
-def get_pr_diff(diff_url: str, github_token: str = "") -> Optional[str]:
-    """获取 PR 差异内容"""
+# 获取差异时重试也无法成功的 HTTP 状态码（PR 或仓库不存在、请求无效、令牌无效）
+NON_RETRYABLE_STATUS = (400, 401, 404, 410, 422)
+
+
+def is_github_url(url: str) -> bool:
+    """地址是否指向 GitHub（见 GITHUB_HOSTS）；只有这些地址会携带 GitHub 令牌"""
+    return urlparse(url).hostname in GITHUB_HOSTS
+
+
+def get_pr_diff(diff_url: str, github_token: str = "", repository: str = "",
+                accept: str = "") -> Optional[str]:
+    """获取 PR 差异内容（通过 GitHub API 获取时需指定 accept 为 diff 媒体类型）"""
+    return fetch_pr_diff(diff_url, github_token, repository, accept)[0]
+
+
+def fetch_pr_diff(diff_url: str, github_token: str = "", repository: str = "",
+                  accept: str = "") -> Tuple[Optional[str], bool]:
+    """
+    获取 PR 差异内容
+
+    Returns:
+        (差异内容，失败时为 None, 失败后是否值得重试)
+    """
     try:
         headers = {}
-        if github_token:
+        # 差异地址可能来自调用方，令牌只发给 GitHub
+        if github_token and is_github_url(diff_url):
             headers['Authorization'] = f'token {github_token}'
+        if accept:
+            headers['Accept'] = accept
         
-        response = requests.get(diff_url, headers=headers, timeout=10)
+        with DIFF_FETCH_SECONDS.time(repository=repository), stage('fetch'):
+            response = requests.get(diff_url, headers=headers, timeout=10)
+        response.raise_for_status()
+        return response.text, True
+    except Exception as e:
+        UPSTREAM_ERRORS_TOTAL.inc(repository=repository, upstream='github', code=error_code(e))
+        print(f"获取 PR 差异失败: {e}{trace_tag()}")
+        status = getattr(getattr(e, 'response', None), 'status_code', None)
+        return None, status not in NON_RETRYABLE_STATUS
+
+
+def get_pull_request(repository: str, number: str, github_token: str = "") -> Optional[Dict[str, Any]]:
+    """通过 GitHub API 获取 PR 元数据（提交、变更统计等）；失败时返回 None"""
+    try:
+        headers = {'Authorization': f'token {github_token}'} if github_token else {}
+        with stage('fetch'):
+            response = requests.get(f"{GITHUB_API_URL}/repos/{repository}/pulls/{number}",
+                                    headers=headers, timeout=10)
         response.raise_for_status()
-        return response.text
+        return response.json()
     except Exception as e:
-        print(f"获取 PR 差异失败: {e}")
+        UPSTREAM_ERRORS_TOTAL.inc(repository=repository, upstream='github', code=error_code(e))
+        print(f"获取 PR 信息失败: {e}{trace_tag()}")
         return None
 
 
-def analyze_code_changes(diff_content: str, openai_api_key: str = "") -> str:
+def get_gitattributes(repository: str, github_token: str = "", ref: str = "") -> GitAttributes:
+    """获取仓库在指定提交的 .gitattributes（按仓库和提交缓存）；不存在或获取失败时为空"""
+    key = (repository, ref)
+    attributes = GITATTRIBUTES_CACHE.get(key)
+    record_cache('gitattributes', attributes is not None, repository)
+    if attributes is not None:
+        return attributes
+    
+    try:
+        headers = {'Accept': 'application/vnd.github.raw'}
+        if github_token:
+            headers['Authorization'] = f'token {github_token}'
+        with stage('fetch'):
+            response = requests.get(
+                f"{GITHUB_API_URL}/repos/{repository}/contents/.gitattributes",
+                params={'ref': ref} if ref else None,
+                headers=headers,
+                timeout=10
+            )
+        if response.status_code == 404:
+            attributes = GitAttributes()
+        else:
+            response.raise_for_status()
+            attributes = GitAttributes(response.text)
+    except Exception as e:
+        UPSTREAM_ERRORS_TOTAL.inc(repository=repository, upstream='github', code=error_code(e))
+        print(f"获取 .gitattributes 失败: {e}{trace_tag()}")
+        return GitAttributes()
+    
+    GITATTRIBUTES_CACHE.put(key, attributes)
+    return attributes
+
+
+def get_outline(repository: str, github_token: str, path: str, blob_sha: str,
+                ref: str = "") -> Optional[List[Symbol]]:
+    """
+    获取文件在指定提交的大纲（按仓库和 blob SHA 缓存）
+
+    差异的修改前一侧是 PR 与基础分支的合并基点，基础分支在 PR 创建后有新提交时，
+    base 提交中的文件可能与差异不一致；读取的内容与 blob SHA 不一致时不使用也不缓存。
+
+    Args:
+        repository: 仓库全名
+        github_token: GitHub 令牌
+        path: 文件路径
+        blob_sha: 差异 index 行中的 blob SHA（可能是缩写），用于校验内容和作为缓存键
+        ref: 读取文件内容的提交
+
+    Returns:
+        符号列表；读取失败、内容与 blob SHA 不一致或无法解析时返回 None
+    """
+    key = (repository, blob_sha)
+    symbols = OUTLINE_CACHE.get(key)
+    record_cache('ast', symbols is not None, repository)
+    if symbols is not None:
+        return symbols
+    
+    try:
+        headers = {'Accept': 'application/vnd.github.raw'}
+        if github_token:
+            headers['Authorization'] = f'token {github_token}'
+        with stage('fetch'):
+            response = requests.get(
+                f"{GITHUB_API_URL}/repos/{repository}/contents/{requests.utils.quote(path)}",
+                params={'ref': ref} if ref else None,
+                headers=headers,
+                timeout=10
+            )
+        response.raise_for_status()
+    except Exception as e:
+        UPSTREAM_ERRORS_TOTAL.inc(repository=repository, upstream='github', code=error_code(e))
+        print(f"获取文件 {path} 失败: {e}{trace_tag()}")
+        return None
+    
+    if not git_blob_sha(response.content).startswith(blob_sha):
+        print(f"文件 {path} 在 {ref or '默认分支'} 的内容与差异不一致，跳过语法对比{trace_tag()}")
+        return None
+    symbols = outline(path, response.text)
+    if symbols is not None:
+        OUTLINE_CACHE.put(key, symbols)
+    return symbols
+
+
+def outline_loader(repository: str, github_token: str, base_ref: str, head_ref: str) -> OutlineLoader:
+    """按差异两侧的提交读取大纲的函数（见 symbols.file_symbols）"""
+    def load(path: str, blob_sha: str, side: str) -> Optional[List[Symbol]]:
+        return get_outline(repository, github_token, path, blob_sha, head_ref if side == 'new' else base_ref)
+    return load
+
+
+def load_diff_rules(repository: str, github_token: str = "", ref: str = "",
+                    base_ref: str = "") -> DiffRules:
+    """
+    加载仓库的差异过滤规则：内置规则、MCP_DIFF_EXCLUDE、路由表中的 diff_exclude 和仓库的 .gitattributes
+
+    Args:
+        repository: 仓库全名
+        github_token: GitHub 令牌
+        ref: 读取 .gitattributes 的提交（默认分支为空），也是读取修改后文件内容的提交
+        base_ref: 读取修改前文件内容的提交；与 ref 都给出时按语法结构提取变更符号
+    """
+    route = current_routes().resolve(repository)
+    exclude = route.diff_exclude if route is not None else []
+    with span('diff_rules_load', repository=repository):
+        gitattributes = get_gitattributes(repository, github_token, ref) if repository else None
+    outlines = outline_loader(repository, github_token, base_ref, ref) \
+        if repository and ref and base_ref and SYMBOLS_ENABLED else None
+    return DiffRules.from_env(exclude, gitattributes, outlines)
+
+
+def changed_symbols(diff_content: str, rules: Optional[DiffRules] = None) -> List[str]:
+    """
+    列出差异中新增、修改和删除的函数、类和方法（被过滤的文件除外）
+
+    Args:
+        diff_content: GitHub PR 差异内容
+        rules: 文件过滤规则；带有大纲读取函数时按语法结构对比修改前后的文件
+
+    Returns:
+        每个文件一行的变更符号；MCP_DIFF_SYMBOLS=0 时为空列表
+    """
+    if not SYMBOLS_ENABLED:
+        return []
+    rules = rules or DiffRules.from_env()
+    with span('symbol_extract') as symbol_span:
+        files = [file for file in split_file_diffs(diff_content) if rules.classify(file) == '']
+        lines = extract_changed_symbols(files, rules.outlines)
+        symbol_span.set_attribute('files', len(lines))
+    return lines
+
+
+def prepare_diff_for_prompt(diff_content: str, max_chars: int = PROMPT_DIFF_CHARS,
+                            rules: Optional[DiffRules] = None, repository: str = "") -> str:
+    """
+    预处理 PR 差异，生成放入提示词的文本：过滤生成文件、第三方代码和二进制文件，
+    压缩笔记本、锁文件等，精简其余差异后截断；变更符号列表放在最前面
+
+    Args:
+        diff_content: GitHub PR 差异内容
+        max_chars: 提示词中差异的最大长度，0 表示不截断
+        rules: 文件过滤规则，默认为内置规则和 MCP_DIFF_EXCLUDE
+        repository: 仓库全名，用于指标标签
+
+    Returns:
+        预处理后的差异文本
+    """
+    prepared, filtered, minify_stats = filter_diff(diff_content, rules)
+    if filtered:
+        # 统计放在前面，截断只影响保留下来的差异
+        prepared = f"{format_filtered_stats(filtered)}\n\n{prepared}"
+    symbols = changed_symbols(diff_content, rules)
+    if symbols:
+        prepared = f"{format_changed_symbols(symbols)}\n\n{prepared}"
+    
+    record_compression(len(diff_content), len(prepared), repository)
+    current = current_span()
+    if current is not None:
+        current.set_attribute('filtered_files', len(filtered))
+        for key, value in minify_stats.items():
+            current.set_attribute(key, value)
+    return prepared[:max_chars] if max_chars else prepared
+
+
+def _analysis_messages(prepared: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+        {"role": "user", "content": f"请分析以下 GitHub PR 的代码变更：\n\n{prepared}"}
+    ]
+
+
+def build_analysis_messages(diff_content: str, rules: Optional[DiffRules] = None,
+                            repository: str = "") -> List[Dict[str, str]]:
+    """构建 AI 分析的对话消息"""
+    return _analysis_messages(prepare_diff_for_prompt(diff_content, rules=rules, repository=repository))
+
+
+def prepare_diff_chunks(diff_content: str, rules: Optional[DiffRules] = None, repository: str = "",
+                        chunk_chars: int = PROMPT_DIFF_CHARS) -> Tuple[str, List[str]]:
+    """
+    预处理 PR 差异并按文件分块，用于分块摘要
+
+    Args:
+        diff_content: GitHub PR 差异内容
+        rules: 文件过滤规则（可选）
+        repository: 仓库全名，用于指标标签
+        chunk_chars: 每块的最大长度；单个文件超过时截断
+
+    Returns:
+        (变更符号和已省略文件的说明, 最多 MCP_MODEL_MAX_CHUNKS 块差异)
+    """
+    prepared = prepare_diff_for_prompt(diff_content, max_chars=0, rules=rules, repository=repository)
+    pieces = _FILE_SEGMENT.split(prepared)
+    preamble = '' if _FILE_SEGMENT.match(prepared) else pieces.pop(0).strip()
+    chunks: List[str] = []
+    for piece in pieces:
+        piece = piece.strip()[:chunk_chars]
+        if chunks and len(chunks[-1]) + len(piece) + 1 <= chunk_chars:
+            chunks[-1] = f"{chunks[-1]}\n{piece}"
+        else:
+            chunks.append(piece)
+    if len(chunks) > MAX_CHUNKS:
+        preamble = f"{preamble}\n\n（差异过大，只分析了前 {MAX_CHUNKS} 块，另有 {len(chunks) - MAX_CHUNKS} 块未分析）"
+        chunks = chunks[:MAX_CHUNKS]
+    return preamble.strip(), chunks
+
+
+def _record_usage(llm_span, usage, repository: str, model: str):
+    """记录 LLM token 用量"""
+    llm_span.set_attribute('prompt_tokens', usage.prompt_tokens)
+    llm_span.set_attribute('completion_tokens', usage.completion_tokens)
+    TOKENS_TOTAL.inc(usage.prompt_tokens, repository=repository, model=model, kind='prompt')
+    TOKENS_TOTAL.inc(usage.completion_tokens, repository=repository, model=model, kind='completion')
+
+
+def _complete(client, messages: List[Dict[str, str]], model: str, max_tokens: int,
+              repository: str, response_format: Optional[Dict[str, str]] = None, **attributes) -> str:
+    """调用一次 LLM 并记录耗时和 token 用量"""
+    options = {'response_format': response_format} if response_format else {}
+    llm_timer = LLM_SECONDS.time(repository=repository, model=model)
+    with llm_timer, stage('llm'), span('llm_call', model=model, **attributes) as llm_span:
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=0.3,
+            **options
+        )
+    
+    if response.usage:
+        _record_usage(llm_span, response.usage, repository, model)
+    
+    return response.choices[0].message.content
+
+
+def _summarize_chunks(client, preamble: str, chunks: List[str], plan: ModelPlan, repository: str) -> str:
+    """分块摘要：各块并发用 fast 档位提取要点，再用选定的模型汇总"""
+    def summarize_chunk(index: int, chunk: str) -> str:
+        messages = [
+            {"role": "system", "content": CHUNK_SYSTEM_PROMPT},
+            {"role": "user", "content": f"第 {index + 1}/{len(chunks)} 部分：\n\n{chunk}"}
+        ]
+        return _complete(client, messages, TIER_MODELS['fast'], CHUNK_MAX_TOKENS, repository,
+                         chunk=index)
+    
+    with ThreadPoolExecutor(max_workers=min(CHUNK_CONCURRENCY, len(chunks)),
+                            thread_name_prefix='mcp-chunk') as pool:
+        futures = [pool.submit(contextvars.copy_context().run, summarize_chunk, index, chunk)
+                   for index, chunk in enumerate(chunks)]
+        notes = [future.result() for future in futures]
+    
+    parts = '\n\n'.join(f"### 第 {index + 1} 部分\n{note}" for index, note in enumerate(notes))
+    prepared = f"{preamble}\n\n各部分变更要点：\n\n{parts}" if preamble else f"各部分变更要点：\n\n{parts}"
+    return _complete(client, _analysis_messages(prepared), plan.model, plan.max_tokens, repository,
+                     strategy='chunked')
+
+
+def analyze_code_changes(diff_content: str, openai_api_key: str = "", repository: str = "",
+                         diff_rules: Optional[DiffRules] = None, plan: Optional[ModelPlan] = None) -> str:
     """
     使用 AI 分析代码变更
     
     Args:
         diff_content: GitHub PR 差异内容
         openai_api_key: OpenAI API 密钥
+        repository: 仓库全名，用于指标标签
+        diff_rules: 文件过滤规则（可选）
+        plan: 模型选择（可选），默认按差异的规模和特征选择
         
     Returns:
         AI 生成的代码变更摘要
@@ -64,43 +459,181 @@ def analyze_code_changes(diff_content: str, openai_api_key: str = "") -> str:
         return "❌ OpenAI API 密钥未配置，无法进行 AI 分析"
     
     try:
+        # 延迟导入 OpenAI SDK，避免拖慢包的导入和服务启动
+        from openai import OpenAI
         client = OpenAI(api_key=openai_api_key)
+        plan = plan or plan_model(diff_content=diff_content)
+        
+        with span('prompt_build', diff_chars=len(diff_content), tier=plan.tier,
+                  strategy=plan.strategy) as prompt_span, stage('render'):
+            if plan.strategy == 'chunked':
+                preamble, chunks = prepare_diff_chunks(diff_content, diff_rules, repository)
+            else:
+                preamble, chunks = '', [prepare_diff_for_prompt(diff_content, rules=diff_rules,
+                                                                repository=repository)]
+            prompt_span.set_attribute('chunks', len(chunks))
+            prompt_span.set_attribute('prompt_chars', len(preamble) + sum(len(chunk) for chunk in chunks))
         
-        system_prompt = """你是一个专业的代码审查助手。请分析以下 GitHub PR 的代码变更，并提供简洁、专业的摘要。
+        # 预处理后只有一块时不需要分块
+        if len(chunks) > 1:
+            return _summarize_chunks(client, preamble, chunks, plan, repository)
+        prepared = '\n\n'.join(part for part in (preamble, chunks[0] if chunks else '') if part)
+        return _complete(client, _analysis_messages(prepared), plan.model, plan.max_tokens, repository)
+        
+    except Exception as e:
+        UPSTREAM_ERRORS_TOTAL.inc(repository=repository, upstream='openai', code=error_code(e))
+        return f"❌ AI 分析失败: {str(e)}"
 
-要求：
-1. 识别主要的代码变更类型（新增、修改、删除）
-2. 分析变更的功能影响
-3. 指出潜在的问题或改进建议
-4. 使用中文回复
-5. 保持客观、专业的语调
 
-请按照以下格式输出：
-## 变更摘要
-[简要描述主要变更]
+def _summarize_microbatch(key: Tuple[str, str, str, int], items: List[Dict[str, str]]) -> List[Optional[str]]:
+    """
+    合批执行：一次要求 JSON 输出的 LLM 请求为多个小 PR 生成摘要
 
-## 详细分析
-[详细分析代码变更]
+    Args:
+        key: (仓库全名, OpenAI API 密钥, 模型, 每个 PR 的 max_tokens)
+        items: 各 PR 的 {'number', 'title', 'prepared'}
 
-## 建议
-[如果有的话，提供改进建议]"""
+    Returns:
+        各 PR 的摘要；批量结果中缺少的 PR 为 None（由调用方单独分析）
+    """
+    repository, openai_api_key, model, max_tokens = key
+    MICROBATCH_SIZE.observe(len(items), repository=repository)
+    sections = '\n\n'.join(f"=== PR {index}：#{item['number']} {item['title']} ===\n{item['prepared']}"
+                            for index, item in enumerate(items, 1))
+    messages = [
+        {"role": "system", "content": MICROBATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": f"请分别分析以下 {len(items)} 个 GitHub PR 的代码变更：\n\n{sections}"}
+    ]
+    try:
+        from openai import OpenAI
+        client = OpenAI(api_key=openai_api_key)
+        content = _complete(client, messages, model, min(max_tokens * len(items), MICROBATCH_MAX_TOKENS),
+                            repository, response_format={'type': 'json_object'}, microbatch=len(items))
+    except Exception as e:
+        UPSTREAM_ERRORS_TOTAL.inc(repository=repository, upstream='openai', code=error_code(e))
+        return [f"❌ AI 分析失败: {str(e)}"] * len(items)
 
-        user_prompt = f"请分析以下 GitHub PR 的代码变更：\n\n{diff_content[:4000]}"  # 限制长度
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.3
+    try:
+        entries = json.loads(content).get('summaries', [])
+    except (TypeError, ValueError, AttributeError):
+        print(f"⚠️ 合批结果不是有效的 JSON，逐项单独分析{trace_tag()}")
+        entries = []
+    summaries = {str(entry.get('id', '')): entry.get('summary') for entry in entries if isinstance(entry, dict)}
+    results = [summaries.get(str(index)) for index in range(1, len(items) + 1)]
+    return [summary if isinstance(summary, str) and summary.strip() else None for summary in results]
+
+
+# 进程内共享的合批器：键为 (仓库, 密钥, 模型, max_tokens)
+MICROBATCHER = MicroBatcher(_summarize_microbatch)
+
+
+def analyze_microbatched(diff_content: str, pr_info: Dict[str, Any], openai_api_key: str = "",
+                         diff_rules: Optional[DiffRules] = None, plan: Optional[ModelPlan] = None) -> str:
+    """
+    与同一仓库的其他小 PR 合批进行 AI 分析；窗口内没有其他 PR 或批量结果中缺少该 PR 时单独分析
+
+    Args:
+        diff_content: GitHub PR 差异内容
+        pr_info: PR 信息（编号和标题用于区分批内的 PR）
+        openai_api_key: OpenAI API 密钥
+        diff_rules: 文件过滤规则（可选）
+        plan: 模型选择（可选），默认按差异的规模和特征选择
+
+    Returns:
+        AI 生成的代码变更摘要
+    """
+    if not openai_api_key:
+        return "❌ OpenAI API 密钥未配置，无法进行 AI 分析"
+
+    repository = pr_info.get('repository', '')
+    plan = plan or plan_model(diff_content=diff_content)
+    with span('prompt_build', diff_chars=len(diff_content), tier=plan.tier,
+              strategy='microbatch') as prompt_span, stage('render'):
+        prepared = prepare_diff_for_prompt(diff_content, rules=diff_rules, repository=repository)
+        prompt_span.set_attribute('prompt_chars', len(prepared))
+
+    with span('microbatch', model=plan.model):
+        summary = MICROBATCHER.submit(
+            (repository, openai_api_key, plan.model, plan.max_tokens),
+            {'number': pr_info.get('number', ''), 'title': pr_info.get('title', ''), 'prepared': prepared},
+            len(prepared)
         )
+    if summary is not None:
+        return summary
+
+    try:
+        from openai import OpenAI
+        client = OpenAI(api_key=openai_api_key)
+        return _complete(client, _analysis_messages(prepared), plan.model, plan.max_tokens, repository)
+    except Exception as e:
+        UPSTREAM_ERRORS_TOTAL.inc(repository=repository, upstream='openai', code=error_code(e))
+        return f"❌ AI 分析失败: {str(e)}"
+
+
+def stream_code_changes(diff_content: str, openai_api_key: str = "", repository: str = "",
+                        diff_rules: Optional[DiffRules] = None,
+                        plan: Optional[ModelPlan] = None) -> Iterator[str]:
+    """
+    使用 AI 流式分析代码变更（stream=True），每收到一段输出就产出一次累计的摘要
+
+    流式输出总是单次调用：模型和 max_tokens 按模型选择，不做分块摘要。
+
+    生成器跨 yield 持有 span 和耗时上下文；在 Gradio 等逐步于不同线程驱动生成器的
+    场景中，需要用 tracing.run_in_context 包装。
+    
+    Args:
+        diff_content: GitHub PR 差异内容
+        openai_api_key: OpenAI API 密钥
+        repository: 仓库全名，用于指标标签
+        diff_rules: 文件过滤规则（可选）
+        plan: 模型选择（可选），默认按差异的规模和特征选择
+        
+    Yields:
+        截至目前的摘要文本；出错时最后一次产出以 "❌" 开头的错误说明
+    """
+    if not openai_api_key:
+        yield "❌ OpenAI API 密钥未配置，无法进行 AI 分析"
+        return
+    
+    summary = ""
+    try:
+        from openai import OpenAI
+        client = OpenAI(api_key=openai_api_key)
+        
+        plan = plan or plan_model(diff_content=diff_content)
         
-        return response.choices[0].message.content
+        with span('prompt_build', diff_chars=len(diff_content), tier=plan.tier) as prompt_span, stage('render'):
+            messages = build_analysis_messages(diff_content, diff_rules, repository)
+            prompt_span.set_attribute('prompt_chars', len(messages[-1]['content']))
+        
+        model = plan.model
+        llm_timer = LLM_SECONDS.time(repository=repository, model=model)
+        with llm_timer, stage('llm'), span('llm_call', model=model, stream=True) as llm_span:
+            start = time.perf_counter()
+            stream = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=plan.max_tokens,
+                temperature=0.3,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            for chunk in stream:
+                if chunk.usage:
+                    _record_usage(llm_span, chunk.usage, repository, model)
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if not summary:
+                    first_token = time.perf_counter() - start
+                    LLM_FIRST_TOKEN_SECONDS.observe(first_token, repository=repository, model=model)
+                    llm_span.set_attribute('first_token_ms', round(first_token * 1000, 1))
+                summary += chunk.choices[0].delta.content
+                yield summary
         
     except Exception as e:
-        return f"❌ AI 分析失败: {str(e)}"
+        UPSTREAM_ERRORS_TOTAL.inc(repository=repository, upstream='openai', code=error_code(e))
+        error = f"❌ AI 分析失败: {str(e)}"
+        yield f"{summary}\n\n{error}" if summary else error
 
 
 def format_feishu_message(pr_info: Dict[str, str], summary: str) -> Dict[str, Any]:
@@ -124,24 +657,64 @@ def format_feishu_message(pr_info: Dict[str, str], summary: str) -> Dict[str, An
     }
 
 
-def send_summary_to_feishu(message: Dict[str, Any], webhook_url: str) -> bool:
+def send_summary_to_feishu(message: Dict[str, Any], webhook_url: str, repository: str = "") -> bool:
     """发送摘要到飞书"""
     try:
-        response = requests.post(
-            webhook_url,
-            json=message,
-            headers={'Content-Type': 'application/json'},
-            timeout=10
-        )
+        with FEISHU_SEND_SECONDS.time(repository=repository), stage('send'):
+            response = requests.post(
+                webhook_url,
+                json=message,
+                headers={'Content-Type': 'application/json'},
+                timeout=10
+            )
         response.raise_for_status()
         return True
     except Exception as e:
-        print(f"发送到飞书失败: {e}")
+        UPSTREAM_ERRORS_TOTAL.inc(repository=repository, upstream='feishu', code=error_code(e))
+        print(f"发送到飞书失败: {e}{trace_tag()}")
         return False
 
 
+def summarize_changes(diff_content: str, pr_info: Dict[str, Any], openai_api_key: str = "",
+                      diff_rules: Optional[DiffRules] = None, plan: Optional[ModelPlan] = None,
+                      heuristic_only: bool = False) -> Tuple[str, str]:
+    """
+    生成 PR 摘要：简单 PR 直接用本地模板，其余交给 AI 分析（开启 MCP_MICROBATCH 时小 PR 合批分析）
+    
+    Args:
+        diff_content: PR 差异内容
+        pr_info: PR 信息（用于模板中的作者和标题）
+        openai_api_key: OpenAI API 密钥
+        diff_rules: 文件过滤规则（可选）
+        plan: 模型选择（可选）
+        heuristic_only: 为 True 时不调用 AI，所有 PR 都用本地规则摘要（积压降级）
+        
+    Returns:
+        (本地摘要类别、'heuristic' 或 'llm', 摘要)
+    """
+    repository = pr_info.get('repository', '')
+    with span('triage') as triage_span:
+        if heuristic_only:
+            local = heuristic_summary(diff_content, pr_info, diff_rules)
+        else:
+            local = local_summary(diff_content, pr_info, diff_rules)
+        triage = local[0] if local else 'llm'
+        triage_span.set_attribute('kind', triage)
+    TRIAGE_TOTAL.inc(repository=repository, kind=triage)
+    if local:
+        return local
+    plan = plan or plan_model(diff_content=diff_content)
+    # 小 PR 可与同一仓库的其他小 PR 合批
+    if MICROBATCHER.enabled and plan.tier == 'fast' and plan.strategy == 'single':
+        return triage, analyze_microbatched(diff_content, pr_info, openai_api_key, diff_rules, plan)
+    return triage, analyze_code_changes(diff_content, openai_api_key, repository, diff_rules, plan)
+
+
 def process_github_pr(diff_content: str, pr_info: Dict[str, str], 
-                     openai_api_key: str = "", feishu_webhook_url: str = "") -> Dict[str, Any]:
+                     openai_api_key: str = "", feishu_webhook_url: str = "",
+                     diff_rules: Optional[DiffRules] = None,
+                     plan: Optional[ModelPlan] = None, degradation: str = 'full',
+                     draft: Optional[drafts.DraftCard] = None) -> Dict[str, Any]:
     """
     处理 GitHub PR
     
@@ -150,32 +723,206 @@ def process_github_pr(diff_content: str, pr_info: Dict[str, str],
         pr_info: PR 信息
         openai_api_key: OpenAI API 密钥
         feishu_webhook_url: 飞书 Webhook URL
+        diff_rules: 文件过滤规则（可选）
+        plan: 模型选择（可选），默认按差异的规模和特征选择
+        degradation: 处理模式（见 degradation）：cheap 使用 fast 档位，heuristic 不调用 AI
+        draft: 已发送的草稿卡片（可选），给出时原地更新卡片而不是另发 Webhook 消息
         
     Returns:
         处理结果
     """
-    try:
-        # AI 分析
-        summary = analyze_code_changes(diff_content, openai_api_key)
-        
-        # 发送到飞书（如果配置了）
-        feishu_sent = False
-        if feishu_webhook_url and not summary.startswith("❌"):
-            feishu_message = format_feishu_message(pr_info, summary)
-            feishu_sent = send_summary_to_feishu(feishu_message, feishu_webhook_url)
-        
-        return {
-            'status': 'success',
-            'pr_number': pr_info['number'],
-            'pr_title': pr_info['title'],
-            'summary': summary,
-            'feishu_sent': feishu_sent,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        return {
-            'status': 'error',
-            'error': str(e),
-            'timestamp': datetime.now().isoformat()
-        } 
\ No newline at end of file
+    with collect() as timings:
+        try:
+            repository = pr_info.get('repository', '')
+            
+            with span('process_github_pr', repository=repository, pr_number=pr_info.get('number', '')):
+                # AI 分析（简单 PR 使用本地摘要）
+                plan = plan or plan_model(diff_content=diff_content)
+                if degradation == 'cheap':
+                    plan = ModelPlan('fast', reasons=['队列积压，降级为 fast 档位'])
+                triage, summary = summarize_changes(diff_content, pr_info, openai_api_key, diff_rules, plan,
+                                                    heuristic_only=degradation == 'heuristic')
+                
+                # 发送到飞书（如果配置了）：有草稿卡片时更新卡片，更新失败再退回 Webhook 消息
+                feishu_sent = False
+                if draft is not None:
+                    with span('notification', sink='feishu_card'):
+                        feishu_sent = draft.finish(summary, repository)
+                if not feishu_sent and feishu_webhook_url and not summary.startswith("❌"):
+                    with span('notification', sink='feishu'):
+                        with stage('render'):
+                            feishu_message = format_feishu_message(pr_info, summary)
+                        feishu_sent = send_summary_to_feishu(feishu_message, feishu_webhook_url, repository)
+            
+            return {
+                'status': 'success',
+                'pr_number': pr_info['number'],
+                'pr_title': pr_info['title'],
+                'summary': summary,
+                'triage': triage,
+                'model_plan': plan.to_dict() if triage == 'llm' else None,
+                'feishu_sent': feishu_sent,
+                'timestamp': datetime.now().isoformat(),
+                'timings': timings.to_dict()
+            }
+            
+        except Exception as e:
+            return {
+                'status': 'error',
+                'error': str(e),
+                'timestamp': datetime.now().isoformat(),
+                'timings': timings.to_dict()
+            }
+
+
+def format_digest_message(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """格式化积压期间的 PR 汇总消息"""
+    lines = [[{"tag": "text", "text": f"⏳ 系统繁忙，以下 {len(entries)} 个 PR 暂未生成摘要：\n"}]]
+    for entry in entries:
+        lines.append([{
+            "tag": "text",
+            "text": f"• {entry['repository']}#{entry['number']} {entry['title']}（{entry['user']}，"
+                    f"+{entry['additions']} -{entry['deletions']}，{entry['changed_files']} 个文件）\n"
+        }, {"tag": "a", "text": "查看", "href": entry['html_url']}])
+    return {
+        "msg_type": "post",
+        "content": {"post": {"zh_cn": {"title": f"PR 汇总（{len(entries)} 个）", "content": lines}}}
+    }
+
+
+def send_digest_to_feishu(webhook_url: str, entries: List[Dict[str, Any]], repository: str = "") -> bool:
+    """发送 PR 汇总到飞书"""
+    with span('notification', sink='feishu', digest=len(entries)):
+        return send_summary_to_feishu(format_digest_message(entries), webhook_url, repository)
+
+
+# digest 模式下待发送的 PR 汇总（每个进程一份）
+DIGEST = DigestBuffer(send_digest_to_feishu)
+
+# 需要生成摘要的 PR 事件
+PR_ACTIONS = ('opened', 'synchronize', 'reopened')
+
+
+def post_pr_draft(payload: Dict[str, Any]) -> Optional[drafts.DraftCard]:
+    """
+    PR 事件到达后立即发送草稿卡片（载荷中的元数据和变更统计）
+
+    Args:
+        payload: GitHub Webhook 载荷
+
+    Returns:
+        草稿卡片；非 PR 事件、仓库未配置接收群或发送失败时返回 None
+    """
+    if payload.get('action') not in PR_ACTIONS:
+        return None
+    pr_info = extract_pr_info(payload)
+    route = current_routes().resolve(pr_info['repository'])
+    chat_id = route.feishu_chat_id if route is not None else ''
+    if not drafts.enabled(chat_id):
+        return None
+    with span('notification', sink='feishu_card', phase='draft'):
+        return drafts.post_draft(chat_id, pr_info, drafts.pr_overview(payload), pr_info['repository'])
+
+
+def process_webhook_payload(webhook_payload: str, openai_api_key: str = "",
+                            feishu_webhook_url: str = "", github_token: str = "",
+                            degradation: str = 'full', draft_message_id: str = '',
+                            source: str = SOURCE_LIVE) -> Dict[str, Any]:
+    """
+    处理 GitHub Webhook 载荷：发送草稿卡片、获取差异、AI 分析并发送到飞书
+
+    Args:
+        webhook_payload: GitHub Webhook 载荷的 JSON 字符串
+        openai_api_key: OpenAI API 密钥
+        feishu_webhook_url: 飞书 Webhook URL
+        github_token: GitHub 令牌
+        degradation: 处理模式（见 degradation）；digest 不获取差异，只把 PR 加入汇总通知
+        draft_message_id: 入队前已发送的草稿卡片的消息 ID（可选），未给出时在这里发送草稿
+        source: 事件来源（见 scheduling）；只有实时事件发送草稿卡片
+
+    Returns:
+        处理结果
+    """
+    start = time.perf_counter()
+    repository, event_type, first_notified = '', '', bool(draft_message_id)
+    # 登记为可能合批的调用方，使并发事件的小 PR 能进入同一批次
+    with MICROBATCHER.track(), span('process_webhook_payload') as root_span, collect() as timings:
+        try:
+            with span('payload_parse', payload_bytes=len(webhook_payload)):
+                payload = json.loads(webhook_payload)
+            event_type = payload.get('action', '')
+            repository = payload.get('repository', {}).get('full_name', '')
+            root_span.set_attribute('repository', repository)
+            root_span.set_attribute('action', event_type)
+
+            pr_info = extract_pr_info(payload) if event_type in PR_ACTIONS else {}
+            draft = drafts.DraftCard(draft_message_id, pr_info, drafts.pr_overview(payload)) \
+                if draft_message_id and pr_info else None
+
+            if pr_info and degradation == 'digest':
+                result = {
+                    'status': 'success',
+                    'pr_number': pr_info['number'],
+                    'pr_title': pr_info['title'],
+                    'summary': '',
+                    'timestamp': datetime.now().isoformat()
+                }
+                # 已有草稿卡片的 PR 只在卡片上注明暂不生成摘要，不再加入汇总
+                if draft is not None:
+                    with span('notification', sink='feishu_card'):
+                        result['feishu_sent'] = draft.finish('', repository)
+                else:
+                    pull_request = payload.get('pull_request', {})
+                    DIGEST.add(feishu_webhook_url, dict(pr_info, **{
+                        key: pull_request.get(key, 0) for key in ('additions', 'deletions', 'changed_files')
+                    }), repository)
+                    result['digest_pending'] = DIGEST.size()
+            elif pr_info:
+                if draft is None and source == SOURCE_LIVE:
+                    draft = post_pr_draft(payload)
+                    if draft is not None:
+                        first_notified = True
+                        FIRST_NOTIFICATION_SECONDS.observe(time.perf_counter() - start, repository=repository)
+                pull_request = payload.get('pull_request', {})
+                with span('diff_fetch'):
+                    diff_content, retryable = fetch_pr_diff(pr_info['diff_url'], github_token, repository)
+
+                if diff_content:
+                    head_sha = (pull_request.get('head') or {}).get('sha', '')
+                    base_sha = (pull_request.get('base') or {}).get('sha', '')
+                    diff_rules = load_diff_rules(repository, github_token, head_sha, base_sha)
+                    # 按载荷中的规模和差异特征选择模型
+                    plan = plan_model(pull_request, diff_content)
+                    root_span.set_attribute('model_tier', plan.tier)
+                    result = process_github_pr(diff_content, pr_info, openai_api_key, feishu_webhook_url,
+                                               diff_rules, plan, degradation, draft)
+                else:
+                    result = {'error': '获取 PR 差异失败', 'status': 'error', 'retryable': retryable}
+                    if draft is not None:
+                        with span('notification', sink='feishu_card'):
+                            draft.finish(f"❌ {result['error']}", repository)
+                if draft is not None:
+                    result['feishu_message_id'] = draft.message_id
+            else:
+                result = {'message': f'事件 {event_type} 被忽略', 'status': 'ignored'}
+
+        except json.JSONDecodeError as e:
+            result = {'error': f'载荷不是有效的 JSON: {e}', 'status': 'error', 'retryable': False}
+        except Exception as e:
+            result = {'error': str(e), 'status': 'error'}
+        root_span.set_attribute('status', result.get('status', ''))
+        # 简单 PR 在降级模式下的摘要与完整处理相同，不算降级
+        degraded = degradation == 'digest' or \
+            result.get('triage') == {'cheap': 'llm', 'heuristic': 'heuristic'}.get(degradation)
+        if degraded and result.get('status') == 'success':
+            root_span.set_attribute('degradation', degradation)
+            result['degraded'] = degradation
+            DEGRADED_TOTAL.inc(repository=repository, mode=degradation)
+        result['timings'] = timings.to_dict()
+
+    EVENTS_TOTAL.inc(repository=repository, action=event_type, status=result.get('status', ''))
+    if result.get('status') != 'ignored':
+        END_TO_END_SECONDS.observe(time.perf_counter() - start, repository=repository)
+    if result.get('feishu_sent') and not first_notified:
+        FIRST_NOTIFICATION_SECONDS.observe(time.perf_counter() - start, repository=repository)
+    return result
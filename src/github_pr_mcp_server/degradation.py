@@ -0,0 +1,194 @@
+"""
+GitHub PR MCP Server 积压时的降级处理
+
+工作进程根据队列积压（待处理任务数和最早任务的等待时长）逐级降级，保证积压期间通知的时效：
+
+  full       完整处理
+  cheap      统一使用 fast 档位模型，不做分块摘要
+  heuristic  不调用 LLM，只生成本地规则摘要
+  digest     不获取差异，只把 PR 加入定时发送的汇总通知
+
+任一指标达到某级阈值（MCP_DEGRADE_DEPTH / MCP_DEGRADE_AGE）时立即降到该级；
+两项指标都低于当前级阈值的 MCP_DEGRADE_RECOVER_RATIO 倍、且在当前级停留满 MCP_DEGRADE_HOLD_SECONDS 后
+每次恢复一级。MCP_DEGRADE_UPGRADE=1 时，降级处理的 PR 会延后重新入队，积压消除后补发完整摘要。
+
+降级和汇总只在多进程模式（MCP_WORKERS > 0）的工作进程中生效：同步模式和 Gradio / MCP 工具没有队列积压可供判断，
+始终完整处理。
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from .metrics import DEGRADATION_LEVEL
+
+
+MODES = ('full', 'cheap', 'heuristic', 'digest')
+
+
+def _thresholds(name: str, default: str) -> Tuple[float, ...]:
+    values = tuple(float(value) for value in os.getenv(name, default).split(',') if value.strip())
+    if len(values) != len(MODES) - 1:
+        raise ValueError(f"{name} 需要 {len(MODES) - 1} 个逗号分隔的阈值")
+    return values
+
+
+# 进入 cheap / heuristic / digest 的待处理任务数和最早任务等待秒数
+DEPTH_THRESHOLDS = _thresholds('MCP_DEGRADE_DEPTH', '50,150,400')
+AGE_THRESHOLDS = _thresholds('MCP_DEGRADE_AGE', '120,300,900')
+RECOVER_RATIO = float(os.getenv('MCP_DEGRADE_RECOVER_RATIO', 0.5))
+HOLD_SECONDS = float(os.getenv('MCP_DEGRADE_HOLD_SECONDS', 60))
+UPGRADE_ENABLED = os.getenv('MCP_DEGRADE_UPGRADE', '0') == '1'
+
+# 完整处理且队列空闲时，每次放回队列的待补全任务数
+UPGRADE_BATCH = 5
+
+# 两次查询积压的最小间隔（秒）
+OBSERVE_INTERVAL = 1.0
+
+DIGEST_SECONDS = float(os.getenv('MCP_DIGEST_SECONDS', 300))
+DIGEST_MAX_ITEMS = 30
+
+
+class DegradationController:
+    """按队列积压选择处理模式，降级立即生效、恢复逐级进行"""
+
+    def __init__(self, depth_thresholds: Tuple[float, ...] = DEPTH_THRESHOLDS,
+                 age_thresholds: Tuple[float, ...] = AGE_THRESHOLDS,
+                 recover_ratio: float = RECOVER_RATIO, hold_seconds: float = HOLD_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.depth_thresholds = depth_thresholds
+        self.age_thresholds = age_thresholds
+        self.recover_ratio = recover_ratio
+        self.hold_seconds = hold_seconds
+        self.clock = clock
+        self.level = 0
+        self.changed_at = clock()
+        self.depth = 0
+        self.oldest_age = 0.0
+        self._observed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def mode(self) -> str:
+        return MODES[self.level]
+
+    def _target(self, depth: int, oldest_age: float, ratio: float = 1.0) -> int:
+        level = 0
+        for index, (depth_limit, age_limit) in enumerate(zip(self.depth_thresholds, self.age_thresholds), 1):
+            if depth >= depth_limit * ratio or oldest_age >= age_limit * ratio:
+                level = index
+        return level
+
+    def update(self, depth: int, oldest_age: float) -> str:
+        """
+        根据积压更新处理模式
+
+        Args:
+            depth: 待处理任务数
+            oldest_age: 最早的待处理任务已等待的秒数
+
+        Returns:
+            当前处理模式
+        """
+        with self._lock:
+            now = self.clock()
+            self.depth, self.oldest_age = depth, oldest_age
+            target = self._target(depth, oldest_age)
+            if target > self.level:
+                self.level, self.changed_at = target, now
+                print(f"⚠️ 队列积压（{depth} 个任务，最早等待 {oldest_age:.0f} 秒），降级为 {self.mode}")
+            elif self.level > 0 and now - self.changed_at >= self.hold_seconds and \
+                    self._target(depth, oldest_age, self.recover_ratio) < self.level:
+                self.level, self.changed_at = self.level - 1, now
+                print(f"✅ 队列积压缓解（{depth} 个任务），恢复为 {self.mode}")
+            DEGRADATION_LEVEL.set(self.level)
+            return self.mode
+
+    def observe(self, job_queue: Any) -> str:
+        """查询队列积压并更新处理模式（至多每 OBSERVE_INTERVAL 秒查询一次）"""
+        now = self.clock()
+        if self._observed_at is not None and now - self._observed_at < OBSERVE_INTERVAL:
+            return self.mode
+        self._observed_at = now
+        return self.update(*job_queue.backlog())
+
+    def idle(self) -> bool:
+        """完整处理且积压低于恢复阈值，可以补全降级处理的摘要"""
+        return self.level == 0 and self._target(self.depth, self.oldest_age, self.recover_ratio) == 0
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'level': self.level,
+            'depth': self.depth,
+            'oldest_age_seconds': round(self.oldest_age, 1),
+            'depth_thresholds': list(self.depth_thresholds),
+            'age_thresholds': list(self.age_thresholds),
+            'upgrade_enabled': UPGRADE_ENABLED,
+        }
+
+
+class DigestBuffer:
+    """
+    digest 模式下按通知地址累积 PR，定时或攒满后合并为一条通知发送
+
+    发送失败的汇总放回缓冲区，间隔 interval 后与新加入的 PR 一起重试。
+    """
+
+    def __init__(self, send: Callable[[str, List[Dict[str, Any]], str], bool],
+                 interval: float = DIGEST_SECONDS, max_items: int = DIGEST_MAX_ITEMS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.send = send
+        self.interval = interval
+        self.max_items = max_items
+        self.clock = clock
+        # 通知地址 -> (首条加入时间, 仓库, PR 列表)
+        self._pending: Dict[str, Tuple[float, str, List[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, webhook_url: str, entry: Dict[str, Any], repository: str = ''):
+        """加入一个 PR；攒满 max_items 时立即发送"""
+        if not webhook_url:
+            return
+        with self._lock:
+            _, _, entries = self._pending.setdefault(webhook_url, (self.clock(), repository, []))
+            entries.append(entry)
+            full = len(entries) >= self.max_items
+        if full:
+            self.flush(webhook_url)
+
+    def flush(self, webhook_url: Optional[str] = None, force: bool = False) -> int:
+        """
+        发送到期的汇总
+
+        Args:
+            webhook_url: 该地址的汇总不论是否到期都发送
+            force: 发送所有汇总（例如进程退出前）
+
+        Returns:
+            发送的 PR 数
+        """
+        now = self.clock()
+        with self._lock:
+            due = [url for url, (started, _, _) in self._pending.items()
+                   if force or url == webhook_url or now - started >= self.interval]
+            batches = [(url, self._pending.pop(url)) for url in due]
+        sent = 0
+        for url, (_, repository, entries) in batches:
+            if self.send(url, entries, repository):
+                sent += len(entries)
+            else:
+                self._requeue(url, repository, entries)
+        return sent
+
+    def _requeue(self, webhook_url: str, repository: str, entries: List[Dict[str, Any]]):
+        """放回发送失败的汇总，排在发送期间新加入的 PR 之前"""
+        with self._lock:
+            _, _, newer = self._pending.get(webhook_url, (None, repository, []))
+            self._pending[webhook_url] = (self.clock(), repository, entries + newer)
+
+    def size(self) -> int:
+        with self._lock:
+            return sum(len(entries) for _, _, entries in self._pending.values())
@@ -0,0 +1,299 @@
+"""
+GitHub PR MCP Server 差异解析与文件过滤
+
+把 git diff 拆分为逐文件的差异，在送入 LLM 之前过滤掉锁文件、压缩产物、快照、
+第三方代码和二进制文件，被过滤的文件只保留一行统计；笔记本、锁文件等有压缩器的文件
+转换为紧凑的语义变更（见 condensers）。
+
+过滤规则（按优先级）：
+  1. 二进制文件，以及 .gitattributes 中标记为 binary / -diff 的文件
+  2. MCP_DIFF_EXCLUDE 和路由表 diff_exclude 中的通配符
+  3. .gitattributes 中标记 linguist-generated / linguist-vendored 的文件
+  4. 有压缩器的文件不再按内置规则过滤，改为压缩
+  5. 内置规则（.gitattributes 中 linguist-generated=false / linguist-vendored=false 可以取消）
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+
+from .condensers import condense, find_condenser
+from .minify import MINIFY_ENABLED, minify_files
+
+
+# 内置的生成文件规则：锁文件、压缩产物、source map、快照和生成的 protobuf 代码
+GENERATED_PATTERNS = (
+    'package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml',
+    'poetry.lock', 'Pipfile.lock', 'uv.lock', 'Cargo.lock', 'Gemfile.lock',
+    'composer.lock', 'go.sum',
+    '*.min.js', '*.min.css', '*.map', '*.snap', '**/__snapshots__/**',
+    '*_pb2.py', '*_pb2_grpc.py', '*.pb.go', '*.generated.*',
+)
+
+# 内置的第三方代码规则
+VENDORED_PATTERNS = (
+    '**/vendor/**', '**/node_modules/**', '**/third_party/**', '**/third-party/**', '**/dist/**',
+)
+
+REASON_LABELS = {
+    'binary': '二进制',
+    'generated': '生成文件',
+    'vendored': '第三方代码',
+    'excluded': '已配置排除',
+}
+
+# 提示词中最多列出的已省略文件数
+MAX_STAT_LINES = 20
+
+# diff --git a/path b/path
+_DIFF_HEADER = re.compile(r'^diff --git a/(.*) b/(.*)$')
+
+
+class FileDiff:
+    """单个文件的差异"""
+
+    def __init__(self, header: List[str], body: List[str]):
+        self.header = header
+        self.body = body
+        self.old_path, self.path = self._paths(header)
+        self.additions = sum(1 for line in body if line.startswith('+'))
+        self.deletions = sum(1 for line in body if line.startswith('-'))
+        self.binary = any(line.startswith(('Binary files ', 'GIT binary patch'))
+                          for line in header + body)
+
+    @staticmethod
+    def _paths(header: List[str]) -> Tuple[str, str]:
+        old_path = new_path = ''
+        match = _DIFF_HEADER.match(header[0]) if header else None
+        if match:
+            old_path, new_path = match.group(1), match.group(2)
+        # ---/+++ 和 rename 行不受路径中空格的影响，优先使用
+        for line in header[1:]:
+            if line.startswith('--- a/'):
+                old_path = line[6:]
+            elif line.startswith('+++ b/'):
+                new_path = line[6:]
+            elif line.startswith('rename from '):
+                old_path = line[12:]
+            elif line.startswith('rename to '):
+                new_path = line[10:]
+        return old_path, new_path
+
+    @property
+    def status(self) -> str:
+        if any(line.startswith('new file mode') for line in self.header):
+            return 'added'
+        if any(line.startswith('deleted file mode') for line in self.header):
+            return 'deleted'
+        if self.old_path and self.old_path != self.path:
+            return 'renamed'
+        return 'modified'
+
+    def text(self) -> str:
+        return '\n'.join(self.header + self.body)
+
+    def stat_line(self, reason: str) -> str:
+        """被过滤文件在提示词中的一行统计"""
+        return f"- {self.path}（{REASON_LABELS.get(reason, reason)}，+{self.additions} -{self.deletions}）"
+
+
+def split_file_diffs(diff_content: str) -> List[FileDiff]:
+    """把 git diff 拆分为逐文件的差异；不是 git diff 格式时返回空列表"""
+    files: List[FileDiff] = []
+    header: Optional[List[str]] = None
+    body: List[str] = []
+    for line in diff_content.splitlines():
+        if line.startswith('diff --git '):
+            if header is not None:
+                files.append(FileDiff(header, body))
+            header, body = [line], []
+        elif header is None:
+            continue
+        elif body or line.startswith('@@'):
+            body.append(line)
+        else:
+            header.append(line)
+    if header is not None:
+        files.append(FileDiff(header, body))
+    return files
+
+
+def _glob_regex(pattern: str) -> 're.Pattern':
+    """把 gitattributes 风格的通配符转换为正则（支持 **）"""
+    regex, i = '', 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+            regex += '/.*'
+            i += 3
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return re.compile(regex + r'\Z')
+
+
+_regex_cache: Dict[str, 're.Pattern'] = {}
+
+
+def path_matches(pattern: str, path: str) -> bool:
+    """
+    判断路径是否匹配通配符
+
+    不含 / 的模式匹配任意目录下的文件名；含 / 的模式从仓库根目录开始匹配。
+    """
+    regex = _regex_cache.get(pattern)
+    if regex is None:
+        regex = _regex_cache[pattern] = _glob_regex(pattern.lstrip('/'))
+    if '/' not in pattern:
+        return bool(regex.match(path.rsplit('/', 1)[-1]))
+    return bool(regex.match(path))
+
+
+class GitAttributes:
+    """解析后的 .gitattributes；同一属性以最后一条匹配的规则为准"""
+
+    def __init__(self, text: str = ''):
+        self.rules: List[Tuple[str, Dict[str, Any]]] = []
+        for line in text.splitlines():
+            parts = line.split()
+            if not parts or parts[0].startswith('#'):
+                continue
+            values: Dict[str, Any] = {}
+            for attr in parts[1:]:
+                if attr.startswith('-'):
+                    values[attr[1:]] = False
+                elif attr.startswith('!'):
+                    values[attr[1:]] = None
+                elif '=' in attr:
+                    name, value = attr.split('=', 1)
+                    values[name] = {'true': True, 'false': False}.get(value.lower(), value)
+                else:
+                    values[attr] = True
+            self.rules.append((parts[0], values))
+
+    def lookup(self, path: str) -> Dict[str, Any]:
+        attrs: Dict[str, Any] = {}
+        for pattern, values in self.rules:
+            if path_matches(pattern, path):
+                attrs.update(values)
+        return attrs
+
+
+class DiffRules:
+    """一个仓库的差异过滤规则"""
+
+    def __init__(self, exclude: Iterable[str] = (), gitattributes: Optional[GitAttributes] = None,
+                 outlines: Optional[Callable[..., Any]] = None):
+        self.exclude = [pattern for pattern in exclude if pattern]
+        self.gitattributes = gitattributes or GitAttributes()
+        # 读取修改文件两侧大纲的函数（见 symbols.file_symbols），未设置时只根据差异估计变更符号
+        self.outlines = outlines
+
+    @classmethod
+    def from_env(cls, exclude: Iterable[str] = (), gitattributes: Optional[GitAttributes] = None,
+                 outlines: Optional[Callable[..., Any]] = None) -> 'DiffRules':
+        """内置规则加上 MCP_DIFF_EXCLUDE（逗号分隔的通配符）和额外的排除规则"""
+        patterns = [pattern.strip() for pattern in os.getenv('MCP_DIFF_EXCLUDE', '').split(',')]
+        return cls(patterns + list(exclude), gitattributes, outlines)
+
+    def classify(self, file: FileDiff) -> str:
+        """返回文件被过滤的原因；需要压缩时返回 'condense'，原样保留时返回空字符串"""
+        attrs = self.gitattributes.lookup(file.path)
+        if file.binary or attrs.get('binary') is True or attrs.get('diff') is False:
+            return 'binary'
+        if any(path_matches(pattern, file.path) for pattern in self.exclude):
+            return 'excluded'
+        if attrs.get('linguist-generated') is True:
+            return 'generated'
+        if attrs.get('linguist-vendored') is True:
+            return 'vendored'
+        if find_condenser(file.path) is not None:
+            return 'condense'
+        if attrs.get('linguist-generated') is not False and \
+                any(path_matches(pattern, file.path) for pattern in GENERATED_PATTERNS):
+            return 'generated'
+        if attrs.get('linguist-vendored') is not False and \
+                any(path_matches(pattern, file.path) for pattern in VENDORED_PATTERNS):
+            return 'vendored'
+        return ''
+
+
+def filter_diff(diff_content: str, rules: Optional[DiffRules] = None,
+                minify: bool = MINIFY_ENABLED) -> Tuple[str, List[str], Dict[str, int]]:
+    """
+    过滤差异中的生成文件、第三方代码和二进制文件，压缩有压缩器的文件，并精简其余文件的差异
+
+    Args:
+        diff_content: GitHub PR 差异内容
+        rules: 过滤规则，默认为内置规则和 MCP_DIFF_EXCLUDE
+        minify: 是否精简保留下来的差异（见 minify）
+
+    Returns:
+        (处理后的差异, 被过滤文件的统计行, 精简统计)；不是 git diff 格式时原样返回
+    """
+    files = split_file_diffs(diff_content)
+    if not files:
+        return diff_content, [], {}
+
+    rules = rules or DiffRules.from_env()
+    segments: List[Any] = []
+    stats = []
+    for file in files:
+        reason = rules.classify(file)
+        if reason == 'condense':
+            segments.append(condense(file.path, file.body))
+        elif reason:
+            stats.append(file.stat_line(reason))
+        else:
+            segments.append(file)
+
+    minify_stats: Dict[str, int] = {}
+    kept_files = [segment for segment in segments if isinstance(segment, FileDiff)]
+    if minify and kept_files:
+        rendered, minify_stats = minify_files(kept_files)
+        texts = iter(rendered)
+        segments = [next(texts) if isinstance(segment, FileDiff) else segment for segment in segments]
+    else:
+        segments = [segment.text() if isinstance(segment, FileDiff) else segment for segment in segments]
+    return '\n'.join(segment for segment in segments if segment), stats, minify_stats
+
+
+def format_filtered_stats(stats: List[str]) -> str:
+    """提示词中已省略文件的说明"""
+    lines = stats[:MAX_STAT_LINES]
+    if len(stats) > MAX_STAT_LINES:
+        lines.append(f"- …另有 {len(stats) - MAX_STAT_LINES} 个文件")
+    return f"已省略 {len(stats)} 个生成/第三方/二进制文件（未列出差异）：\n" + '\n'.join(lines)
+
+
+class GitAttributesCache:
+    """按仓库和提交缓存 .gitattributes（线程安全，LRU）"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, str], GitAttributes]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[GitAttributes]:
+        with self._lock:
+            attributes = self._entries.get(key)
+            if attributes is not None:
+                self._entries.move_to_end(key)
+            return attributes
+
+    def put(self, key: Tuple[str, str], attributes: GitAttributes):
+        with self._lock:
+            self._entries[key] = attributes
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,219 @@
+"""
+GitHub PR MCP Server 先草稿后更新的飞书卡片通知
+
+收到 PR 事件后立即用载荷中的元数据和变更统计发送一张结构化摘要卡片（草稿），
+AI 分析完成后原地更新同一条消息：读者不必等待 LLM 就能看到通知，也不会收到重复消息。
+
+飞书自定义机器人 Webhook 发出的消息无法更新，因此卡片通过飞书开放平台应用发送，
+需要配置 FEISHU_APP_ID / FEISHU_APP_SECRET，并为仓库指定接收卡片的群（路由字段 feishu_chat_id，
+默认路由取 FEISHU_CHAT_ID）。未配置时仍在分析完成后通过 Webhook 发送一条消息（MCP_DRAFT_NOTIFY=0 关闭卡片）。
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+
+import requests
+
+from .metrics import FEISHU_SEND_SECONDS, UPSTREAM_ERRORS_TOTAL, error_code
+from .timings import stage
+from .tracing import trace_tag
+
+
+DRAFTS_ENABLED = os.getenv('MCP_DRAFT_NOTIFY', '1') != '0'
+
+FEISHU_API_URL = os.getenv('FEISHU_API_URL', 'https://open.feishu.cn').rstrip('/')
+
+# 访问令牌到期前提前刷新的秒数
+TOKEN_REFRESH_MARGIN = 300
+
+ACTION_VERBS = {'opened': '提交了', 'synchronize': '更新了', 'reopened': '重新打开了'}
+
+_HEADING = re.compile(r'(?m)^#+\s*(.+?)\s*$')
+
+
+class FeishuApp:
+    """飞书开放平台应用：发送和更新消息卡片（tenant_access_token 按有效期缓存）"""
+
+    def __init__(self, app_id: str = '', app_secret: str = '', api_url: str = FEISHU_API_URL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.api_url = api_url
+        self.clock = clock
+        self._token = ''
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'FeishuApp':
+        return cls(os.getenv('FEISHU_APP_ID', ''), os.getenv('FEISHU_APP_SECRET', ''))
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.app_id and self.app_secret)
+
+    def _access_token(self) -> str:
+        with self._lock:
+            if not self._token or self.clock() >= self._expires_at:
+                response = requests.post(
+                    f"{self.api_url}/open-apis/auth/v3/tenant_access_token/internal",
+                    json={'app_id': self.app_id, 'app_secret': self.app_secret},
+                    timeout=10
+                )
+                response.raise_for_status()
+                data = response.json()
+                if data.get('code'):
+                    raise RuntimeError(f"获取飞书访问令牌失败: {data.get('msg', '')}")
+                self._token = data['tenant_access_token']
+                self._expires_at = self.clock() + max(int(data.get('expire', 0)) - TOKEN_REFRESH_MARGIN, 0)
+            return self._token
+
+    def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        response = requests.request(
+            method,
+            f"{self.api_url}{path}",
+            headers={'Authorization': f'Bearer {self._access_token()}'},
+            timeout=10,
+            **kwargs
+        )
+        response.raise_for_status()
+        data = response.json()
+        if data.get('code'):
+            raise RuntimeError(f"飞书 API 错误 {data.get('code')}: {data.get('msg', '')}")
+        return data.get('data') or {}
+
+    def send_card(self, chat_id: str, card: Dict[str, Any]) -> str:
+        """向群发送卡片，返回消息 ID"""
+        data = self._request('POST', '/open-apis/im/v1/messages', params={'receive_id_type': 'chat_id'}, json={
+            'receive_id': chat_id,
+            'msg_type': 'interactive',
+            'content': json.dumps(card, ensure_ascii=False),
+        })
+        return data.get('message_id', '')
+
+    def update_card(self, message_id: str, card: Dict[str, Any]):
+        """原地更新已发送的卡片"""
+        self._request('PATCH', f'/open-apis/im/v1/messages/{message_id}',
+                      json={'content': json.dumps(card, ensure_ascii=False)})
+
+
+# 进程内共享的应用客户端
+APP = FeishuApp.from_env()
+
+
+def enabled(chat_id: str) -> bool:
+    """是否为该群发送草稿卡片"""
+    return DRAFTS_ENABLED and APP.configured and bool(chat_id)
+
+
+def pr_overview(payload: Dict[str, Any]) -> str:
+    """由载荷中的元数据和变更统计生成的结构化摘要（获取差异之前即可生成）"""
+    pull_request = payload.get('pull_request', {})
+    user = (pull_request.get('user') or {}).get('login', '')
+    verb = ACTION_VERBS.get(payload.get('action', ''), '提交了')
+    text = f"**{user}** {verb} PR #{pull_request.get('number', '')}：{pull_request.get('title', '')}。"
+    changed_files = pull_request.get('changed_files') or 0
+    additions, deletions = pull_request.get('additions') or 0, pull_request.get('deletions') or 0
+    stats = []
+    if changed_files:
+        stats.append(f"共修改了 {changed_files} 个文件")
+    if additions or deletions:
+        stats.append(f"新增 {additions} 行，删除 {deletions} 行")
+    lines = [text + '，'.join(stats) + ('。' if stats else '')]
+    head, base = (pull_request.get('head') or {}).get('ref', ''), (pull_request.get('base') or {}).get('ref', '')
+    if head and base:
+        lines.append(f"分支：{head} → {base}")
+    if pull_request.get('draft'):
+        lines.append("状态：草稿 PR")
+    return '\n'.join(lines)
+
+
+def _card(pr_info: Dict[str, str], template: str, sections: List[str], note: str) -> Dict[str, Any]:
+    elements = []
+    for section in sections:
+        if elements:
+            elements.append({'tag': 'hr'})
+        elements.append({'tag': 'div', 'text': {'tag': 'lark_md', 'content': section}})
+    elements.append({'tag': 'action', 'actions': [{
+        'tag': 'button',
+        'type': 'default',
+        'text': {'tag': 'plain_text', 'content': '查看 PR'},
+        'url': pr_info['html_url'],
+    }]})
+    elements.append({'tag': 'note', 'elements': [{'tag': 'plain_text', 'content': note}]})
+    return {
+        # update_multi：更新对群内所有人生效
+        'config': {'wide_screen_mode': True, 'update_multi': True},
+        'header': {
+            'template': template,
+            'title': {'tag': 'plain_text', 'content': f"PR #{pr_info['number']}: {pr_info['title']}"},
+        },
+        'elements': elements,
+    }
+
+
+def draft_card(pr_info: Dict[str, str], overview: str) -> Dict[str, Any]:
+    """草稿卡片：结构化摘要，AI 分析进行中"""
+    return _card(pr_info, 'blue', [overview], "⏳ AI 分析中，完成后将更新此消息")
+
+
+def summary_card(pr_info: Dict[str, str], overview: str, summary: str) -> Dict[str, Any]:
+    """
+    最终卡片
+
+    Args:
+        pr_info: PR 信息
+        overview: 草稿中的结构化摘要
+        summary: AI 或本地摘要；以 ❌ 开头时显示为失败，为空时表示积压期间暂不生成摘要
+    """
+    processed = f"📅 处理时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    if not summary:
+        return _card(pr_info, 'grey', [overview], f"⏳ 系统繁忙，暂未生成 AI 摘要 · {processed}")
+    if summary.startswith("❌"):
+        return _card(pr_info, 'red', [overview, summary], f"仅显示变更统计 · {processed}")
+    # lark_md 不支持标题，改为加粗
+    return _card(pr_info, 'green', [overview, _HEADING.sub(r'**\1**', summary)], processed)
+
+
+class DraftCard:
+    """已发送的草稿卡片"""
+
+    def __init__(self, message_id: str, pr_info: Dict[str, str], overview: str):
+        self.message_id = message_id
+        self.pr_info = pr_info
+        self.overview = overview
+
+    def finish(self, summary: str, repository: str = '') -> bool:
+        """用最终摘要原地更新卡片"""
+        try:
+            with FEISHU_SEND_SECONDS.time(repository=repository), stage('send'):
+                APP.update_card(self.message_id, summary_card(self.pr_info, self.overview, summary))
+            return True
+        except Exception as e:
+            UPSTREAM_ERRORS_TOTAL.inc(repository=repository, upstream='feishu', code=error_code(e))
+            print(f"更新飞书卡片失败: {e}{trace_tag()}")
+            return False
+
+
+def post_draft(chat_id: str, pr_info: Dict[str, str], overview: str, repository: str = '') -> Optional[DraftCard]:
+    """
+    发送草稿卡片
+
+    Returns:
+        草稿卡片；未启用或发送失败时返回 None（分析完成后改用 Webhook 通知）
+    """
+    if not enabled(chat_id):
+        return None
+    try:
+        with FEISHU_SEND_SECONDS.time(repository=repository), stage('send'):
+            message_id = APP.send_card(chat_id, draft_card(pr_info, overview))
+    except Exception as e:
+        UPSTREAM_ERRORS_TOTAL.inc(repository=repository, upstream='feishu', code=error_code(e))
+        print(f"发送飞书草稿卡片失败: {e}{trace_tag()}")
+        return None
+    return DraftCard(message_id, pr_info, overview) if message_id else None
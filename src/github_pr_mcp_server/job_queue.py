@@ -0,0 +1,323 @@
+"""
+GitHub PR MCP Server 本地任务队列
+
+基于 SQLite 的共享任务队列，多个工作进程通过租约（lease）认领任务，
+并通过心跳续约；租约过期的任务会被重新放回队列。
+任务按优先级认领：入队时计算基础优先级，认领时叠加等待老化和仓库公平份额（见 scheduling），
+并可按仓库限制同时处理的任务数。
+延后（deferred）的任务不会被认领，直到显式放回队列（见 degradation 中的摘要补全）。
+工作进程的指标快照也保存在队列数据库中，由前端进程合并到 /metrics（见 metrics）。
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from .scheduling import AGING_SECONDS, REPO_PENALTY
+
+
+DEFAULT_QUEUE_PATH = os.getenv('MCP_QUEUE_PATH', 'mcp_jobs.sqlite3')
+DEFAULT_LEASE_SECONDS = float(os.getenv('MCP_LEASE_SECONDS', 60))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv('MCP_MAX_ATTEMPTS', 3))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    repository TEXT NOT NULL DEFAULT '',
+    priority REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS metric_snapshots (
+    process TEXT PRIMARY KEY,
+    snapshot TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+_REPOSITORY_INDEX = "CREATE INDEX IF NOT EXISTS idx_jobs_repository ON jobs (status, repository, id)"
+
+
+class JobQueue:
+    """SQLite 任务队列，支持租约认领、心跳续约和过期回收"""
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._migrate(conn)
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """为旧版队列文件补充 repository 和 priority 列"""
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+        if 'repository' not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN repository TEXT NOT NULL DEFAULT ''")
+            conn.execute(
+                "UPDATE jobs SET repository = COALESCE(json_extract(payload, '$.repository'), '')"
+            )
+        if 'priority' not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN priority REAL NOT NULL DEFAULT 0")
+        conn.execute(_REPOSITORY_INDEX)
+
+    def _connect(self) -> sqlite3.Connection:
+        """每次操作使用独立连接，保证跨进程安全"""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA busy_timeout=30000')
+        return conn
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], priority: float = 0.0,
+                deferred: bool = False) -> int:
+        """
+        添加任务，返回任务 ID
+
+        Args:
+            kind: 任务类型
+            payload: 任务载荷
+            priority: 基础优先级，数值越小越先处理
+            deferred: 为 True 时任务先延后，调用 release_deferred 后才可认领
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                'INSERT INTO jobs (kind, payload, repository, priority, status, max_attempts, '
+                'created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (kind, json.dumps(payload, ensure_ascii=False), payload.get('repository', ''),
+                 priority, 'deferred' if deferred else 'pending', self.max_attempts, now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker_id: str,
+              quota: Optional[Callable[[str], int]] = None,
+              weight: Optional[Callable[[str], float]] = None) -> Optional[Dict[str, Any]]:
+        """
+        认领一个待处理任务
+
+        认领有效优先级最小的任务：基础优先级减去等待老化，再加上所属仓库的份额惩罚
+        （处理中任务数 / 仓库权重），使小 PR 和新 PR 优先，同时单个仓库的大量事件不会占满所有工作进程。
+
+        Args:
+            worker_id: 工作进程标识
+            quota: 返回仓库并发配额的函数；处理中任务数达到配额的仓库本次跳过
+            weight: 返回仓库权重的函数（默认均为 1）
+
+        Returns:
+            任务字典；没有可认领的任务时返回 None
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            self._reclaim_expired(conn, now)
+            row = self._next_pending(conn, quota, weight)
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires_at = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row['id'])
+            )
+            conn.execute('COMMIT')
+            job = self._row_to_dict(row)
+            job['attempts'] += 1
+            job['status'] = 'leased'
+            job['lease_owner'] = worker_id
+            return job
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _next_pending(conn: sqlite3.Connection, quota: Optional[Callable[[str], int]],
+                      weight: Optional[Callable[[str], float]]) -> Optional[sqlite3.Row]:
+        """选择有效优先级最小的待处理任务（调用方持有写事务）"""
+        leased = {row['repository']: row['n'] for row in conn.execute(
+            "SELECT repository, COUNT(*) AS n FROM jobs WHERE status = 'leased' GROUP BY repository"
+        )}
+        # 各仓库中老化后优先级最小的任务；当前时间对所有任务相同，比较时可以省略
+        heads = conn.execute(
+            "SELECT repository, id, MIN(priority + created_at / ?) AS score FROM jobs "
+            "WHERE status = 'pending' GROUP BY repository",
+            (AGING_SECONDS,)
+        ).fetchall()
+
+        candidates = []
+        for row in heads:
+            in_flight = leased.get(row['repository'], 0)
+            if quota is not None and in_flight >= quota(row['repository']):
+                continue
+            share = in_flight / (weight(row['repository']) if weight is not None else 1.0)
+            candidates.append((row['score'] + REPO_PENALTY * share, row['id']))
+        if not candidates:
+            return None
+        _, job_id = min(candidates)
+        return conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+    def _reclaim_expired(self, conn: sqlite3.Connection, now: float):
+        """回收租约过期的任务：未超过重试上限的放回队列，否则标记失败"""
+        conn.execute(
+            "UPDATE jobs SET status = 'pending', lease_owner = NULL, lease_expires_at = NULL, "
+            "updated_at = ? WHERE status = 'leased' AND lease_expires_at < ? "
+            "AND attempts < max_attempts",
+            (now, now)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = '租约过期且超过重试次数', "
+            "updated_at = ? WHERE status = 'leased' AND lease_expires_at < ?",
+            (now, now)
+        )
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """续约；租约已被回收时返回 False"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (now + self.lease_seconds, now, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, result: Dict[str, Any]) -> bool:
+        """标记任务完成"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, lease_owner = NULL, "
+                "lease_expires_at = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (json.dumps(result, ensure_ascii=False), time.time(), job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str, retryable: bool = True) -> bool:
+        """
+        标记任务失败；可重试且未超过重试上限时放回队列
+
+        Args:
+            job_id: 任务 ID
+            worker_id: 工作进程标识
+            error: 错误信息
+            retryable: 为 False 时直接标记失败（如仓库未配置路由、PR 不存在等重试也无法成功的错误）
+        """
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN ? AND attempts < max_attempts "
+                "THEN 'pending' ELSE 'failed' END, error = ?, lease_owner = NULL, "
+                "lease_expires_at = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (int(retryable), error, time.time(), job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def defer(self, job_id: int, worker_id: str) -> bool:
+        """把已认领的任务改为延后（不计入重试次数）"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'deferred', attempts = attempts - 1, lease_owner = NULL, "
+                "lease_expires_at = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (time.time(), job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def release_deferred(self, limit: int) -> int:
+        """把最早延后的任务放回队列，返回放回的数量；等待老化从放回时开始计算"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'pending', created_at = ?, updated_at = ? WHERE id IN "
+                "(SELECT id FROM jobs WHERE status = 'deferred' ORDER BY id LIMIT ?)",
+                (now, now, limit)
+            )
+            return cursor.rowcount
+
+    def backlog(self) -> Tuple[int, float]:
+        """积压情况：(待处理任务数, 最早的待处理任务已等待的秒数)"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS n, MIN(created_at) AS oldest FROM jobs WHERE status = 'pending'"
+            ).fetchone()
+        return row['n'], (max(time.time() - row['oldest'], 0.0) if row['oldest'] is not None else 0.0)
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """查询任务"""
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def stats(self) -> Dict[str, int]:
+        """按状态统计任务数量"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0, 'deferred': 0}
+        counts.update({row['status']: row['n'] for row in rows})
+        return counts
+
+    def depth_by_repository(self) -> Dict[Tuple[str, str], int]:
+        """按仓库统计待处理、处理中和延后的任务数"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT repository, status, COUNT(*) AS n FROM jobs "
+                "WHERE status IN ('pending', 'leased', 'deferred') "
+                "GROUP BY repository, status"
+            ).fetchall()
+        return {(row['repository'], row['status']): row['n'] for row in rows}
+
+    def push_metrics(self, process: str, snapshot: Dict[str, Any]):
+        """保存一个工作进程的指标快照（覆盖该进程上一次的快照）"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO metric_snapshots (process, snapshot, updated_at) VALUES (?, ?, ?)',
+                (process, json.dumps(snapshot), time.time())
+            )
+
+    def metric_snapshots(self, max_age: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        工作进程的指标快照
+
+        Args:
+            max_age: 只返回最近这么多秒内写入的快照；默认返回全部（包括已退出的进程，计数器不会因进程退出而回退）
+        """
+        since = time.time() - max_age if max_age is not None else 0.0
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT snapshot FROM metric_snapshots WHERE updated_at >= ? ORDER BY process', (since,)
+            ).fetchall()
+        return [json.loads(row['snapshot']) for row in rows]
+
+    def clear_metric_snapshots(self):
+        """清除上一次运行留下的指标快照（启动工作进程前调用，与前端进程的指标一起从零开始）"""
+        with closing(self._connect()) as conn:
+            conn.execute('DELETE FROM metric_snapshots')
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        if job.get('result'):
+            job['result'] = json.loads(job['result'])
+        return job
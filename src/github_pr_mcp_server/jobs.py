@@ -0,0 +1,147 @@
+"""
+GitHub PR MCP Server 异步任务表
+
+MCP 工具提交任务后立即返回任务 ID，任务在后台线程池中执行；任务表保存在内存中，
+有容量上限，已结束的任务超过 TTL 后被清除。调用方通过 get（可长轮询）查询任务结果。
+
+环境变量:
+  MCP_ASYNC_WORKERS   后台执行任务的线程数（默认 4）
+  MCP_ASYNC_MAX_JOBS  任务表容量（默认 1000）
+  MCP_ASYNC_JOB_TTL   已结束任务的保留时间，秒（默认 3600）
+"""
+
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional
+
+
+FINISHED_STATUSES = ('success', 'error')
+
+
+class JobTable:
+    """有容量上限和 TTL 的内存任务表（线程安全）"""
+
+    def __init__(self, max_jobs: int = 1000, ttl_seconds: float = 3600, workers: int = 4):
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mcp-job')
+
+    @classmethod
+    def from_env(cls) -> 'JobTable':
+        return cls(
+            max_jobs=int(os.getenv('MCP_ASYNC_MAX_JOBS', 1000)),
+            ttl_seconds=float(os.getenv('MCP_ASYNC_JOB_TTL', 3600)),
+            workers=int(os.getenv('MCP_ASYNC_WORKERS', 4))
+        )
+
+    def _evict(self):
+        """清除过期任务；仍然满时按提交顺序淘汰最早结束的任务（调用方持有锁）"""
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job['status'] in FINISHED_STATUSES and now - job['finished_at'] > self.ttl_seconds]:
+            del self._jobs[job_id]
+
+        if len(self._jobs) >= self.max_jobs:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job['status'] in FINISHED_STATUSES]:
+                del self._jobs[job_id]
+                if len(self._jobs) < self.max_jobs:
+                    break
+
+    def submit(self, kind: str, fn: Callable[..., Dict[str, Any]], *args, **kwargs) -> Optional[str]:
+        """
+        提交任务
+
+        Args:
+            kind: 任务类型
+            fn: 执行函数，返回结果字典（status 为 error 时任务记为失败）
+
+        Returns:
+            任务 ID；任务表已满（全部为未结束任务）时返回 None
+        """
+        with self._condition:
+            self._evict()
+            if len(self._jobs) >= self.max_jobs:
+                return None
+
+            job_id = uuid.uuid4().hex[:16]
+            self._jobs[job_id] = {
+                'id': job_id,
+                'kind': kind,
+                'status': 'pending',
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'error': None,
+            }
+
+        # 在提交时上下文的副本中执行，使任务的 span 与提交请求属于同一条 trace
+        self._executor.submit(contextvars.copy_context().run, self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id: str, fn: Callable[..., Dict[str, Any]], args, kwargs):
+        self._update(job_id, status='running', started_at=time.time())
+        try:
+            result = fn(*args, **kwargs)
+            error = result.get('error') if result.get('status') == 'error' else None
+        except Exception as e:
+            result, error = None, str(e)
+        self._update(job_id, status='error' if error else 'success', finished_at=time.time(),
+                     result=result, error=error)
+
+    def _update(self, job_id: str, **fields):
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+                self._condition.notify_all()
+
+    @staticmethod
+    def _snapshot(job: Dict[str, Any], include_result: bool = True) -> Dict[str, Any]:
+        snapshot = dict(job)
+        if snapshot['finished_at'] and snapshot['started_at']:
+            snapshot['duration_ms'] = round((snapshot['finished_at'] - snapshot['started_at']) * 1000, 1)
+        if not include_result:
+            snapshot.pop('result', None)
+        return snapshot
+
+    def get(self, job_id: str, wait_seconds: float = 0) -> Optional[Dict[str, Any]]:
+        """
+        查询任务
+
+        Args:
+            job_id: 任务 ID
+            wait_seconds: 任务未结束时最多等待的秒数（长轮询）
+
+        Returns:
+            任务记录；不存在时返回 None
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._jobs.get(job_id, {}).get('status', 'error') in FINISHED_STATUSES,
+                timeout=max(0.0, wait_seconds)
+            )
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job is not None else None
+
+    def list_jobs(self, status: str = '', limit: int = 20) -> List[Dict[str, Any]]:
+        """按提交时间倒序列出任务（不含结果正文）"""
+        with self._condition:
+            self._evict()
+            jobs = [job for job in reversed(self._jobs.values()) if not status or job['status'] == status]
+            return [self._snapshot(job, include_result=False) for job in jobs[:max(0, limit)]]
+
+    def stats(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        with self._condition:
+            counts = {status: 0 for status in ('pending', 'running') + FINISHED_STATUSES}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+            return counts
@@ -0,0 +1,256 @@
+"""
+GitHub PR MCP Server 指标
+
+轻量级的 Prometheus 文本格式指标实现（不依赖 prometheus_client），
+提供计数器、仪表和直方图，以及各处理阶段使用的全局指标。
+
+指标保存在进程内。多进程模式下 LLM、获取差异、飞书发送等指标在工作进程中产生：
+工作进程定期把指标快照写入共享队列数据库（snapshot），前端进程抓取 /metrics 时与本进程的指标合并输出（render）：
+计数器和直方图相加，仪表（如降级级别）取仍在运行的进程中的最大值。
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 工作进程空闲时写入指标快照的间隔（秒）
+PUSH_INTERVAL = float(os.getenv('MCP_METRICS_PUSH_INTERVAL', 5))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """带标签的指标基类"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: 'Registry' = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _copy(self) -> Dict[Tuple[str, ...], object]:
+        with self._lock:
+            return {key: list(value) if isinstance(value, list) else value for key, value in self._values.items()}
+
+    def snapshot(self) -> List[list]:
+        """可 JSON 序列化的 [[标签值...], 值] 列表"""
+        return [[list(key), value] for key, value in self._copy().items()]
+
+    def _merge(self, current, value):
+        """合并其他进程快照中同一标签组合的值"""
+        return value
+
+    def expose(self, snapshots: Sequence[Dict[str, Any]] = ()) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        values = self._copy()
+        for snapshot in snapshots:
+            for key, value in snapshot.get(self.name, ()):
+                key = tuple(key)
+                values[key] = self._merge(values.get(key), value)
+        for key, value in values.items():
+            lines.extend(self._expose_sample(key, value))
+        return lines
+
+    def _expose_sample(self, key, value) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _merge(self, current, value):
+        return (current or 0) + value
+
+
+class Gauge(_Metric):
+    """可增可减的仪表"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _merge(self, current, value):
+        return value if current is None else max(current, value)
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: 'Registry' = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [各桶计数..., +Inf 计数, 总和]
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[bisect.bisect_left(self.buckets, value)] += 1
+            state[-1] += value
+
+    def _merge(self, current, value):
+        if current is None:
+            return list(value)
+        if len(current) != len(value):
+            # 分桶不同的快照（如升级前的工作进程）无法合并
+            return current
+        return [a + b for a, b in zip(current, value)]
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _expose_sample(self, key, state) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(state[-1])}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def snapshot(self) -> Dict[str, List[list]]:
+        """所有指标的快照"""
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def expose(self, snapshots: Sequence[Dict[str, Any]] = (),
+               live_snapshots: Sequence[Dict[str, Any]] = ()) -> str:
+        """
+        生成 Prometheus 文本格式
+
+        Args:
+            snapshots: 其他进程的指标快照（见 snapshot），计数器和直方图与本进程的相加后输出
+            live_snapshots: 仍在运行的进程的快照，仪表取其与本进程中的最大值（已退出进程的仪表不再反映当前状态）
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose(live_snapshots if metric.kind == 'gauge' else snapshots))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# 各处理阶段耗时
+WEBHOOK_SECONDS = Histogram('mcp_webhook_handling_seconds', 'Webhook 请求处理耗时', ['repository'])
+DIFF_FETCH_SECONDS = Histogram('mcp_diff_fetch_seconds', '获取 PR 差异耗时', ['repository'])
+LLM_SECONDS = Histogram('mcp_llm_call_seconds', 'LLM 调用耗时', ['repository', 'model'])
+LLM_FIRST_TOKEN_SECONDS = Histogram('mcp_llm_first_token_seconds', 'LLM 流式输出首个 token 的耗时',
+                                    ['repository', 'model'])
+DIFF_COMPRESSION_RATIO = Histogram('mcp_diff_compression_ratio', '原始差异与送入提示词的差异的长度之比',
+                                   ['repository'], buckets=(1, 1.5, 2, 3, 5, 10, 20, 50))
+MICROBATCH_SIZE = Histogram('mcp_microbatch_size', '合批后每次 LLM 请求包含的 PR 数', ['repository'],
+                            buckets=(1, 2, 4, 8, 16, 32))
+FEISHU_SEND_SECONDS = Histogram('mcp_feishu_send_seconds', '发送到飞书耗时', ['repository'])
+END_TO_END_SECONDS = Histogram('mcp_end_to_end_seconds', '从收到事件到处理完成的总耗时', ['repository'])
+FIRST_NOTIFICATION_SECONDS = Histogram('mcp_first_notification_seconds', '从收到事件到发出第一条通知的耗时',
+                                       ['repository'])
+
+# 计数器
+EVENTS_TOTAL = Counter('mcp_events_total', '按动作和结果统计的事件数', ['repository', 'action', 'status'])
+CACHE_REQUESTS_TOTAL = Counter('mcp_cache_requests_total', '缓存查询次数（result=hit/miss）',
+                               ['repository', 'cache', 'result'])
+UPSTREAM_ERRORS_TOTAL = Counter('mcp_upstream_errors_total', '上游服务错误数',
+                                ['repository', 'upstream', 'code'])
+TOKENS_TOTAL = Counter('mcp_llm_tokens_total', 'LLM 消耗的 token 数（kind=prompt/completion）',
+                       ['repository', 'model', 'kind'])
+TRIAGE_TOTAL = Counter('mcp_triage_total', '按摘要来源统计的 PR 数（kind=llm 或本地规则识别的类别）',
+                       ['repository', 'kind'])
+DEGRADED_TOTAL = Counter('mcp_degraded_total', '积压时降级处理的事件数（mode=cheap/heuristic/digest）',
+                         ['repository', 'mode'])
+
+# 仪表
+QUEUE_DEPTH = Gauge('mcp_queue_depth', '任务队列中待处理/处理中/延后的任务数', ['repository', 'state'])
+DEGRADATION_LEVEL = Gauge('mcp_degradation_level', '当前降级级别（0=full，1=cheap，2=heuristic，3=digest）')
+
+
+def error_code(error: Exception) -> str:
+    """从异常中提取上游错误码（HTTP 状态码或异常类型名）"""
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    return str(status) if status else type(error).__name__
+
+
+def update_queue_depth(job_queue) -> None:
+    """抓取指标前刷新队列深度"""
+    QUEUE_DEPTH.clear()
+    for (repository, state), count in job_queue.depth_by_repository().items():
+        QUEUE_DEPTH.set(count, repository=repository, state=state)
+
+
+def render(job_queue=None) -> str:
+    """生成 /metrics 响应体；给出任务队列时刷新队列深度，并合并工作进程写入队列的指标快照"""
+    if job_queue is None:
+        return REGISTRY.expose()
+    update_queue_depth(job_queue)
+    # 工作进程空闲时每 PUSH_INTERVAL 秒、处理任务期间随心跳写入快照
+    live_seconds = max(3 * PUSH_INTERVAL, job_queue.lease_seconds)
+    return REGISTRY.expose(job_queue.metric_snapshots(), job_queue.metric_snapshots(max_age=live_seconds))
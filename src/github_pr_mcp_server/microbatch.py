@@ -0,0 +1,138 @@
+"""
+GitHub PR MCP Server 跨 PR 合批
+
+事件密集时，把同一仓库的多个小 PR（fast 档位、单次调用）在 MCP_MICROBATCH_WINDOW 秒内攒成一批，
+用一次要求 JSON 输出的 LLM 请求为每个 PR 生成摘要，再拆回各自的处理结果，
+请求数和重复发送的系统提示词 token 随之减少（MCP_MICROBATCH=1 开启）。
+
+合批在进程内的并发调用之间进行（同步模式的仓库处理通道、批量分析等），多进程模式的工作进程不合批；
+调用方在获取差异前用 track() 登记，只有还有其他登记的调用方尚未提交时，批次才等待窗口，
+否则立即执行。窗口内只有一个 PR、或批量结果中缺少某个 PR 时，该 PR 改为单独调用。
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Hashable, Iterator, List, Optional
+
+
+MICROBATCH_ENABLED = os.getenv('MCP_MICROBATCH', '0') == '1'
+WINDOW_SECONDS = float(os.getenv('MCP_MICROBATCH_WINDOW', 2.0))
+MAX_ITEMS = int(os.getenv('MCP_MICROBATCH_MAX_ITEMS', 8))
+
+# 一批中各 PR 预处理后差异的总字符数上限
+MAX_CHARS = int(os.getenv('MCP_MICROBATCH_MAX_CHARS', 16000))
+
+# 批量请求的 max_tokens 上限
+MAX_TOKENS = 4000
+
+# 当前调用方的登记状态：[尚未提交]
+_registration: contextvars.ContextVar = contextvars.ContextVar('mcp_microbatch_registration', default=None)
+
+
+class _Batch:
+    """一个正在攒的批次"""
+
+    def __init__(self):
+        self.items: List[Dict[str, Any]] = []
+        self.chars = 0
+        self.closed = False
+        self.results: List[Optional[str]] = []
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    按键攒批：第一个加入批次的调用方等到窗口结束或攒满后执行整批，其余调用方等待结果
+
+    run(key, items) 返回与 items 一一对应的结果，None 表示该项需要调用方单独处理。
+    批次只在还有 track() 登记的调用方尚未提交时等待，没有并发调用方时不增加延迟。
+    """
+
+    def __init__(self, run: Callable[[Hashable, List[Dict[str, Any]]], List[Optional[str]]],
+                 window: float = WINDOW_SECONDS, max_items: int = MAX_ITEMS, max_chars: int = MAX_CHARS,
+                 enabled: bool = MICROBATCH_ENABLED):
+        self.run = run
+        self.window = window
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.enabled = enabled
+        self._open: Dict[Hashable, _Batch] = {}
+        self._cond = threading.Condition()
+        # 已登记但尚未提交的调用方数
+        self._pending = 0
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """登记一个可能提交的调用方（获取差异等准备工作期间），批次等待登记的调用方提交或离开"""
+        registration = [True]
+        token = _registration.set(registration)
+        with self._cond:
+            self._pending += 1
+        try:
+            yield
+        finally:
+            _registration.reset(token)
+            with self._cond:
+                self._settle(registration)
+
+    def _settle(self, registration: Optional[List[bool]]):
+        """登记的调用方已提交或离开（调用时持有锁）"""
+        if registration and registration[0]:
+            registration[0] = False
+            self._pending -= 1
+            self._cond.notify_all()
+
+    def _close(self, key: Hashable, batch: _Batch):
+        batch.closed = True
+        if self._open.get(key) is batch:
+            del self._open[key]
+        self._cond.notify_all()
+
+    def submit(self, key: Hashable, item: Dict[str, Any], chars: int = 0) -> Optional[str]:
+        """
+        加入批次并等待结果
+
+        Args:
+            key: 批次键，键相同的项才会合批
+            item: 交给 run 的一项
+            chars: 该项的大小，用于限制每批总字符数
+
+        Returns:
+            该项的结果；None 表示需要调用方单独处理
+        """
+        with self._cond:
+            batch = self._open.get(key)
+            if batch is not None and batch.chars + chars > self.max_chars:
+                self._close(key, batch)
+                batch = None
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch()
+            index = len(batch.items)
+            batch.items.append(item)
+            batch.chars += chars
+            self._settle(_registration.get())
+            if len(batch.items) >= self.max_items:
+                self._close(key, batch)
+            if leader:
+                deadline = time.monotonic() + self.window
+                while not batch.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._pending <= 0:
+                        self._close(key, batch)
+                        break
+                    self._cond.wait(remaining)
+
+        if leader:
+            try:
+                batch.results = list(self.run(key, batch.items)) if len(batch.items) > 1 else []
+            except Exception as e:
+                print(f"⚠️ 合批处理失败，逐项单独处理: {e}")
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+        return batch.results[index] if index < len(batch.results) else None
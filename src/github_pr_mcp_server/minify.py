@@ -0,0 +1,248 @@
+"""
+GitHub PR MCP Server 差异片段精简
+
+在文件过滤和压缩之后进一步精简保留下来的差异，用更少的 token 表达相同的信息：
+
+  - 每处变更只保留前后 MCP_DIFF_CONTEXT_LINES 行上下文，文件头只保留路径和状态
+    （MCP_DIFF_MINIFY=0 关闭精简）
+  - 只有空白/缩进变化的变更块折叠为一行说明（Python、YAML、Makefile 等缩进有语义的文件中，
+    缩进变化的变更块保留原样）
+  - 内容相同的“删除文件 + 新增文件”识别为重命名，成块移动的代码识别为移动
+  - 多处完全相同的机械性修改只保留第一处，并注明出现次数和位置
+"""
+
+import os
+import re
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+
+MINIFY_ENABLED = os.getenv('MCP_DIFF_MINIFY', '1') != '0'
+CONTEXT_LINES = int(os.getenv('MCP_DIFF_CONTEXT_LINES', 1))
+
+# 识别为移动的最少行数
+MOVE_MIN_LINES = 3
+
+# 文件头中保留的行
+_KEPT_HEADER_PREFIXES = ('diff --git ', 'new file mode', 'deleted file mode', 'rename from ',
+                         'rename to ', 'old mode', 'new mode')
+
+_WHITESPACE = re.compile(r'\s+')
+
+# 缩进有语义的文件：缩进变化不视为空白变更
+INDENT_SENSITIVE_EXTENSIONS = ('.py', '.pyi', '.pyx', '.yaml', '.yml', '.mk')
+INDENT_SENSITIVE_NAMES = ('Makefile', 'makefile', 'GNUmakefile')
+
+
+def indent_sensitive(path: str) -> bool:
+    """文件的缩进是否有语义"""
+    name = path.rsplit('/', 1)[-1]
+    return name in INDENT_SENSITIVE_NAMES or os.path.splitext(name)[1].lower() in INDENT_SENSITIVE_EXTENSIONS
+
+
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def whitespace_only(path: str, removed: List[str], added: List[str]) -> bool:
+    """
+    删除行和新增行是否只有空白不同
+
+    缩进有语义的文件逐行比较：每个非空行的缩进必须完全相同，只忽略行内的空白。
+    """
+    if indent_sensitive(path):
+        removed = [line for line in removed if line.strip()]
+        added = [line for line in added if line.strip()]
+        return len(removed) == len(added) and all(
+            _indent(old) == _indent(new) and _WHITESPACE.sub('', old) == _WHITESPACE.sub('', new)
+            for old, new in zip(removed, added)
+        )
+    return _WHITESPACE.sub('', ''.join(removed)) == _WHITESPACE.sub('', ''.join(added))
+
+
+class _Block:
+    """一处连续的变更（删除行和新增行）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.removed: List[str] = []
+        self.added: List[str] = []
+        self.whitespace_only = False
+        self.moved_to: Optional[str] = None
+        self.moved_from: Optional[str] = None
+        self.repeats: List[str] = []
+        self.folded = False
+
+    def key(self) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        return tuple(line.strip() for line in self.removed), tuple(line.strip() for line in self.added)
+
+    def render(self) -> List[str]:
+        if self.whitespace_only:
+            return [f"~ 仅空白/缩进变更（-{len(self.removed)} +{len(self.added)} 行）"]
+        lines = []
+        if self.moved_to is not None:
+            lines.append(f"~ {len(self.removed)} 行移动到 {self._where(self.moved_to)}"
+                         f"（{self.removed[0].strip()} …）")
+        else:
+            lines.extend(f"-{line}" for line in self.removed)
+        if self.moved_from is not None:
+            lines.append(f"~ 从 {self._where(self.moved_from)} 移入 {len(self.added)} 行，内容未变"
+                         f"（{self.added[0].strip()} …）")
+        else:
+            lines.extend(f"+{line}" for line in self.added)
+        if self.repeats:
+            lines.append(f"~ 相同变更共 {len(self.repeats) + 1} 处，另见: {_locations(self.repeats)}")
+        return lines
+
+    def _where(self, path: str) -> str:
+        return '本文件其他位置' if path == self.path else path
+
+
+Hunk = Tuple[str, List[Union[str, _Block]]]
+
+
+def _locations(paths: List[str]) -> str:
+    counts: Dict[str, int] = {}
+    for path in paths:
+        counts[path] = counts.get(path, 0) + 1
+    return ', '.join(path if count == 1 else f"{path}×{count}" for path, count in counts.items())
+
+
+def _normalized(lines: List[str]) -> str:
+    return '\n'.join(line.strip() for line in lines)
+
+
+def _parse_hunks(path: str, body: List[str]) -> List[Hunk]:
+    hunks: List[Hunk] = []
+    for line in body:
+        if line.startswith('@@'):
+            hunks.append((line, []))
+            continue
+        if not hunks or line.startswith('\\'):
+            continue
+        items = hunks[-1][1]
+        kind = line[:1]
+        if kind in ('+', '-'):
+            if not items or not isinstance(items[-1], _Block):
+                items.append(_Block(path))
+            (items[-1].removed if kind == '-' else items[-1].added).append(line[1:])
+        else:
+            items.append(line[1:])
+    return hunks
+
+
+def _render_hunk(header: str, items: List[Union[str, _Block]], stats: Dict[str, int]) -> List[str]:
+    """渲染片段：只保留未折叠变更块附近的上下文；没有剩余变更时返回空列表"""
+    kept = [index for index, item in enumerate(items) if isinstance(item, _Block) and not item.folded]
+    if not kept:
+        return []
+
+    visible = set()
+    for index in kept:
+        visible.update(range(index - CONTEXT_LINES, index + CONTEXT_LINES + 1))
+
+    lines, elided = [header], False
+    for index, item in enumerate(items):
+        if isinstance(item, _Block):
+            if not item.folded:
+                lines.extend(item.render())
+            continue
+        if index in visible:
+            if elided and len(lines) > 1:
+                lines.append(' ⋯')
+            elided = False
+            lines.append(f" {item}")
+        else:
+            stats['context_lines_dropped'] += 1
+            elided = True
+    return lines
+
+
+def minify_files(files: List[Any]) -> Tuple[List[str], Dict[str, int]]:
+    """
+    精简多个文件的差异
+
+    Args:
+        files: diffs.FileDiff 列表
+
+    Returns:
+        (与输入顺序一致的各文件文本，被合并掉的文件为空字符串, 统计)
+    """
+    stats = {'context_lines_dropped': 0, 'whitespace_blocks': 0, 'moved_blocks': 0,
+             'renamed_files': 0, 'folded_edits': 0}
+
+    # 内容相同的删除文件和新增文件视为重命名
+    renamed_from: Dict[int, str] = {}
+    dropped = set()
+    deleted = {}
+    for index, file in enumerate(files):
+        if file.status == 'deleted' and file.deletions:
+            deleted.setdefault(_normalized([line[1:] for line in file.body if line.startswith('-')]), index)
+    for index, file in enumerate(files):
+        if file.status != 'added' or not file.additions:
+            continue
+        source = deleted.pop(_normalized([line[1:] for line in file.body if line.startswith('+')]), None)
+        if source is not None:
+            renamed_from[index] = files[source].path
+            dropped.add(source)
+            stats['renamed_files'] += 1
+
+    parsed = {index: _parse_hunks(file.path, file.body) for index, file in enumerate(files)
+              if index not in dropped and index not in renamed_from}
+    blocks = [item for hunks in parsed.values() for _, items in hunks
+              for item in items if isinstance(item, _Block)]
+
+    for block in blocks:
+        if block.removed and block.added and whitespace_only(block.path, block.removed, block.added):
+            block.whitespace_only = True
+            stats['whitespace_blocks'] += 1
+
+    # 成块删除的代码在其他位置原样新增，视为移动
+    added_runs: Dict[str, List[_Block]] = {}
+    for block in blocks:
+        if not block.whitespace_only and len(block.added) >= MOVE_MIN_LINES:
+            added_runs.setdefault(_normalized(block.added), []).append(block)
+    for block in blocks:
+        if block.whitespace_only or len(block.removed) < MOVE_MIN_LINES:
+            continue
+        targets = [target for target in added_runs.get(_normalized(block.removed), []) if target is not block]
+        if targets:
+            target = targets[0]
+            added_runs[_normalized(block.removed)].remove(target)
+            block.moved_to, target.moved_from = target.path, block.path
+            stats['moved_blocks'] += 1
+
+    # 完全相同的修改只保留第一处
+    first_seen: Dict[Any, _Block] = {}
+    for block in blocks:
+        if block.whitespace_only or block.moved_to is not None or block.moved_from is not None:
+            continue
+        removed, added = block.key()
+        if not any(removed) and not any(added):
+            continue  # 只增删空行
+        first = first_seen.setdefault(block.key(), block)
+        if first is not block:
+            first.repeats.append(block.path)
+            block.folded = True
+            stats['folded_edits'] += 1
+
+    rendered = []
+    for index, file in enumerate(files):
+        header = [line for line in file.header if line.startswith(_KEPT_HEADER_PREFIXES)]
+        if index in dropped:
+            rendered.append('')
+        elif index in renamed_from:
+            rendered.append('\n'.join([
+                f"diff --git a/{renamed_from[index]} b/{file.path}",
+                f"rename from {renamed_from[index]}",
+                f"rename to {file.path}",
+                f"~ 内容未变（{file.additions} 行）",
+            ]))
+        else:
+            lines = list(header)
+            hunks = [_render_hunk(hunk_header, items, stats) for hunk_header, items in parsed[index]]
+            for hunk in hunks:
+                lines.extend(hunk)
+            if parsed[index] and not any(hunks):
+                lines.append("~ 全部变更与其他位置相同（已折叠）")
+            rendered.append('\n'.join(lines))
+    return rendered, stats
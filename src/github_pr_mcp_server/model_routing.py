@@ -0,0 +1,131 @@
+"""
+GitHub PR MCP Server 按规模和复杂度选择模型
+
+根据 Webhook 载荷中的 additions / deletions / changed_files（获取差异之前即可确定），
+以及解析差异得到的特征，为每个 PR 选择模型档位、max_tokens 和摘要策略
+（MCP_MODEL_ROUTING=0 时始终使用 standard 档位单次调用）：
+
+  fast      变更行数不超过 MCP_MODEL_SMALL_LINES 且文件不超过 10 个
+  deep      变更行数不少于 MCP_MODEL_LARGE_LINES 或文件不少于 50 个
+  standard  其余 PR
+
+涉及数据库迁移、认证、CI 工作流、基础设施等敏感路径，或同时改动 3 种以上语言的 PR 提升一档；
+变更行数超过 MCP_MODEL_CHUNK_LINES 的 PR 分块摘要后再汇总（chunked），否则单次调用（single）。
+"""
+
+import os
+from typing import Dict, Any, List, Optional
+
+from .diffs import path_matches, split_file_diffs
+from .symbols import language_of
+
+
+ROUTING_ENABLED = os.getenv('MCP_MODEL_ROUTING', '1') != '0'
+
+TIERS = ('fast', 'standard', 'deep')
+
+# 默认模型的成本和能力都按 fast ≤ standard ≤ deep 递增，覆盖时也应保持这一顺序
+TIER_MODELS = {
+    'fast': os.getenv('MCP_MODEL_FAST', 'gpt-4o-mini'),
+    'standard': os.getenv('MCP_MODEL_STANDARD', 'gpt-4.1-mini'),
+    'deep': os.getenv('MCP_MODEL_DEEP', 'gpt-4.1'),
+}
+
+TIER_MAX_TOKENS = {'fast': 500, 'standard': 1000, 'deep': 1500}
+
+SMALL_LINES = int(os.getenv('MCP_MODEL_SMALL_LINES', 200))
+LARGE_LINES = int(os.getenv('MCP_MODEL_LARGE_LINES', 2000))
+CHUNK_LINES = int(os.getenv('MCP_MODEL_CHUNK_LINES', 600))
+
+SMALL_FILES = 10
+LARGE_FILES = 50
+
+# 改动后需要更仔细审查的路径（MCP_MODEL_RISKY_PATTERNS 追加，逗号分隔）
+RISKY_PATTERNS = (
+    '**/migrations/**', '*.sql', '**/auth/**', '*auth*.*', '**/security/**', '*crypto*.*',
+    '**/payment*/**', '.github/workflows/**', 'Dockerfile', '*.tf', '**/k8s/**', '**/helm/**',
+) + tuple(pattern.strip() for pattern in os.getenv('MCP_MODEL_RISKY_PATTERNS', '').split(',') if pattern.strip())
+
+# 同时改动的语言数达到该值时视为跨语言变更
+MULTI_LANGUAGE = 3
+
+
+class ModelPlan:
+    """一个 PR 的模型选择"""
+
+    def __init__(self, tier: str, strategy: str = 'single', reasons: Optional[List[str]] = None):
+        self.tier = tier
+        self.model = TIER_MODELS[tier]
+        self.max_tokens = TIER_MAX_TOKENS[tier]
+        self.strategy = strategy
+        self.reasons = list(reasons or [])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'tier': self.tier,
+            'model': self.model,
+            'max_tokens': self.max_tokens,
+            'strategy': self.strategy,
+            'reasons': self.reasons,
+        }
+
+
+# 未启用模型路由时的默认选择
+DEFAULT_PLAN = ModelPlan('standard')
+
+
+def _escalate(tier: str) -> str:
+    return TIERS[min(TIERS.index(tier) + 1, len(TIERS) - 1)]
+
+
+def diff_features(diff_content: str) -> Dict[str, Any]:
+    """解析差异得到的特征：增删行数、文件数、语言数和敏感路径"""
+    files = split_file_diffs(diff_content)
+    languages = {language_of(file.path) for file in files} - {None}
+    return {
+        'additions': sum(file.additions for file in files),
+        'deletions': sum(file.deletions for file in files),
+        'changed_files': len(files),
+        'languages': len(languages),
+        'risky_files': [file.path for file in files
+                        if any(path_matches(pattern, file.path) for pattern in RISKY_PATTERNS)],
+    }
+
+
+def plan_model(pull_request: Optional[Dict[str, Any]] = None, diff_content: str = "") -> ModelPlan:
+    """
+    为 PR 选择模型档位、max_tokens 和摘要策略
+
+    Args:
+        pull_request: Webhook 载荷中的 pull_request（可选），提供 additions / deletions / changed_files
+        diff_content: PR 差异（可选）；给出时按差异特征提升档位，载荷缺少统计时也从差异计算
+
+    Returns:
+        模型选择
+    """
+    if not ROUTING_ENABLED:
+        return DEFAULT_PLAN
+
+    pull_request = pull_request or {}
+    features = diff_features(diff_content) if diff_content else {}
+    additions = int(pull_request.get('additions') or features.get('additions', 0))
+    deletions = int(pull_request.get('deletions') or features.get('deletions', 0))
+    changed_files = int(pull_request.get('changed_files') or features.get('changed_files', 0))
+    lines = additions + deletions
+
+    if lines >= LARGE_LINES or changed_files >= LARGE_FILES:
+        tier, reasons = 'deep', [f"规模大（{lines} 行，{changed_files} 个文件）"]
+    elif lines <= SMALL_LINES and changed_files <= SMALL_FILES:
+        tier, reasons = 'fast', [f"规模小（{lines} 行，{changed_files} 个文件）"]
+    else:
+        tier, reasons = 'standard', [f"规模中等（{lines} 行，{changed_files} 个文件）"]
+
+    if features.get('risky_files'):
+        tier = _escalate(tier)
+        reasons.append(f"涉及敏感路径（{', '.join(features['risky_files'][:3])}）")
+    elif features.get('languages', 0) >= MULTI_LANGUAGE:
+        tier = _escalate(tier)
+        reasons.append(f"跨 {features['languages']} 种语言")
+
+    strategy = 'chunked' if lines > CHUNK_LINES else 'single'
+    return ModelPlan(tier, strategy, reasons)
@@ -0,0 +1,266 @@
+"""
+GitHub PR MCP Server 在线诊断
+
+无需重启即可在运行中的服务上：
+  - 按固定频率采样所有线程的调用栈 N 秒，输出 collapsed stack（火焰图）或 speedscope 文件
+  - 用 tracemalloc 对比两次内存快照，返回增长最多的前 N 个分配位置
+
+诊断端点需要管理员令牌（MCP_ADMIN_TOKEN），通过 `Authorization: Bearer <token>`
+或 `X-Admin-Token` 请求头传入；未设置令牌时端点禁用。
+"""
+
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, Any, List, Mapping, Tuple
+
+
+MAX_PROFILE_SECONDS = 60
+DEFAULT_HZ = 100
+
+# (名称, 文件, 行号)
+Frame = Tuple[str, str, int]
+# (线程名, 从外到内的调用栈) -> 采样次数
+StackCounts = Dict[Tuple[str, Tuple[Frame, ...]], int]
+
+_profile_lock = threading.Lock()
+
+
+def check_admin_token(headers: Mapping[str, str]) -> Tuple[int, str]:
+    """
+    校验管理员令牌
+
+    Returns:
+        (状态码, 错误信息)；通过时状态码为 200
+    """
+    token = os.getenv('MCP_ADMIN_TOKEN', '')
+    if not token:
+        return 403, '未配置 MCP_ADMIN_TOKEN，诊断端点已禁用'
+
+    provided = headers.get('X-Admin-Token', '')
+    authorization = headers.get('Authorization', '')
+    if authorization.startswith('Bearer '):
+        provided = authorization[len('Bearer '):]
+    if not provided or not hmac.compare_digest(provided.encode(), token.encode()):
+        return 401, '管理员令牌无效'
+    return 200, ''
+
+
+def sample_stacks(seconds: float, hz: int = DEFAULT_HZ) -> Tuple[StackCounts, float]:
+    """
+    采样当前进程所有线程（不含采样线程本身）的调用栈
+
+    Args:
+        seconds: 采样时长
+        hz: 每秒采样次数
+
+    Returns:
+        (各调用栈的采样次数, 实际采样时长)
+    """
+    interval = 1.0 / hz
+    own_id = threading.get_ident()
+    counts: StackCounts = {}
+    start = time.perf_counter()
+    deadline = start + seconds
+
+    while time.perf_counter() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, frame.f_lineno))
+                frame = frame.f_back
+            key = (names.get(thread_id, str(thread_id)), tuple(reversed(stack)))
+            counts[key] = counts.get(key, 0) + 1
+        time.sleep(interval)
+
+    return counts, time.perf_counter() - start
+
+
+def _frame_label(frame: Frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(';', ':')
+
+
+def to_collapsed(counts: StackCounts) -> str:
+    """转换为 collapsed stack 格式（flamegraph.pl / speedscope 均可读取）"""
+    lines = []
+    for (thread_name, stack), count in sorted(counts.items(), key=lambda item: -item[1]):
+        labels = [thread_name.replace(';', ':')] + [_frame_label(frame) for frame in stack]
+        lines.append(f"{';'.join(labels)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+def to_speedscope(counts: StackCounts, hz: int = DEFAULT_HZ,
+                  name: str = 'github-pr-mcp-server') -> Dict[str, Any]:
+    """转换为 speedscope 文件格式，每个线程一个 sampled profile"""
+    frames: List[Dict[str, Any]] = []
+    frame_index: Dict[Frame, int] = {}
+    profiles: Dict[str, Dict[str, Any]] = {}
+    interval = 1.0 / hz
+
+    for (thread_name, stack), count in counts.items():
+        indices = []
+        for frame in stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+            indices.append(frame_index[frame])
+
+        profile = profiles.setdefault(thread_name, {
+            'type': 'sampled',
+            'name': thread_name,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': 0,
+            'samples': [],
+            'weights': [],
+        })
+        profile['samples'].append(indices)
+        profile['weights'].append(count * interval)
+        profile['endValue'] += count * interval
+
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'github-pr-mcp-server',
+        'shared': {'frames': frames},
+        'profiles': sorted(profiles.values(), key=lambda p: -p['endValue']),
+    }
+
+
+def profile_endpoint(params: Mapping[str, str], headers: Mapping[str, str]) -> Tuple[int, str, str]:
+    """
+    采样分析端点（与 Web 框架无关）
+
+    参数: seconds（默认 10，最大 60）、hz（默认 100）、format（collapsed / speedscope）
+
+    Returns:
+        (状态码, 响应体, Content-Type)
+    """
+    status, error = check_admin_token(headers)
+    if status != 200:
+        return status, json.dumps({'error': error}, ensure_ascii=False), 'application/json'
+
+    try:
+        seconds = min(float(params.get('seconds', 10)), MAX_PROFILE_SECONDS)
+        hz = max(1, min(int(params.get('hz', DEFAULT_HZ)), 1000))
+    except ValueError as e:
+        return 400, json.dumps({'error': f'参数错误: {e}'}, ensure_ascii=False), 'application/json'
+    fmt = params.get('format', 'collapsed')
+    if fmt not in ('collapsed', 'speedscope'):
+        return 400, json.dumps({'error': f'不支持的格式: {fmt}'}, ensure_ascii=False), 'application/json'
+
+    # 同一时间只允许一个采样任务
+    if not _profile_lock.acquire(blocking=False):
+        return 409, json.dumps({'error': '已有采样正在进行'}, ensure_ascii=False), 'application/json'
+    try:
+        print(f"🔬 开始采样 {seconds:g}s ({hz}Hz)")
+        counts, _ = sample_stacks(seconds, hz)
+    finally:
+        _profile_lock.release()
+
+    if fmt == 'speedscope':
+        return 200, json.dumps(to_speedscope(counts, hz)), 'application/json'
+    return 200, to_collapsed(counts), 'text/plain; charset=utf-8'
+
+
+class MemoryTracker:
+    """tracemalloc 快照对比；每次调用与上一次快照比较，并把当前快照作为新的基线"""
+
+    def __init__(self, frames: int = 10):
+        self.frames = frames
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ))
+
+    def diff(self, top_n: int = 20, key_type: str = 'lineno') -> Dict[str, Any]:
+        """
+        与上一次快照比较
+
+        Args:
+            top_n: 返回前 N 个增长最多的位置
+            key_type: 分组方式（lineno / filename / traceback）
+
+        Returns:
+            首次调用时开始跟踪并返回 started；之后返回差异列表
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._snapshot = None
+
+            current = self._take_snapshot()
+            previous, self._snapshot = self._snapshot, current
+            traced, peak = tracemalloc.get_traced_memory()
+            if previous is None:
+                return {
+                    'status': 'started',
+                    'message': '已开始跟踪内存分配，再次调用以获取与本次快照的差异',
+                    'traced_kb': round(traced / 1024, 1),
+                }
+
+            stats = current.compare_to(previous, key_type)[:top_n]
+            return {
+                'status': 'success',
+                'traced_kb': round(traced / 1024, 1),
+                'peak_kb': round(peak / 1024, 1),
+                'top': [{
+                    'location': str(stat.traceback) if key_type != 'traceback'
+                                else '\n'.join(stat.traceback.format()),
+                    'size_kb': round(stat.size / 1024, 1),
+                    'size_diff_kb': round(stat.size_diff / 1024, 1),
+                    'count': stat.count,
+                    'count_diff': stat.count_diff,
+                } for stat in stats],
+            }
+
+    def stop(self) -> Dict[str, Any]:
+        """停止跟踪并丢弃基线快照"""
+        with self._lock:
+            self._snapshot = None
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+        return {'status': 'stopped'}
+
+
+MEMORY_TRACKER = MemoryTracker()
+
+
+def memory_endpoint(params: Mapping[str, str], headers: Mapping[str, str]) -> Tuple[int, str, str]:
+    """
+    内存快照对比端点（与 Web 框架无关）
+
+    参数: top（默认 20）、key（lineno / filename / traceback）、stop=1 停止跟踪
+
+    Returns:
+        (状态码, 响应体, Content-Type)
+    """
+    status, error = check_admin_token(headers)
+    if status == 200:
+        try:
+            if params.get('stop') in ('1', 'true'):
+                result = MEMORY_TRACKER.stop()
+            else:
+                key_type = params.get('key', 'lineno')
+                if key_type not in ('lineno', 'filename', 'traceback'):
+                    raise ValueError(f'不支持的分组方式: {key_type}')
+                result = MEMORY_TRACKER.diff(int(params.get('top', 20)), key_type)
+        except ValueError as e:
+            status, result = 400, {'error': f'参数错误: {e}'}
+    else:
+        result = {'error': error}
+    return status, json.dumps(result, ensure_ascii=False), 'application/json'
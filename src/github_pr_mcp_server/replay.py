@@ -0,0 +1,124 @@
+"""
+GitHub PR MCP Server Webhook 流量回放
+
+按录制时的到达间隔，把语料中的 Webhook 请求重新发送到目标服务器，
+支持 1 倍速、N 倍速和不等待的最大速度。
+
+用法:
+  github-pr-mcp-server replay corpus.jsonl.gz --target http://localhost:5000
+  github-pr-mcp-server replay corpus.jsonl.gz --target http://localhost:5000 --speed 10
+  github-pr-mcp-server replay corpus.jsonl.gz --target http://localhost:5000 --speed max
+"""
+
+import argparse
+import gzip
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional
+
+import requests
+
+from .capture import DEFAULT_CAPTURE_SECRET, sign_payload
+
+
+def load_corpus(path: str) -> Iterator[Dict[str, Any]]:
+    """逐条读取录制语料（支持 gzip 和普通 JSONL）"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as corpus:
+        for line in corpus:
+            if line.strip():
+                yield json.loads(line)
+
+
+def replay(records: List[Dict[str, Any]], target: str, speed: Optional[float] = 1.0,
+           secret: str = DEFAULT_CAPTURE_SECRET, route: str = '',
+           concurrency: int = 32) -> Dict[str, Any]:
+    """
+    回放录制的请求
+
+    Args:
+        records: 录制记录，按到达时间排列
+        target: 目标服务器地址，如 http://localhost:5000
+        speed: 回放倍速；None 表示不等待、以最大速度发送
+        secret: 目标服务器的 Webhook 密钥，用于重新签名
+        route: 覆盖录制时的请求路径
+        concurrency: 最大并发请求数
+
+    Returns:
+        回放统计
+    """
+    statuses: Dict[str, int] = {}
+    latencies: List[float] = []
+    lock = threading.Lock()
+    session = requests.Session()
+
+    def send(record: Dict[str, Any]):
+        body = record['body'].encode('utf-8')
+        headers = dict(record['headers'])
+        headers.pop('Content-Length', None)
+        headers.pop('Host', None)
+        headers['X-Hub-Signature-256'] = sign_payload(body, secret)
+
+        start = time.perf_counter()
+        try:
+            response = session.post(target.rstrip('/') + (route or record['route']),
+                                    data=body, headers=headers, timeout=120)
+            status = str(response.status_code)
+        except requests.RequestException as e:
+            status = type(e).__name__
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        first_ts = records[0]['ts'] if records else 0
+        for record in records:
+            if speed:
+                # 保持录制时的到达间隔（按倍速缩放）
+                delay = start + (record['ts'] - first_ts) / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(send, record)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'sent': len(records),
+        'elapsed_seconds': elapsed,
+        'rate_per_s': len(records) / elapsed if elapsed else 0.0,
+        'statuses': statuses,
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    """replay 子命令入口"""
+    parser = argparse.ArgumentParser(prog='github-pr-mcp-server replay',
+                                     description="回放录制的 GitHub Webhook 流量")
+    parser.add_argument('corpus', help="录制语料（MCP_CAPTURE_PATH 生成的 .jsonl.gz）")
+    parser.add_argument('--target', required=True, help="目标服务器地址，如 http://localhost:5000")
+    parser.add_argument('--speed', default='1', help="回放倍速：1、N 或 max（默认 1）")
+    parser.add_argument('--secret', default=DEFAULT_CAPTURE_SECRET, help="目标服务器的 WEBHOOK_SECRET")
+    parser.add_argument('--route', default='', help="覆盖录制的请求路径，如 /webhook/github")
+    parser.add_argument('--concurrency', type=int, default=32, help="最大并发请求数")
+    parser.add_argument('--limit', type=int, default=0, help="只回放前 N 条")
+    args = parser.parse_args(argv)
+
+    speed = None if args.speed == 'max' else float(args.speed)
+    records = list(load_corpus(args.corpus))
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("⚠️ 语料为空")
+        return
+
+    span = records[-1]['ts'] - records[0]['ts']
+    print(f"🔁 回放 {len(records)} 条请求（录制跨度 {span:.1f}s，倍速 {args.speed}）→ {args.target}")
+    stats = replay(records, args.target, speed, args.secret, args.route, args.concurrency)
+    print(f"✅ 完成: {stats['sent']} 条，用时 {stats['elapsed_seconds']:.1f}s，"
+          f"{stats['rate_per_s']:.1f} 条/秒")
+    print(f"📊 状态码: {stats['statuses']}  p50: {stats['p50_ms']:.1f}ms  p99: {stats['p99_ms']:.1f}ms")
@@ -0,0 +1,224 @@
+"""
+GitHub PR MCP Server 多仓库路由
+
+按 `repository.full_name` 把事件路由到各仓库自己的凭据、通知目标和并发配额；
+每个路由有独立的处理通道（lane），单个仓库的事件风暴不会占满所有处理能力。
+
+路由表为 JSON 文件（MCP_ROUTES_PATH），值以 `env:` 开头时从对应环境变量读取：
+
+  {
+    "default": {"concurrency": 2},
+    "repositories": {
+      "org/monorepo": {
+        "openai_api_key": "env:MONOREPO_OPENAI_KEY",
+        "feishu_webhook_url": "https://open.feishu.cn/...",
+        "feishu_chat_id": "oc_xxx",
+        "github_token": "env:MONOREPO_GITHUB_TOKEN",
+        "webhook_secret": "env:MONOREPO_WEBHOOK_SECRET",
+        "concurrency": 4,
+        "weight": 2,
+        "diff_exclude": ["fixtures/**", "*.csv"]
+      },
+      "org/*": {"feishu_webhook_url": "https://open.feishu.cn/..."}
+    }
+  }
+
+未在路由表中列出的字段沿用默认路由（默认路由的凭据来自 OPENAI_API_KEY 等环境变量）；
+`"default": null` 表示拒绝未配置的仓库。
+"""
+
+import contextvars
+import fnmatch
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+
+ROUTE_FIELDS = ('openai_api_key', 'feishu_webhook_url', 'github_token', 'webhook_secret', 'feishu_chat_id')
+
+DEFAULT_REPO_CONCURRENCY = int(os.getenv('MCP_REPO_CONCURRENCY', 4))
+
+
+def _resolve_value(value: Any) -> Any:
+    """`env:NAME` 形式的值从环境变量读取"""
+    if isinstance(value, str) and value.startswith('env:'):
+        return os.getenv(value[4:], '')
+    return value
+
+
+class Route:
+    """单个仓库的路由"""
+
+    def __init__(self, pattern: str, openai_api_key: str = '', feishu_webhook_url: str = '',
+                 github_token: str = '', webhook_secret: str = '',
+                 concurrency: int = DEFAULT_REPO_CONCURRENCY, weight: float = 1.0,
+                 diff_exclude: Optional[List[str]] = None, feishu_chat_id: str = ''):
+        self.pattern = pattern
+        self.openai_api_key = openai_api_key
+        self.feishu_webhook_url = feishu_webhook_url
+        self.github_token = github_token
+        self.webhook_secret = webhook_secret
+        self.concurrency = max(1, int(concurrency))
+        # 多进程模式下仓库分享工作进程的权重
+        self.weight = max(0.01, float(weight))
+        # 送入 LLM 前从差异中排除的文件通配符
+        self.diff_exclude = list(diff_exclude or [])
+        # 接收草稿卡片的飞书群（见 drafts）
+        self.feishu_chat_id = feishu_chat_id
+
+    def merged(self, pattern: str, overrides: Dict[str, Any]) -> 'Route':
+        """以当前路由为基础，覆盖路由表中给出的字段"""
+        fields = {field: getattr(self, field) for field in ROUTE_FIELDS}
+        fields.update(concurrency=self.concurrency, weight=self.weight, diff_exclude=self.diff_exclude)
+        for key, value in overrides.items():
+            if key not in fields:
+                raise ValueError(f"路由 {pattern} 包含未知字段: {key}")
+            fields[key] = _resolve_value(value)
+        return Route(pattern, **fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """脱敏后的路由信息（用于健康检查）"""
+        info = {field: bool(getattr(self, field)) for field in ROUTE_FIELDS}
+        info.update({'pattern': self.pattern, 'concurrency': self.concurrency, 'weight': self.weight})
+        return info
+
+
+class RoutingTable:
+    """仓库路由表：精确匹配优先，其次按文件中的顺序匹配通配符"""
+
+    def __init__(self, default: Optional[Route], routes: Optional[List[Route]] = None):
+        self.default = default
+        self.exact = {route.pattern: route for route in routes or [] if '*' not in route.pattern}
+        self.patterns = [route for route in routes or [] if '*' in route.pattern]
+
+    @classmethod
+    def from_env(cls) -> 'RoutingTable':
+        """默认路由取自环境变量；设置 MCP_ROUTES_PATH 时加载路由表"""
+        env_default = Route(
+            '*',
+            openai_api_key=os.getenv('OPENAI_API_KEY', ''),
+            feishu_webhook_url=os.getenv('FEISHU_WEBHOOK_URL', ''),
+            github_token=os.getenv('GITHUB_TOKEN', ''),
+            webhook_secret=os.getenv('WEBHOOK_SECRET', ''),
+            feishu_chat_id=os.getenv('FEISHU_CHAT_ID', '')
+        )
+        path = os.getenv('MCP_ROUTES_PATH', '')
+        if not path:
+            return cls(env_default)
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_config(json.load(f), env_default)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], env_default: Route) -> 'RoutingTable':
+        default_config = config.get('default', {})
+        default = None if default_config is None else env_default.merged('*', default_config)
+        # 仓库路由以默认路由为基础；拒绝未配置仓库时以环境变量为基础
+        base = default or env_default
+        routes = [base.merged(pattern, overrides)
+                  for pattern, overrides in config.get('repositories', {}).items()]
+        return cls(default, routes)
+
+    def resolve(self, repository: str) -> Optional[Route]:
+        """查找仓库的路由；未配置且没有默认路由时返回 None"""
+        route = self.exact.get(repository)
+        if route is not None:
+            return route
+        for route in self.patterns:
+            if fnmatch.fnmatchcase(repository, route.pattern):
+                return route
+        return self.default
+
+    def quota(self, repository: str) -> int:
+        """仓库的并发配额；未配置的仓库为 0（不处理）"""
+        route = self.resolve(repository)
+        return route.concurrency if route is not None else 0
+
+    def weight(self, repository: str) -> float:
+        """仓库的调度权重"""
+        route = self.resolve(repository)
+        return route.weight if route is not None else 1.0
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'default': self.default.to_dict() if self.default else None,
+            'repositories': [route.to_dict() for route in list(self.exact.values()) + self.patterns],
+        }
+
+
+_current: Tuple[Any, Optional[RoutingTable]] = (None, None)
+_current_lock = threading.Lock()
+
+
+def current_routes() -> RoutingTable:
+    """
+    进程内共享的路由表；路由文件修改后重新加载
+
+    重新加载失败（如文件写了一半、JSON 格式错误）时记录错误并继续使用上一次加载成功的路由表，
+    直到文件再次修改；首次加载失败时抛出异常。
+    """
+    global _current
+    path = os.getenv('MCP_ROUTES_PATH', '')
+    key = (path, os.path.getmtime(path) if path and os.path.exists(path) else None)
+    with _current_lock:
+        if _current[0] != key or _current[1] is None:
+            try:
+                _current = (key, RoutingTable.from_env())
+            except Exception as e:
+                if _current[1] is None:
+                    raise
+                print(f"⚠️ 路由表 {path} 加载失败，继续使用上一次的路由表: {e}")
+                _current = (key, _current[1])
+        return _current[1]
+
+
+def repository_of(webhook_payload: str) -> str:
+    """从 Webhook 载荷 JSON 中取出仓库全名；无法解析时返回空字符串"""
+    try:
+        return json.loads(webhook_payload).get('repository', {}).get('full_name', '')
+    except (ValueError, AttributeError):
+        return ''
+
+
+class RepositoryLanes:
+    """
+    每个路由一个有界线程池，按路由配额限制并发处理数
+
+    通配符路由和默认路由下的仓库共用该路由的线程池，线程池数量不超过路由数。
+    """
+
+    def __init__(self):
+        self._lanes: Dict[str, Tuple[int, ThreadPoolExecutor]] = {}
+        self._queued: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _lane(self, route: Route) -> Tuple[ThreadPoolExecutor, Optional[ThreadPoolExecutor]]:
+        """返回路由的线程池，以及因配额变化被替换的旧线程池（调用方持有锁）"""
+        current = self._lanes.get(route.pattern)
+        if current is not None and current[0] == route.concurrency:
+            return current[1], None
+        lane = ThreadPoolExecutor(max_workers=route.concurrency, thread_name_prefix=f"mcp-lane-{route.pattern}")
+        self._lanes[route.pattern] = (route.concurrency, lane)
+        return lane, current[1] if current is not None else None
+
+    def _start(self, pattern: str, fn: Callable[..., Any], *args) -> Any:
+        with self._lock:
+            self._queued[pattern] -= 1
+        return fn(*args)
+
+    def run(self, route: Route, fn: Callable[..., Any], *args) -> Any:
+        """在路由的通道中执行并等待结果（保留调用方的追踪上下文）"""
+        with self._lock:
+            lane, replaced = self._lane(route)
+            self._queued[route.pattern] = self._queued.get(route.pattern, 0) + 1
+            future = lane.submit(contextvars.copy_context().run, self._start, route.pattern, fn, *args)
+        if replaced is not None:
+            # 旧线程池执行完已提交的任务后退出
+            replaced.shutdown(wait=False)
+        return future.result()
+
+    def depth(self) -> Dict[str, int]:
+        """各通道排队中（尚未开始执行）的任务数"""
+        with self._lock:
+            return dict(self._queued)
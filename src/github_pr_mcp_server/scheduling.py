@@ -0,0 +1,59 @@
+"""
+GitHub PR MCP Server 任务调度优先级
+
+任务入队时计算基础优先级（数值越小越先处理）：
+
+  类别   opened / reopened / ready_for_review 为 0，synchronize 等其他事件为 1，回填任务为 2，
+         每个类别相差 MCP_SCHED_CLASS_SPAN
+  规模   log2(1 + additions + deletions + 20 × changed_files)，小 PR 优先
+
+认领时的有效优先级再减去等待时长 / MCP_SCHED_AGING_SECONDS（老化，避免大 PR 和回填任务饿死），
+并加上 MCP_SCHED_REPO_PENALTY × 仓库处理中任务数 / 仓库权重，使各仓库按权重分享工作进程。
+"""
+
+import math
+import os
+from typing import Dict, Any
+
+
+CLASS_SPAN = float(os.getenv('MCP_SCHED_CLASS_SPAN', 20))
+AGING_SECONDS = float(os.getenv('MCP_SCHED_AGING_SECONDS', 30))
+REPO_PENALTY = float(os.getenv('MCP_SCHED_REPO_PENALTY', 5))
+
+# 新 PR 最受关注，其次是已有 PR 的更新
+FIRST_CLASS_ACTIONS = ('opened', 'reopened', 'ready_for_review')
+
+# 每个变更文件折算的行数
+FILE_LINE_EQUIVALENT = 20
+
+SOURCE_LIVE = 'live'
+SOURCE_BACKFILL = 'backfill'
+
+
+def priority_class(action: str, source: str = SOURCE_LIVE) -> int:
+    """事件的优先级类别：0 最高"""
+    if source == SOURCE_BACKFILL:
+        return 2
+    return 0 if action in FIRST_CLASS_ACTIONS else 1
+
+
+def pr_size_cost(pull_request: Dict[str, Any]) -> float:
+    """按 PR 载荷中的 additions / deletions / changed_files 估算处理成本"""
+    lines = (int(pull_request.get('additions') or 0) + int(pull_request.get('deletions') or 0)
+             + FILE_LINE_EQUIVALENT * int(pull_request.get('changed_files') or 0))
+    return math.log2(1 + lines)
+
+
+def webhook_priority(payload: Dict[str, Any], source: str = SOURCE_LIVE) -> float:
+    """
+    计算 Webhook 事件的基础优先级
+
+    Args:
+        payload: 解析后的 GitHub Webhook 载荷
+        source: 事件来源，live（实时 Webhook）或 backfill（回填）
+
+    Returns:
+        基础优先级，数值越小越先处理
+    """
+    cls = priority_class(payload.get('action', ''), source)
+    return round(cls * CLASS_SPAN + pr_size_cost(payload.get('pull_request') or {}), 3)
@@ -3,18 +3,36 @@ GitHub PR MCP Server 服务器模块
 """
 
 import os
-import json
-from typing import Dict, Any, Optional
-from flask import Flask, request, jsonify
-import gradio as gr
+import time
+from typing import Dict, Any, Iterator, Optional, Tuple
+from flask import Flask, Response, request, jsonify
 
 from .core import (
     verify_webhook_signature,
-    extract_pr_info,
-    get_pr_diff,
     analyze_code_changes,
-    process_github_pr
+    stream_code_changes,
+    format_feishu_message,
+    send_summary_to_feishu,
+    process_webhook_payload,
+    post_pr_draft
 )
+from .batch import analyze_prs_batch, parse_batch_items
+from .job_queue import JobQueue
+from .jobs import JobTable
+from .degradation import DegradationController
+from .routing import RepositoryLanes, current_routes, repository_of
+from .scheduling import SOURCE_LIVE, webhook_priority
+from .capture import WebhookRecorder
+from . import drafts, metrics, profiling, tracing
+from .metrics import FIRST_NOTIFICATION_SECONDS, WEBHOOK_SECONDS
+from .timings import collect, stage, server_timing_header
+
+
+# 流式输出时两次界面/进度更新之间的最小间隔（秒）
+STREAM_UPDATE_INTERVAL = 0.1
+
+# 等待异步任务时两次进度更新之间的间隔（秒）
+JOB_POLL_INTERVAL = 1.0
 
 
 class GradioMCPServer:
@@ -27,6 +45,9 @@ class GradioMCPServer:
         self.feishu_webhook_url = os.getenv('FEISHU_WEBHOOK_URL', '')
         self.github_token = os.getenv('GITHUB_TOKEN', '')
         
+        # 异步 MCP 任务（mcp_process_webhook_async / mcp_get_job / mcp_list_jobs）
+        self.jobs = JobTable.from_env()
+        
         # 创建 Gradio 界面
         self.demo = self._create_gradio_interface()
     
@@ -65,6 +86,24 @@ class GradioMCPServer:
                         "required": ["diff_content"]
                     }
                 },
+                {
+                    "name": "mcp_analyze_pr_with_timings",
+                    "description": "分析 GitHub PR 差异，返回摘要和耗时分解",
+                    "inputSchema": {
+                        "type": "object",
+                        "properties": {
+                            "diff_content": {
+                                "type": "string",
+                                "description": "GitHub PR 差异内容"
+                            },
+                            "openai_api_key": {
+                                "type": "string",
+                                "description": "OpenAI API 密钥（可选）"
+                            }
+                        },
+                        "required": ["diff_content"]
+                    }
+                },
                 {
                     "name": "mcp_process_webhook",
                     "description": "处理 GitHub Webhook 载荷并生成摘要",
@@ -91,6 +130,93 @@ class GradioMCPServer:
                         "required": ["webhook_payload"]
                     }
                 },
+                {
+                    "name": "mcp_process_webhook_async",
+                    "description": "提交 Webhook 处理任务，立即返回任务 ID",
+                    "inputSchema": {
+                        "type": "object",
+                        "properties": {
+                            "webhook_payload": {
+                                "type": "string",
+                                "description": "GitHub Webhook 载荷的 JSON 字符串"
+                            },
+                            "openai_api_key": {
+                                "type": "string",
+                                "description": "OpenAI API 密钥（可选）"
+                            },
+                            "feishu_webhook_url": {
+                                "type": "string",
+                                "description": "飞书 Webhook URL（可选）"
+                            },
+                            "github_token": {
+                                "type": "string",
+                                "description": "GitHub 令牌（可选）"
+                            }
+                        },
+                        "required": ["webhook_payload"]
+                    }
+                },
+                {
+                    "name": "mcp_get_job",
+                    "description": "查询异步任务状态和结果，可等待任务结束",
+                    "inputSchema": {
+                        "type": "object",
+                        "properties": {
+                            "job_id": {
+                                "type": "string",
+                                "description": "任务 ID"
+                            },
+                            "wait_seconds": {
+                                "type": "number",
+                                "description": "任务未结束时最多等待的秒数（可选，等待期间发送进度通知）"
+                            }
+                        },
+                        "required": ["job_id"]
+                    }
+                },
+                {
+                    "name": "mcp_list_jobs",
+                    "description": "按提交时间倒序列出异步任务",
+                    "inputSchema": {
+                        "type": "object",
+                        "properties": {
+                            "status": {
+                                "type": "string",
+                                "description": "按状态过滤：pending/running/success/error（可选）"
+                            },
+                            "limit": {
+                                "type": "integer",
+                                "description": "最多返回的任务数（默认 20）"
+                            }
+                        }
+                    }
+                },
+                {
+                    "name": "mcp_analyze_prs_batch",
+                    "description": "批量分析多个 PR（有限并发，结果按输入顺序返回）",
+                    "inputSchema": {
+                        "type": "object",
+                        "properties": {
+                            "items": {
+                                "type": "string",
+                                "description": "JSON 数组，或每行一个 PR 引用（owner/repo#123）/差异地址；数组元素也可以是差异文本"
+                            },
+                            "openai_api_key": {
+                                "type": "string",
+                                "description": "OpenAI API 密钥（可选）"
+                            },
+                            "github_token": {
+                                "type": "string",
+                                "description": "GitHub 令牌（可选）"
+                            },
+                            "max_concurrency": {
+                                "type": "integer",
+                                "description": "最大并发数（可选）"
+                            }
+                        },
+                        "required": ["items"]
+                    }
+                },
                 {
                     "name": "mcp_manual_analysis",
                     "description": "手动分析代码变更，支持可选的飞书集成",
@@ -122,11 +248,13 @@ class GradioMCPServer:
     
     def _create_gradio_interface(self):
         """创建 Gradio 界面"""
+        # 延迟导入：只有 Gradio 模式才加载 Gradio 的完整依赖
+        import gradio as gr
         
         def mcp_analyze_pr(diff_content: str, openai_api_key: str = "", 
-                          feishu_webhook_url: str = "", github_token: str = "") -> str:
+                          feishu_webhook_url: str = "", github_token: str = "") -> Iterator[str]:
             """
-            MCP 函数：分析 GitHub PR 差异并生成摘要
+            MCP 函数：分析 GitHub PR 差异并生成摘要（流式输出）
             
             Args:
                 diff_content: GitHub PR 差异内容
@@ -134,10 +262,31 @@ class GradioMCPServer:
                 feishu_webhook_url: 飞书 Webhook URL（可选）
                 github_token: GitHub 令牌（可选）
                 
+            Yields:
+                逐步生成的摘要；最后一次为完整摘要
+            """
+            for summary, _ in tracing.run_in_context(
+                self._stream_analysis(diff_content, openai_api_key or self.openai_api_key)
+            ):
+                yield summary
+        
+        def mcp_analyze_pr_with_timings(diff_content: str, openai_api_key: str = "") -> Dict[str, Any]:
+            """
+            MCP 函数：分析 GitHub PR 差异，返回摘要和耗时分解（非流式）
+            
+            Args:
+                diff_content: GitHub PR 差异内容
+                openai_api_key: OpenAI API 密钥
+                
             Returns:
-                AI 生成的代码变更摘要
+                包含 summary 和 timings 的结果
             """
-            return analyze_code_changes(diff_content, openai_api_key or self.openai_api_key)
+            summary, timings = "", {}
+            for summary, timings in tracing.run_in_context(
+                self._stream_analysis(diff_content, openai_api_key or self.openai_api_key)
+            ):
+                pass
+            return {'summary': summary, 'timings': timings}
         
         def mcp_process_webhook(webhook_payload: str, openai_api_key: str = "",
                               feishu_webhook_url: str = "", github_token: str = "") -> Dict[str, Any]:
@@ -151,66 +300,121 @@ class GradioMCPServer:
                 github_token: GitHub 令牌（可选）
                 
             Returns:
-                处理结果，包含摘要和元数据
+                处理结果，包含摘要、元数据和 timings 耗时分解
             """
-            try:
-                payload = json.loads(webhook_payload)
-                event_type = payload.get('action', '')
+            credentials = self._webhook_credentials(webhook_payload, openai_api_key,
+                                                    feishu_webhook_url, github_token)
+            if credentials is None:
+                return {'status': 'error', 'error': f'仓库 {repository_of(webhook_payload)} 未配置路由'}
+            return process_webhook_payload(webhook_payload, *credentials)
+        
+        def mcp_analyze_prs_batch(items: str, openai_api_key: str = "", github_token: str = "",
+                                  max_concurrency: int = 0) -> Dict[str, Any]:
+            """
+            MCP 函数：批量分析多个 PR，以有限并发执行，批次内相同的差异只获取和分析一次
+            
+            Args:
+                items: JSON 数组，或每行一个 PR 引用（owner/repo#123）/差异地址；数组元素也可以是差异文本
+                openai_api_key: OpenAI API 密钥
+                github_token: GitHub 令牌（可选）
+                max_concurrency: 最大并发数（可选）
                 
-                if event_type in ['opened', 'synchronize', 'reopened']:
-                    pr_info = extract_pr_info(payload)
-                    diff_content = get_pr_diff(pr_info['diff_url'], github_token or self.github_token)
-                    
-                    if diff_content:
-                        return process_github_pr(
-                            diff_content, 
-                            pr_info, 
-                            openai_api_key or self.openai_api_key,
-                            feishu_webhook_url or self.feishu_webhook_url
-                        )
-                    else:
-                        return {'error': '获取 PR 差异失败', 'status': 'error'}
-                else:
-                    return {'message': f'事件 {event_type} 被忽略', 'status': 'ignored'}
-                    
-            except Exception as e:
-                return {'error': str(e), 'status': 'error'}
+            Returns:
+                批量结果，results 与输入顺序一致，每项带 status、summary/error 和 timings
+            """
+            try:
+                parsed = parse_batch_items(items)
+            except ValueError as e:
+                return {'status': 'error', 'error': f'items 解析失败: {e}'}
+            # 调用方未提供的凭据按各项的仓库从路由表补全
+            return analyze_prs_batch(parsed, openai_api_key, github_token, int(max_concurrency or 0))
         
-        def mcp_manual_analysis(diff_content: str, openai_api_key: str = "",
-                              feishu_webhook_url: str = "", github_token: str = "") -> str:
+        def mcp_process_webhook_async(webhook_payload: str, openai_api_key: str = "",
+                                      feishu_webhook_url: str = "", github_token: str = "") -> Dict[str, Any]:
             """
-            MCP 函数：手动分析代码变更，支持可选的飞书集成
+            MCP 函数：提交 Webhook 处理任务，立即返回任务 ID，避免大 PR 导致工具调用超时
             
             Args:
-                diff_content: GitHub PR 差异内容
+                webhook_payload: GitHub Webhook 载荷的 JSON 字符串
                 openai_api_key: OpenAI API 密钥
                 feishu_webhook_url: 飞书 Webhook URL（可选）
                 github_token: GitHub 令牌（可选）
                 
             Returns:
-                AI 生成的代码变更摘要
+                包含 job_id 的提交结果，使用 mcp_get_job 查询进度
             """
-            summary = analyze_code_changes(diff_content, openai_api_key or self.openai_api_key)
+            credentials = self._webhook_credentials(webhook_payload, openai_api_key,
+                                                    feishu_webhook_url, github_token)
+            if credentials is None:
+                return {'status': 'error', 'error': f'仓库 {repository_of(webhook_payload)} 未配置路由'}
+            job_id = self.jobs.submit(
+                'process_webhook',
+                process_webhook_payload,
+                webhook_payload,
+                *credentials
+            )
+            if job_id is None:
+                return {'status': 'error', 'error': '任务表已满，请稍后重试'}
+            return {'status': 'queued', 'job_id': job_id}
+        
+        def mcp_get_job(job_id: str, wait_seconds: float = 0) -> Iterator[Dict[str, Any]]:
+            """
+            MCP 函数：查询异步任务状态和结果
             
-            if feishu_webhook_url or self.feishu_webhook_url:
-                try:
-                    mock_pr_info = {
-                        'number': 'Manual',
-                        'title': '手动代码分析',
-                        'html_url': 'N/A',
-                        'user': 'Manual User'
-                    }
-                    from .core import format_feishu_message, send_summary_to_feishu
-                    feishu_message = format_feishu_message(mock_pr_info, summary)
-                    webhook_url = feishu_webhook_url or self.feishu_webhook_url
-                    if send_summary_to_feishu(feishu_message, webhook_url):
-                        summary += "\n\n✅ 摘要已发送到飞书"
-                    else:
-                        summary += "\n\n❌ 发送到飞书失败"
-                except Exception as e:
-                    summary += f"\n\n❌ 发送到飞书失败: {str(e)}"
+            Args:
+                job_id: 任务 ID
+                wait_seconds: 任务未结束时最多等待的秒数；等待期间每秒产出一次状态（作为进度通知）
+                
+            Yields:
+                任务记录；最后一次为等待结束时的状态（结束的任务包含 result）
+            """
+            deadline = time.monotonic() + float(wait_seconds or 0)
+            while True:
+                job = self.jobs.get(job_id, min(JOB_POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+                if job is None:
+                    yield {'status': 'error', 'error': f'任务 {job_id} 不存在或已过期'}
+                    return
+                if job['status'] in ('success', 'error') or time.monotonic() >= deadline:
+                    yield job
+                    return
+                yield {'id': job_id, 'status': job['status']}
+        
+        def mcp_list_jobs(status: str = "", limit: int = 20) -> Dict[str, Any]:
+            """
+            MCP 函数：按提交时间倒序列出异步任务（不含结果正文）
             
-            return summary
+            Args:
+                status: 按状态过滤：pending/running/success/error（可选）
+                limit: 最多返回的任务数
+                
+            Returns:
+                任务列表和各状态的任务数
+            """
+            return {
+                'jobs': self.jobs.list_jobs(status, int(limit or 20)),
+                'stats': self.jobs.stats()
+            }
+        
+        def mcp_manual_analysis(diff_content: str, openai_api_key: str = "",
+                              feishu_webhook_url: str = "", github_token: str = "") -> Iterator[str]:
+            """
+            MCP 函数：手动分析代码变更，支持可选的飞书集成（流式输出）
+            
+            Args:
+                diff_content: GitHub PR 差异内容
+                openai_api_key: OpenAI API 密钥
+                feishu_webhook_url: 飞书 Webhook URL（可选）
+                github_token: GitHub 令牌（可选）
+                
+            Yields:
+                逐步生成的摘要；最后一次为完整摘要（含飞书发送结果）
+            """
+            for summary, _ in tracing.run_in_context(self._stream_analysis(
+                diff_content,
+                openai_api_key or self.openai_api_key,
+                feishu_webhook_url or self.feishu_webhook_url
+            )):
+                yield summary
         
         # 创建 Gradio 界面
         demo = gr.Interface(
@@ -241,8 +445,62 @@ index 83db48f..f735c3e 100644
             ]
         )
         
+        # 耗时分解、批量分析和异步任务以纯 API / MCP 工具的形式暴露
+        with demo:
+            for fn in (mcp_analyze_pr_with_timings, mcp_analyze_prs_batch, mcp_process_webhook_async,
+                       mcp_get_job, mcp_list_jobs):
+                gr.api(fn, api_name=fn.__name__)
+        
         return demo
     
+    def _webhook_credentials(self, webhook_payload: str, openai_api_key: str,
+                             feishu_webhook_url: str, github_token: str) -> Optional[tuple]:
+        """调用方未提供的凭据按载荷中的仓库从路由表补全；仓库未配置路由时返回 None"""
+        route = current_routes().resolve(repository_of(webhook_payload))
+        if route is None:
+            return None
+        return (
+            openai_api_key or route.openai_api_key,
+            feishu_webhook_url or route.feishu_webhook_url,
+            github_token or route.github_token
+        )
+    
+    def _stream_analysis(self, diff_content: str, openai_api_key: str,
+                         feishu_webhook_url: str = "") -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        流式分析并按间隔产出 (部分摘要, {})，完成后可选发送到飞书，最后产出 (完整摘要, timings)
+
+        Gradio 把每次产出推送到界面，并为 MCP 客户端发送进度通知。
+        """
+        with collect() as timings:
+            summary = ""
+            last_update = 0.0
+            for summary in stream_code_changes(diff_content, openai_api_key):
+                if time.perf_counter() - last_update >= STREAM_UPDATE_INTERVAL:
+                    last_update = time.perf_counter()
+                    yield summary, {}
+            
+            failed = summary.startswith("❌") or "\n\n❌ AI 分析失败" in summary
+            if feishu_webhook_url and not failed:
+                yield f"{summary}\n\n📤 正在发送到飞书...", {}
+                try:
+                    mock_pr_info = {
+                        'number': 'Manual',
+                        'title': '手动代码分析',
+                        'html_url': 'N/A',
+                        'user': 'Manual User'
+                    }
+                    with stage('render'):
+                        feishu_message = format_feishu_message(mock_pr_info, summary)
+                    if send_summary_to_feishu(feishu_message, feishu_webhook_url):
+                        summary += "\n\n✅ 摘要已发送到飞书"
+                    else:
+                        summary += "\n\n❌ 发送到飞书失败"
+                except Exception as e:
+                    summary += f"\n\n❌ 发送到飞书失败: {str(e)}"
+        
+        yield summary, timings.to_dict()
+    
     def launch(self, port: int = 8080):
         """启动 Gradio MCP 服务器"""
         print(f"🚀 GitHub PR Gradio MCP 服务器启动在端口 {port}")
@@ -250,6 +508,8 @@ index 83db48f..f735c3e 100644
         print(f"🔧 MCP 端点: http://localhost:{port}/gradio_api/mcp/sse")
         print(f"📡 Webhook URL: http://localhost:{port}/webhook/github")
         
+        print(f"📈 指标: http://localhost:{port}/metrics")
+        
         self.demo.launch(
             mcp_server=True,
             server_port=port,
@@ -257,20 +517,69 @@ index 83db48f..f735c3e 100644
             show_error=True,
             quiet=False,
             share=False,
-            inbrowser=False
+            inbrowser=False,
+            prevent_thread_lock=True
         )
+        self._add_http_routes(self.demo.app)
+        self.demo.block_thread()
+    
+    def _add_http_routes(self, app):
+        """在 Gradio 的 FastAPI 应用上注册 /health、/metrics 和诊断端点"""
+        from fastapi import Request
+        from fastapi.responses import JSONResponse, PlainTextResponse, Response as FastAPIResponse
+        
+        def health_check():
+            return JSONResponse({
+                'status': 'healthy',
+                'service': 'GitHub PR MCP Server',
+                'webhook_secret_configured': bool(self.webhook_secret),
+                'openai_key_configured': bool(self.openai_api_key),
+                'feishu_webhook_configured': bool(self.feishu_webhook_url),
+                'routes': current_routes().describe()
+            })
+        
+        def metrics_endpoint():
+            return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+        
+        def debug_endpoint(handler):
+            def endpoint(request: Request):
+                status, body, content_type = handler(request.query_params, request.headers)
+                return FastAPIResponse(content=body, status_code=status, media_type=content_type)
+            return endpoint
+        
+        routes = (
+            ('/health', health_check),
+            ('/metrics', metrics_endpoint),
+            ('/debug/profile', debug_endpoint(profiling.profile_endpoint)),
+            ('/debug/memory', debug_endpoint(profiling.memory_endpoint)),
+        )
+        for path, endpoint in routes:
+            app.add_api_route(path, endpoint, methods=['GET'], include_in_schema=False)
+            # 放到 Gradio 自带路由之前，避免被其通配路由拦截
+            app.router.routes.insert(0, app.router.routes.pop())
 
 
 class FlaskMCPServer:
     """Flask MCP 服务器"""
     
-    def __init__(self):
+    def __init__(self, job_queue: Optional[JobQueue] = None):
         # 使用 get() 方法提供默認值，避免 KeyError
         self.webhook_secret = os.getenv('WEBHOOK_SECRET', '')
         self.openai_api_key = os.getenv('OPENAI_API_KEY', '')
         self.feishu_webhook_url = os.getenv('FEISHU_WEBHOOK_URL', '')
         self.github_token = os.getenv('GITHUB_TOKEN', '')
         
+        # 配置了任务队列时，Webhook 事件交给工作进程异步处理
+        self.job_queue = job_queue
+        # 与工作进程使用相同的阈值，在健康检查和指标中展示当前的降级模式
+        self.degradation = DegradationController()
+        
+        # 按仓库选择凭据、通知目标和并发配额（current_routes，路由文件修改后重新加载）；每个仓库在独立通道中处理
+        self.lanes = RepositoryLanes()
+        
+        # 设置了 MCP_CAPTURE_PATH 时录制 Webhook 流量
+        self.recorder = WebhookRecorder.from_env()
+        
         # 创建 Flask 应用
         self.app = Flask(__name__)
         self._setup_routes()
@@ -336,6 +645,32 @@ class FlaskMCPServer:
                         "required": ["webhook_payload"]
                     }
                 },
+                {
+                    "name": "mcp_analyze_prs_batch",
+                    "description": "批量分析多个 PR（有限并发，结果按输入顺序返回）",
+                    "inputSchema": {
+                        "type": "object",
+                        "properties": {
+                            "items": {
+                                "type": "string",
+                                "description": "JSON 数组，或每行一个 PR 引用（owner/repo#123）/差异地址；数组元素也可以是差异文本"
+                            },
+                            "openai_api_key": {
+                                "type": "string",
+                                "description": "OpenAI API 密钥（可选）"
+                            },
+                            "github_token": {
+                                "type": "string",
+                                "description": "GitHub 令牌（可选）"
+                            },
+                            "max_concurrency": {
+                                "type": "integer",
+                                "description": "最大并发数（可选）"
+                            }
+                        },
+                        "required": ["items"]
+                    }
+                },
                 {
                     "name": "mcp_manual_analysis",
                     "description": "手动分析代码变更，支持可选的飞书集成",
@@ -371,18 +706,52 @@ class FlaskMCPServer:
         @self.app.route('/webhook/github', methods=['POST'])
         def github_webhook():
             """处理 GitHub Webhook 事件"""
-            try:
-                signature = request.headers.get('X-Hub-Signature-256', '')
-                if not verify_webhook_signature(request.data, signature, self.webhook_secret):
-                    return jsonify({'error': '无效签名'}), 401
-                
-                webhook_payload = request.get_data(as_text=True)
-                result = self._mcp_process_webhook(webhook_payload)
-                
-                return jsonify(result)
-                
-            except Exception as e:
-                return jsonify({'error': str(e)}), 500
+            start = time.perf_counter()
+            repository = ''
+            with tracing.span('webhook', route=request.path) as webhook_span:
+                try:
+                    # 签名密钥因仓库而异，先取出仓库名再校验
+                    webhook_payload = request.get_data(as_text=True)
+                    repository = repository_of(webhook_payload)
+                    webhook_span.set_attribute('repository', repository)
+                    route = current_routes().resolve(repository)
+                    if route is None:
+                        return jsonify({'error': f'仓库 {repository} 未配置路由'}), 403
+                    
+                    with tracing.span('signature_verification'):
+                        signature = request.headers.get('X-Hub-Signature-256', '')
+                        verified = verify_webhook_signature(request.data, signature, route.webhook_secret)
+                    if not verified:
+                        return jsonify({'error': '无效签名'}), 401
+                    
+                    if self.recorder is not None:
+                        self.recorder.record(request.path, request.data, request.headers)
+                    
+                    if self.job_queue is not None:
+                        # 回填等批量来源通过 X-MCP-Source: backfill 排在实时事件之后
+                        source = request.headers.get('X-MCP-Source', SOURCE_LIVE)
+                        payload = request.get_json(silent=True) or {}
+                        # 入队前先发送草稿卡片，工作进程完成分析后原地更新
+                        draft = post_pr_draft(payload) if source == SOURCE_LIVE else None
+                        if draft is not None:
+                            FIRST_NOTIFICATION_SECONDS.observe(time.perf_counter() - start, repository=repository)
+                        job_id = self.job_queue.enqueue('process_webhook', {
+                            'webhook_payload': webhook_payload,
+                            'repository': repository,
+                            'traceparent': tracing.traceparent(),
+                            'draft_message_id': draft.message_id if draft is not None else '',
+                            'source': source
+                        }, priority=webhook_priority(payload, source))
+                        return jsonify({'status': 'queued', 'job_id': job_id}), 202
+                    
+                    result = self._mcp_process_webhook(webhook_payload)
+                    
+                    return self._timed_json(result)
+                    
+                except Exception as e:
+                    return jsonify({'error': str(e)}), 500
+                finally:
+                    WEBHOOK_SECONDS.observe(time.perf_counter() - start, repository=repository)
         
         @self.app.route('/mcp/analyze', methods=['POST'])
         def mcp_analyze_endpoint():
@@ -394,8 +763,9 @@ class FlaskMCPServer:
                 if not diff_content:
                     return jsonify({'error': 'diff_content 是必需的'}), 400
                 
-                summary = self._mcp_analyze_pr(diff_content)
-                return jsonify({'summary': summary})
+                with collect() as timings:
+                    summary = self._mcp_analyze_pr(diff_content)
+                return self._timed_json({'summary': summary, 'timings': timings.to_dict()})
                 
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
@@ -411,25 +781,89 @@ class FlaskMCPServer:
                     return jsonify({'error': 'webhook_payload 是必需的'}), 400
                 
                 result = self._mcp_process_webhook(webhook_payload)
-                return jsonify(result)
+                return self._timed_json(result)
+                
+            except Exception as e:
+                return jsonify({'error': str(e)}), 500
+        
+        @self.app.route('/mcp/analyze_batch', methods=['POST'])
+        def mcp_analyze_batch_endpoint():
+            """MCP 批量分析端点"""
+            try:
+                data = request.json
+                items = data.get('items')
+                
+                if not items or not isinstance(items, list):
+                    return jsonify({'error': 'items 是必需的（数组）'}), 400
+                
+                # 凭据按各项的仓库从路由表获取
+                result = analyze_prs_batch(items, max_concurrency=int(data.get('max_concurrency') or 0))
+                return self._timed_json(result), 400 if 'results' not in result else 200
                 
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
         
+        @self.app.route('/jobs/<int:job_id>', methods=['GET'])
+        def job_status(job_id: int):
+            """查询队列任务状态"""
+            if self.job_queue is None:
+                return jsonify({'error': '任务队列未启用'}), 404
+            
+            job = self.job_queue.get(job_id)
+            if job is None:
+                return jsonify({'error': f'任务 {job_id} 不存在'}), 404
+            job.pop('payload', None)
+            return jsonify(job)
+        
+        @self.app.route('/metrics', methods=['GET'])
+        def metrics_endpoint():
+            """Prometheus 指标端点"""
+            if self.job_queue is not None:
+                self.degradation.observe(self.job_queue)
+            return Response(metrics.render(self.job_queue), mimetype=metrics.CONTENT_TYPE)
+        
+        @self.app.route('/debug/profile', methods=['GET'])
+        def debug_profile():
+            """采样分析端点（需要管理员令牌）"""
+            status, body, content_type = profiling.profile_endpoint(request.args, request.headers)
+            return Response(body, status=status, content_type=content_type)
+        
+        @self.app.route('/debug/memory', methods=['GET'])
+        def debug_memory():
+            """内存快照对比端点（需要管理员令牌）"""
+            status, body, content_type = profiling.memory_endpoint(request.args, request.headers)
+            return Response(body, status=status, content_type=content_type)
+        
         @self.app.route('/health', methods=['GET'])
         def health_check():
             """健康检查端点"""
-            return jsonify({
+            health = {
                 'status': 'healthy',
                 'service': 'GitHub PR MCP Server',
                 'webhook_secret_configured': bool(self.webhook_secret),
                 'openai_key_configured': bool(self.openai_api_key),
                 'feishu_webhook_configured': bool(self.feishu_webhook_url),
+                'feishu_app_configured': drafts.APP.configured,
                 'mcp_functions': [
                     'mcp_analyze_pr',
-                    'mcp_process_webhook'
-                ]
-            })
+                    'mcp_process_webhook',
+                    'mcp_analyze_prs_batch'
+                ],
+                'routes': current_routes().describe(),
+                'lanes': self.lanes.depth()
+            }
+            if self.job_queue is not None:
+                health['job_queue'] = self.job_queue.stats()
+                self.degradation.observe(self.job_queue)
+                health['degradation'] = self.degradation.describe()
+            return jsonify(health)
+    
+    def _timed_json(self, result: Dict[str, Any]) -> Response:
+        """生成 JSON 响应，并把结果中的 timings 写入 Server-Timing 头"""
+        response = jsonify(result)
+        if 'timings' in result:
+            response.headers['Server-Timing'] = server_timing_header(result['timings'])
+        return response
     
     def _mcp_analyze_pr(self, diff_content: str) -> str:
         """MCP 函数：分析 GitHub PR 差异"""
@@ -437,23 +871,19 @@ class FlaskMCPServer:
     
     def _mcp_process_webhook(self, webhook_payload: str) -> Dict[str, Any]:
         """MCP 函数：处理 GitHub Webhook 载荷"""
-        try:
-            payload = json.loads(webhook_payload)
-            event_type = payload.get('action', '')
-            
-            if event_type in ['opened', 'synchronize', 'reopened']:
-                pr_info = extract_pr_info(payload)
-                diff_content = get_pr_diff(pr_info['diff_url'], self.github_token)
-                
-                if diff_content:
-                    return process_github_pr(diff_content, pr_info, self.openai_api_key, self.feishu_webhook_url)
-                else:
-                    return {'error': '获取 PR 差异失败', 'status': 'error'}
-            else:
-                return {'message': f'事件 {event_type} 被忽略', 'status': 'ignored'}
-                
-        except Exception as e:
-            return {'error': str(e), 'status': 'error'}
+        with tracing.span('mcp_process_webhook'):
+            repository = repository_of(webhook_payload)
+            route = current_routes().resolve(repository)
+            if route is None:
+                return {'status': 'error', 'error': f'仓库 {repository} 未配置路由'}
+            return self.lanes.run(
+                route,
+                process_webhook_payload,
+                webhook_payload,
+                route.openai_api_key,
+                route.feishu_webhook_url,
+                route.github_token
+            )
     
     def run(self, port: int = 5000):
         """启动 Flask MCP 服务器"""
@@ -462,6 +892,7 @@ class FlaskMCPServer:
         print(f"🔧 MCP 端点:")
         print(f"   - POST /mcp/analyze")
         print(f"   - POST /mcp/process_webhook")
+        print("   - POST /mcp/analyze_batch")
         print(f"💚 健康检查: http://localhost:{port}/health")
         
         self.app.run(host='0.0.0.0', port=port, debug=False) 
\ No newline at end of file
@@ -0,0 +1,423 @@
+"""
+GitHub PR MCP Server 变更符号提取
+
+把差异中的变更行映射到文件的语法结构上，列出新增、删除和修改的函数、类和方法，
+作为提示词中的紧凑摘要（MCP_DIFF_SYMBOLS=0 关闭）：
+
+  - Python 使用标准库 ast 解析
+  - JavaScript / TypeScript / Go / Java / Kotlin / C# / Rust / Ruby / PHP 按声明行和缩进提取大纲
+  - 新增和删除的文件直接从差异中还原内容；修改的文件从 base / head 提交读取两侧内容（有界并发），
+    内容与差异 index 行中的 blob SHA 一致时才使用，解析结果按 blob SHA 缓存
+  - 读取不到文件内容时，退回到片段头中的函数上下文和变更行中的声明
+"""
+
+import ast
+import contextvars
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set, Tuple
+
+
+SYMBOLS_ENABLED = os.getenv('MCP_DIFF_SYMBOLS', '1') != '0'
+
+# 每个 PR 最多读取内容的文件数（新增和删除的文件不需要读取）
+MAX_FETCHED_FILES = int(os.getenv('MCP_SYMBOLS_MAX_FILES', 10))
+
+# 同时读取内容的文件数
+FETCH_CONCURRENCY = int(os.getenv('MCP_SYMBOLS_FETCH_CONCURRENCY', 4))
+
+# 提示词中最多列出的符号数
+MAX_SYMBOLS = 40
+
+CHANGE_LABELS = {'added': '新增', 'modified': '修改', 'removed': '删除'}
+
+# index 1a2b3c4..5d6e7f8 100644
+_INDEX_LINE = re.compile(r'^index ([0-9a-f]+)\.\.([0-9a-f]+)')
+# @@ -12,5 +12,7 @@ def handler(event):
+_HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@ ?(.*)$')
+
+_NULL_BLOB = re.compile(r'^0+$')
+
+_CONTROL_WORDS = {'if', 'for', 'while', 'switch', 'catch', 'return', 'function', 'else', 'new', 'with'}
+
+
+class Symbol:
+    """文件中的一个函数、类或方法（行号从 1 开始，包含首尾行）"""
+
+    def __init__(self, kind: str, name: str, start: int, end: int):
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.end = end
+
+    def contains(self, line: int) -> bool:
+        return self.start <= line <= self.end
+
+
+def _python_outline(source: str) -> List[Symbol]:
+    symbols: List[Symbol] = []
+
+    def visit(node, prefix: str):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                kind = 'class' if isinstance(child, ast.ClassDef) else \
+                    ('method' if prefix else 'function')
+                name = f"{prefix}{child.name}"
+                start = min([child.lineno] + [decorator.lineno for decorator in child.decorator_list])
+                symbols.append(Symbol(kind, name, start, getattr(child, 'end_lineno', None) or child.lineno))
+                visit(child, f"{name}.")
+
+    visit(ast.parse(source), '')
+    return symbols
+
+
+# 各语言的声明行：(正则, 类型)；正则的 name 分组为符号名，owner 分组（可选）为所属类型
+_DECLARATIONS: Dict[str, List[Tuple['re.Pattern', str]]] = {
+    'js': [
+        (re.compile(r'^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+(?P<name>[\w$]+)'), 'class'),
+        (re.compile(r'^\s*(?:export\s+)?(?:default\s+)?interface\s+(?P<name>[\w$]+)'), 'class'),
+        (re.compile(r'^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*(?P<name>[\w$]+)'),
+         'function'),
+        (re.compile(r'^\s*(?:export\s+)?(?:const|let|var)\s+(?P<name>[\w$]+)\s*(?::[^=]+)?=\s*'
+                    r'(?:async\s+)?(?:function\b|\([^)]*\)\s*(?::[^=]+)?=>|[\w$]+\s*=>)'), 'function'),
+        (re.compile(r'^\s+(?:(?:public|private|protected|static|readonly|async|get|set|override)\s+)*'
+                    r'(?P<name>[\w$]+)\s*\([^)]*\)\s*(?::[^{]+)?\{'), 'method'),
+    ],
+    'go': [
+        (re.compile(r'^func\s+\(\s*\w*\s*\*?(?P<owner>\w+)(?:\[[^\]]*\])?\s*\)\s*(?P<name>\w+)'), 'method'),
+        (re.compile(r'^func\s+(?P<name>\w+)'), 'function'),
+        (re.compile(r'^type\s+(?P<name>\w+)\s+(?:struct|interface)\b'), 'class'),
+    ],
+    'java': [
+        (re.compile(r'^\s*(?:(?:public|private|protected|internal|static|final|abstract|sealed|open|data|'
+                    r'partial)\s+)*(?:class|interface|enum|record|object|struct)\s+(?P<name>\w+)'), 'class'),
+        (re.compile(r'^\s*(?:(?:public|private|protected|internal|static|final|abstract|synchronized|'
+                    r'override|virtual|async|suspend|open)\s+)*(?:fun\s+)?(?:<[^>]+>\s+)?'
+                    r'(?:[\w<>\[\],.?]+\s+)?(?P<name>\w+)\s*\([^;]*$'), 'method'),
+    ],
+    'rust': [
+        (re.compile(r'^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait|union)\s+(?P<name>\w+)'), 'class'),
+        (re.compile(r'^\s*impl(?:<[^>]*>)?\s+(?:[\w:<>]+\s+for\s+)?(?P<name>\w+)'), 'class'),
+        (re.compile(r'^\s*(?:pub(?:\([^)]*\))?\s+)?(?:const\s+)?(?:async\s+)?(?:unsafe\s+)?fn\s+(?P<name>\w+)'),
+         'function'),
+    ],
+    'ruby': [
+        (re.compile(r'^\s*(?:class|module)\s+(?P<name>[\w:]+)'), 'class'),
+        (re.compile(r'^\s*def\s+(?:self\.)?(?P<name>[\w?!=]+)'), 'function'),
+    ],
+    'php': [
+        (re.compile(r'^\s*(?:(?:abstract|final)\s+)?(?:class|interface|trait)\s+(?P<name>\w+)'), 'class'),
+        (re.compile(r'^\s*(?:(?:public|private|protected|static|abstract|final)\s+)*function\s+(?P<name>\w+)'),
+         'function'),
+    ],
+}
+
+_LANGUAGES = {
+    '.py': 'python', '.pyi': 'python',
+    '.js': 'js', '.jsx': 'js', '.mjs': 'js', '.cjs': 'js', '.ts': 'js', '.tsx': 'js',
+    '.go': 'go',
+    '.java': 'java', '.kt': 'java', '.kts': 'java', '.cs': 'java', '.scala': 'java',
+    '.rs': 'rust',
+    '.rb': 'ruby',
+    '.php': 'php',
+}
+
+# 缩进回到声明行时仍属于该符号的结束行
+_CLOSING_LINE = re.compile(r'^\s*(?:[}\])]+[;,)]*|end)\s*$')
+
+
+def language_of(path: str) -> Optional[str]:
+    """按扩展名判断文件语言；不支持时返回 None"""
+    return _LANGUAGES.get(os.path.splitext(path)[1].lower())
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def _declaration_outline(language: str, source: str) -> List[Symbol]:
+    """按声明行提取大纲：符号延续到下一个缩进不大于声明行的非空行之前"""
+    lines = source.splitlines()
+    symbols: List[Symbol] = []
+    # (缩进, 符号) 栈，用于限定方法名和计算结束行
+    stack: List[Tuple[int, Symbol]] = []
+
+    def close(indent: int, line_number: int, line: str):
+        while stack and indent <= stack[-1][0]:
+            owner_indent, symbol = stack.pop()
+            closing = indent == owner_indent and _CLOSING_LINE.match(line)
+            symbol.end = line_number if closing else max(symbol.start, line_number - 1)
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        indent = _indent(line)
+        close(indent, number, line)
+        for pattern, kind in _DECLARATIONS[language]:
+            match = pattern.match(line)
+            if not match or match.group('name') in _CONTROL_WORDS:
+                continue
+            owner = match.groupdict().get('owner')
+            if owner:
+                name = f"{owner}.{match.group('name')}"
+            elif stack:
+                name = f"{stack[-1][1].name}.{match.group('name')}"
+                kind = 'method' if kind == 'function' else kind
+            else:
+                name = match.group('name')
+                if kind == 'method':
+                    break  # 顶层的“方法”多为调用语句
+            symbol = Symbol(kind, name, number, len(lines))
+            symbols.append(symbol)
+            stack.append((indent, symbol))
+            break
+    close(-1, len(lines) + 1, '')
+    return symbols
+
+
+def outline(path: str, source: str) -> Optional[List[Symbol]]:
+    """
+    提取文件中的函数、类和方法
+
+    Args:
+        path: 文件路径，用于判断语言
+        source: 文件内容
+
+    Returns:
+        符号列表；语言不支持或无法解析时返回 None
+    """
+    language = language_of(path)
+    if language is None:
+        return None
+    if language == 'python':
+        try:
+            return _python_outline(source)
+        except (SyntaxError, ValueError):
+            return None
+    return _declaration_outline(language, source)
+
+
+def blob_shas(header: List[str]) -> Tuple[str, str]:
+    """从差异文件头的 index 行取出修改前后的 blob SHA（可能是缩写）；新增或删除的一侧为空"""
+    for line in header:
+        match = _INDEX_LINE.match(line)
+        if match:
+            old, new = match.group(1), match.group(2)
+            return ('' if _NULL_BLOB.match(old) else old), ('' if _NULL_BLOB.match(new) else new)
+    return '', ''
+
+
+def git_blob_sha(content: bytes) -> str:
+    """按 git 的方式计算文件内容的 blob SHA"""
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+
+def changed_lines(body: List[str]) -> Tuple[Set[int], Set[int], List[str]]:
+    """
+    把差异片段映射到行号
+
+    Returns:
+        (修改前被删除的行号, 修改后新增的行号, 片段头中的函数上下文)
+    """
+    old_lines: Set[int] = set()
+    new_lines: Set[int] = set()
+    contexts: List[str] = []
+    old_number = new_number = 0
+    for line in body:
+        match = _HUNK_HEADER.match(line)
+        if match:
+            old_number, new_number = int(match.group(1)), int(match.group(2))
+            if match.group(3).strip():
+                contexts.append(match.group(3).strip())
+            continue
+        kind = line[:1]
+        if kind == '-':
+            old_lines.add(old_number)
+            old_number += 1
+        elif kind == '+':
+            new_lines.add(new_number)
+            new_number += 1
+        elif kind != '\\':
+            old_number += 1
+            new_number += 1
+    return old_lines, new_lines, contexts
+
+
+def _touched(symbols: List[Symbol], lines: Set[int]) -> Dict[str, Symbol]:
+    """每个变更行归属到最内层的符号"""
+    touched: Dict[str, Symbol] = {}
+    for line in lines:
+        inner = None
+        for symbol in symbols:
+            if symbol.contains(line) and (inner is None or symbol.start >= inner.start):
+                inner = symbol
+        if inner is not None:
+            touched[inner.name] = inner
+    return touched
+
+
+def _collapse(names: Iterable[str]) -> List[str]:
+    """父符号整体新增或删除时不再列出其中的子符号"""
+    names = sorted(set(names))
+    kept = set(names)
+    return [name for name in names if not any(name.startswith(f"{parent}.") for parent in kept)]
+
+
+def diff_symbols(old: List[Symbol], new: List[Symbol], body: List[str]) -> Dict[str, List[str]]:
+    """
+    对比修改前后的大纲，找出差异片段触及的符号
+
+    Returns:
+        {'added': [...], 'modified': [...], 'removed': [...]}
+    """
+    old_lines, new_lines, _ = changed_lines(body)
+    old_names = {symbol.name for symbol in old}
+    new_names = {symbol.name for symbol in new}
+    touched = set(_touched(old, old_lines)) | set(_touched(new, new_lines))
+    added = [symbol.name for symbol in new if symbol.name not in old_names]
+    removed = [symbol.name for symbol in old if symbol.name not in new_names]
+    modified = sorted(name for name in touched if name in old_names and name in new_names)
+    return {'added': _collapse(added), 'modified': modified, 'removed': _collapse(removed)}
+
+
+def _declared_names(language: str, lines: List[str]) -> List[str]:
+    names = []
+    for line in lines:
+        if language == 'python':
+            match = re.match(r'^\s*(?:async\s+)?(?:def|class)\s+(\w+)', line)
+            if match:
+                names.append(match.group(1))
+            continue
+        for pattern, kind in _DECLARATIONS[language]:
+            match = pattern.match(line)
+            if not match or match.group('name') in _CONTROL_WORDS:
+                continue
+            owner = match.groupdict().get('owner')
+            if owner or kind != 'method' or line[:1].isspace():
+                names.append(f"{owner}.{match.group('name')}" if owner else match.group('name'))
+                break
+    return names
+
+
+def guess_symbols(path: str, body: List[str]) -> Dict[str, List[str]]:
+    """读取不到文件内容时的估计：变更行中的声明和片段头中的函数上下文"""
+    language = language_of(path)
+    if language is None:
+        return {'added': [], 'modified': [], 'removed': []}
+    added_decls = _declared_names(language, [line[1:] for line in body if line.startswith('+')])
+    removed_decls = _declared_names(language, [line[1:] for line in body if line.startswith('-')])
+    _, _, contexts = changed_lines(body)
+    context_names = _declared_names(language, contexts)
+    added = [name for name in added_decls if name not in removed_decls]
+    removed = [name for name in removed_decls if name not in added_decls]
+    modified = [name for name in context_names + [name for name in added_decls if name in removed_decls]
+                if name not in added and name not in removed]
+    return {'added': sorted(set(added)), 'modified': sorted(set(modified)), 'removed': sorted(set(removed))}
+
+
+OutlineLoader = Callable[[str, str, str], Optional[List[Symbol]]]
+
+
+def file_symbols(file: Any, load: Optional[OutlineLoader] = None) -> Dict[str, List[str]]:
+    """
+    找出一个文件中新增、修改和删除的符号
+
+    Args:
+        file: diffs.FileDiff
+        load: 读取大纲的函数 load(path, blob_sha, side)，side 为 'old' 或 'new'；
+              返回 None 表示读取失败
+
+    Returns:
+        {'added': [...], 'modified': [...], 'removed': [...]}
+    """
+    if file.status == 'added':
+        new = outline(file.path, '\n'.join(line[1:] for line in file.body if line.startswith('+')))
+        if new is not None:
+            return {'added': _collapse(symbol.name for symbol in new), 'modified': [], 'removed': []}
+    elif file.status == 'deleted':
+        old = outline(file.old_path, '\n'.join(line[1:] for line in file.body if line.startswith('-')))
+        if old is not None:
+            return {'added': [], 'modified': [], 'removed': _collapse(symbol.name for symbol in old)}
+    elif load is not None:
+        old_sha, new_sha = blob_shas(file.header)
+        old = load(file.old_path or file.path, old_sha, 'old') if old_sha else None
+        new = load(file.path, new_sha, 'new') if old is not None and new_sha else None
+        if old is not None and new is not None:
+            return diff_symbols(old, new, file.body)
+    return guess_symbols(file.path, file.body)
+
+
+def extract_changed_symbols(files: List[Any], load: Optional[OutlineLoader] = None) -> List[str]:
+    """
+    生成各文件的变更符号摘要
+
+    Args:
+        files: diffs.FileDiff 列表（已去掉被过滤的文件）
+        load: 读取修改文件大纲的函数（见 file_symbols），最多用于 MCP_SYMBOLS_MAX_FILES 个文件，
+              同时最多读取 MCP_SYMBOLS_FETCH_CONCURRENCY 个
+
+    Returns:
+        每个文件一行，例如 "- app/api.py: 新增 `Client.retry`；修改 `Client.get`"
+    """
+    loaders: List[Optional[OutlineLoader]] = []
+    fetched = 0
+    files = [file for file in files if language_of(file.path) is not None]
+    for file in files:
+        loader = load
+        if file.status not in ('added', 'deleted'):
+            loader = load if fetched < MAX_FETCHED_FILES else None
+            fetched += 1
+        loaders.append(loader)
+
+    workers = min(FETCH_CONCURRENCY, fetched, MAX_FETCHED_FILES) if load is not None else 0
+    if workers > 1:
+        # 修改的文件需要读取两侧内容，并发读取避免逐个文件串行等待
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mcp-symbols') as pool:
+            futures = [pool.submit(contextvars.copy_context().run, file_symbols, file, loader)
+                       for file, loader in zip(files, loaders)]
+            results = [future.result() for future in futures]
+    else:
+        results = [file_symbols(file, loader) for file, loader in zip(files, loaders)]
+
+    lines = []
+    for file, changes in zip(files, results):
+        parts = [f"{CHANGE_LABELS[change]} " + '，'.join(f"`{name}`" for name in names)
+                 for change, names in changes.items() if names]
+        if parts:
+            lines.append(f"- {file.path}: " + '；'.join(parts))
+    return lines
+
+
+def format_changed_symbols(lines: List[str]) -> str:
+    """提示词中的变更符号说明"""
+    shown = lines[:MAX_SYMBOLS]
+    if len(lines) > MAX_SYMBOLS:
+        shown.append(f"- …另有 {len(lines) - MAX_SYMBOLS} 个文件")
+    return "变更的函数/类/方法：\n" + '\n'.join(shown)
+
+
+class OutlineCache:
+    """按仓库和 blob SHA 缓存解析后的大纲（线程安全，LRU）"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, str], List[Symbol]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[List[Symbol]]:
+        with self._lock:
+            symbols = self._entries.get(key)
+            if symbols is not None:
+                self._entries.move_to_end(key)
+            return symbols
+
+    def put(self, key: Tuple[str, str], symbols: List[Symbol]):
+        with self._lock:
+            self._entries[key] = symbols
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,125 @@
+"""
+GitHub PR MCP Server 单次调用耗时分解
+
+在一次调用（MCP 工具、HTTP 请求、队列任务）范围内累计各阶段耗时和缓存命中情况，
+以 `timings` 对象返回给调用方，HTTP 响应同时带上 `Server-Timing` 头。
+
+阶段:
+  fetch   获取 PR 差异
+  llm     LLM 调用
+  render  提示词和飞书消息的构建
+  send    发送到飞书
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+
+from .metrics import CACHE_REQUESTS_TOTAL, DIFF_COMPRESSION_RATIO
+
+
+STAGES = ('fetch', 'llm', 'render', 'send')
+
+_current_timings: contextvars.ContextVar = contextvars.ContextVar('mcp_timings', default=None)
+
+
+class Timings:
+    """一次调用的耗时累计"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.cache: Dict[str, bool] = {}
+        # 差异预处理前后的字符数
+        self.diff_chars: Dict[str, int] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def merge(self, other: 'Timings'):
+        """累加另一次调用的阶段耗时（如批量请求中的各项），任一次命中即视为命中"""
+        for stage, seconds in other.durations.items():
+            self.add(stage, seconds)
+        for cache, hit in other.cache.items():
+            self.cache[cache] = self.cache.get(cache, False) or hit
+        for key, chars in other.diff_chars.items():
+            self.diff_chars[key] = self.diff_chars.get(key, 0) + chars
+
+    def to_dict(self) -> Dict[str, Any]:
+        """返回给调用方的 timings 对象（毫秒）"""
+        result = {f'{stage}_ms': round(self.durations.get(stage, 0.0) * 1000, 1) for stage in STAGES}
+        result['total_ms'] = round((time.perf_counter() - self.start) * 1000, 1)
+        result['cache'] = dict(self.cache)
+        if self.diff_chars:
+            result['diff'] = dict(self.diff_chars, ratio=compression_ratio(**self.diff_chars))
+        return result
+
+
+def current_timings() -> Optional[Timings]:
+    return _current_timings.get()
+
+
+@contextmanager
+def collect(fresh: bool = False) -> Iterator[Timings]:
+    """
+    开始收集耗时；已在收集范围内时复用外层对象，避免嵌套调用拆散分解
+
+    Args:
+        fresh: 总是新建收集对象（并发执行的子任务各自统计时使用）
+    """
+    current = _current_timings.get()
+    if current is not None and not fresh:
+        yield current
+        return
+
+    timings = Timings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """把代码块耗时计入当前调用的某个阶段；不在收集范围内时只执行代码块"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add(name, time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool, repository: str = ''):
+    """记录一次缓存查询：写入当前调用的 cache 标记并计入指标"""
+    CACHE_REQUESTS_TOTAL.inc(repository=repository, cache=cache, result='hit' if hit else 'miss')
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.cache[cache] = hit
+
+
+def compression_ratio(original_chars: int, prompt_chars: int) -> float:
+    return round(original_chars / max(prompt_chars, 1), 2)
+
+
+def record_compression(original_chars: int, prompt_chars: int, repository: str = ''):
+    """记录一次差异预处理（过滤、压缩、精简）前后的字符数，计入当前调用和压缩比指标"""
+    DIFF_COMPRESSION_RATIO.observe(compression_ratio(original_chars, prompt_chars), repository=repository)
+    timings = _current_timings.get()
+    if timings is not None:
+        for key, chars in (('original_chars', original_chars), ('prompt_chars', prompt_chars)):
+            timings.diff_chars[key] = timings.diff_chars.get(key, 0) + chars
+
+
+def server_timing_header(timings: Dict[str, Any]) -> str:
+    """把 timings 对象转换为 Server-Timing 响应头"""
+    parts = [f"{stage};dur={timings.get(f'{stage}_ms', 0.0)}" for stage in STAGES]
+    parts.append(f"total;dur={timings.get('total_ms', 0.0)}")
+    for cache, hit in timings.get('cache', {}).items():
+        parts.append(f'cache-{cache};desc={"hit" if hit else "miss"}')
+    if 'diff' in timings:
+        parts.append(f'diff-compression;desc="{timings["diff"]["ratio"]}x"')
+    return ', '.join(parts)
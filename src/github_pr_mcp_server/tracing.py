@@ -0,0 +1,247 @@
+"""
+GitHub PR MCP Server 轻量级追踪
+
+为每个事件记录带父子关系的 span 耗时，写入本地滚动 JSONL 文件，
+可选 OTLP/JSON 格式；当前 trace ID 会注入到日志记录中。
+
+环境变量:
+  MCP_TRACE_PATH       span 输出文件，未设置时不导出（trace ID 仍会注入日志）
+  MCP_TRACE_FORMAT     jsonl（默认）或 otlp
+  MCP_TRACE_MAX_BYTES  单个文件最大字节数，超过后滚动（默认 10MB）
+  MCP_TRACE_BACKUPS    保留的滚动文件数（默认 5）
+"""
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+
+
+SERVICE_NAME = 'github-pr-mcp-server'
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('mcp_current_span', default=None)
+
+
+class Span:
+    """单个 span"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'attributes',
+                 'start_ns', 'end_ns', 'error')
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = '',
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error = ''
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_jsonl(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id or None,
+            'name': self.name,
+            'start': self.start_ns / 1e9,
+            'duration_ms': round(self.duration_ms, 3),
+            'attributes': self.attributes,
+            'status': 'error' if self.error else 'ok',
+            'error': self.error or None,
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """OTLP/JSON ExportTraceServiceRequest（每行一个 span）"""
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return {'resourceSpans': [{
+            'resource': {'attributes': [_otlp_attribute('service.name', SERVICE_NAME)]},
+            'scopeSpans': [{'scope': {'name': 'github_pr_mcp_server'}, 'spans': [span]}],
+        }]}
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+class SpanExporter:
+    """写入滚动文件的 span 导出器（基于 RotatingFileHandler，线程安全）"""
+
+    def __init__(self, path: str, fmt: str = 'jsonl', max_bytes: int = 10 * 1024 * 1024,
+                 backup_count: int = 5):
+        self.fmt = fmt
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self._logger = logging.Logger(f'{__name__}.exporter')
+        self._logger.addHandler(handler)
+
+    def export(self, span: Span):
+        record = span.to_otlp() if self.fmt == 'otlp' else span.to_jsonl()
+        self._logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+_exporter: Optional[SpanExporter] = None
+
+
+def configure(exporter: Optional[SpanExporter]):
+    """设置全局导出器；传入 None 关闭导出"""
+    global _exporter
+    _exporter = exporter
+
+
+def configure_from_env(suffix: str = ''):
+    """
+    根据环境变量配置导出器，并把 trace ID 注入日志
+
+    Args:
+        suffix: 追加到文件名的后缀；多进程时每个进程写独立文件，避免滚动冲突
+    """
+    path = os.getenv('MCP_TRACE_PATH', '')
+    if path:
+        configure(SpanExporter(
+            path + suffix,
+            fmt=os.getenv('MCP_TRACE_FORMAT', 'jsonl').lower(),
+            max_bytes=int(os.getenv('MCP_TRACE_MAX_BYTES', 10 * 1024 * 1024)),
+            backup_count=int(os.getenv('MCP_TRACE_BACKUPS', 5)),
+        ))
+    install_log_correlation()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> str:
+    span = _current_span.get()
+    return span.trace_id if span else ''
+
+
+def traceparent() -> str:
+    """当前上下文的 W3C traceparent，用于跨进程传递（如任务队列）"""
+    span = _current_span.get()
+    return f'00-{span.trace_id}-{span.span_id}-01' if span else ''
+
+
+def trace_tag() -> str:
+    """附加到 print 输出末尾的 trace 标记"""
+    trace_id = current_trace_id()
+    return f' [trace={trace_id}]' if trace_id else ''
+
+
+@contextmanager
+def span(name: str, parent: str = '', **attributes) -> Iterator[Span]:
+    """
+    记录一个 span；嵌套调用自动形成父子关系
+
+    Args:
+        name: span 名称
+        parent: 可选的 traceparent，用于延续其他进程中的 trace
+        **attributes: span 属性
+    """
+    current = _current_span.get()
+    if current is not None:
+        new_span = Span(name, current.trace_id, current.span_id, attributes)
+    elif parent.count('-') == 3:
+        _, trace_id, parent_id, _ = parent.split('-')
+        new_span = Span(name, trace_id, parent_id, attributes)
+    else:
+        new_span = Span(name, secrets.token_hex(16), '', attributes)
+
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        new_span.end_ns = time.time_ns()
+        _current_span.reset(token)
+        if _exporter is not None:
+            try:
+                _exporter.export(new_span)
+            except Exception as e:
+                print(f"导出 span 失败: {e}")
+
+
+def run_in_context(iterator: Iterator[Any]) -> Iterator[Any]:
+    """
+    在固定的 contextvars.Context 中逐步驱动生成器
+
+    Gradio 会在不同线程、不同 Context 中调用生成器的每一步，生成器内跨 yield 的
+    span（以及耗时收集）会因此失效；包装后每一步都在同一个 Context 中执行。
+    """
+    context = contextvars.copy_context()
+    try:
+        while True:
+            try:
+                item = context.run(next, iterator)
+            except StopIteration:
+                return
+            yield item
+    finally:
+        # 调用方提前结束时，也在同一个 Context 中关闭生成器
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            context.run(close)
+
+
+class TraceContextFilter(logging.Filter):
+    """为日志记录注入 trace_id / span_id，并在消息末尾附加 trace 标记"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        current = _current_span.get()
+        record.trace_id = current.trace_id if current else '-'
+        record.span_id = current.span_id if current else '-'
+        if current is not None and isinstance(record.msg, str):
+            record.msg = f'{record.msg} [trace={current.trace_id}]'
+        return True
+
+
+# 注入 trace 的日志记录器（旧版根目录模块按模块名创建记录器）
+CORRELATED_LOGGERS = ('github_pr_mcp_server', 'ai_summarizer', 'github_handler', 'feishu_handler')
+
+
+def install_log_correlation():
+    """
+    给项目的日志记录器加上 trace 过滤器（可重复调用）
+
+    只挂在记录器上，不创建或修改处理器和格式，日志配置仍由宿主程序决定。
+    """
+    for name in CORRELATED_LOGGERS:
+        logger = logging.getLogger(name)
+        if not any(isinstance(f, TraceContextFilter) for f in logger.filters):
+            logger.addFilter(TraceContextFilter())
@@ -0,0 +1,410 @@
+"""
+GitHub PR MCP Server 简单 PR 的本地摘要
+
+在调用 LLM 之前按解析后的差异识别简单 PR，直接用模板生成摘要（MCP_TRIAGE=0 关闭）：
+
+  formatting  所有变更都只涉及空白/缩进（缩进有语义的文件要求缩进不变）
+  dependency  只改动依赖清单中依赖声明的版本号和锁文件（以及随之更新的第三方代码）
+  version     只改动版本号（以及更新日志等文档）
+  docs        只改动文档
+  typo        少量逐行替换，每行只改了文档或注释中一两个拼写相近的单词
+
+其余 PR 仍交给 LLM 分析；积压降级时（见 degradation）所有 PR 都用 heuristic_summary 在本地生成摘要。
+"""
+
+import difflib
+import os
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+from .condensers import LOCKFILE_FORMATS, condense_lockfile
+from .diffs import DiffRules, FileDiff, path_matches, split_file_diffs
+from .minify import whitespace_only
+from .symbols import extract_changed_symbols
+
+
+TRIAGE_ENABLED = os.getenv('MCP_TRIAGE', '1') != '0'
+
+# 拼写修正最多涉及的变更行数（删除 + 新增）
+MAX_TYPO_LINES = int(os.getenv('MCP_TRIAGE_TYPO_LINES', 12))
+
+DOC_PATTERNS = (
+    '*.md', '*.markdown', '*.rst', '*.adoc', '*.txt', 'docs/**', 'doc/**', '**/docs/**',
+    'LICENSE*', 'AUTHORS*', 'CONTRIBUTING*', 'CHANGELOG*', 'CHANGES*', 'HISTORY*', 'NEWS*',
+)
+
+MANIFEST_PATTERNS = (
+    'package.json', 'requirements*.txt', 'requirements/*.txt', 'constraints*.txt', 'pyproject.toml',
+    'setup.cfg', 'setup.py', 'Pipfile', 'go.mod', 'Cargo.toml', 'Gemfile', 'composer.json', 'pom.xml',
+    'build.gradle', 'build.gradle.kts', '*.csproj', '.github/workflows/*.yml', '.github/workflows/*.yaml',
+    '.pre-commit-config.yaml', 'Dockerfile',
+)
+
+VERSION_FILES = ('VERSION', 'version.txt', 'version.py', '_version.py', '__version__.py', '__init__.py')
+
+# 依赖清单中的依赖声明行：(文件通配符, 正则)；清单中的其他行只有版本号行（见 _is_version_line）可以变化
+_REQUIREMENT = r'[A-Za-z0-9][\w.-]*(?:\[[\w,.\s-]*\])?\s*(?:===?|~=|!=|[<>]=?)\s*[\w.*+!-]+'
+DEPENDENCY_SYNTAX = (
+    (('package.json', 'composer.json'), r'^\s*"[@\w./-]+"\s*:\s*"[^"]*\d[^"]*",?\s*$'),
+    (('requirements*.txt', 'requirements/*.txt', 'constraints*.txt', 'setup.cfg'),
+     rf'^\s*{_REQUIREMENT}(?:\s*,\s*(?:===?|~=|!=|[<>]=?)\s*[\w.*+!-]+)*\s*(?:;.*)?(?:#.*)?$'),
+    (('pyproject.toml', 'setup.py'), rf'^\s*["\']{_REQUIREMENT}[^"\']*["\'],?\s*$'),
+    (('pyproject.toml', 'Pipfile', 'Cargo.toml'), r'^\s*["\']?[\w.-]+["\']?\s*=\s*["\'][=<>!~^*]*\d[^"\']*["\']\s*$'),
+    (('go.mod',), r'^\s*(?:require\s+)?[\w.-]+\.[\w./~-]+\s+v\d\S*(?:\s*//.*)?$'),
+    (('Gemfile',), r'^\s*gem\s+["\'][\w.-]+["\']\s*,'),
+    (('build.gradle', 'build.gradle.kts'), r'^\s*\w+\s*\(?\s*["\'][\w.-]+:[\w.-]+:[^"\']+["\']\s*\)?\s*$'),
+    (('.github/workflows/*.yml', '.github/workflows/*.yaml'), r'^\s*(?:-\s*)?uses:\s*\S+@\S+\s*$'),
+    (('.pre-commit-config.yaml',), r'^\s*rev:\s*\S+\s*$'),
+    (('Dockerfile',), r'^\s*FROM\s+\S+:\S+(?:\s+AS\s+\w+)?\s*$'),
+)
+
+# 各语言的行注释标记：只在注释中识别拼写修正；未列出的代码文件不识别
+_HASH_COMMENT = ('#',)
+_SLASH_COMMENT = ('//', '/*')
+COMMENT_MARKERS = {
+    '.py': _HASH_COMMENT, '.pyi': _HASH_COMMENT, '.rb': _HASH_COMMENT, '.sh': _HASH_COMMENT,
+    '.bash': _HASH_COMMENT, '.yml': _HASH_COMMENT, '.yaml': _HASH_COMMENT, '.toml': _HASH_COMMENT,
+    '.cfg': _HASH_COMMENT, '.ini': _HASH_COMMENT, '.r': _HASH_COMMENT, '.pl': _HASH_COMMENT,
+    '.js': _SLASH_COMMENT, '.jsx': _SLASH_COMMENT, '.ts': _SLASH_COMMENT, '.tsx': _SLASH_COMMENT,
+    '.go': _SLASH_COMMENT, '.java': _SLASH_COMMENT, '.kt': _SLASH_COMMENT, '.scala': _SLASH_COMMENT,
+    '.c': _SLASH_COMMENT, '.h': _SLASH_COMMENT, '.cc': _SLASH_COMMENT, '.cpp': _SLASH_COMMENT,
+    '.hpp': _SLASH_COMMENT, '.cs': _SLASH_COMMENT, '.rs': _SLASH_COMMENT, '.swift': _SLASH_COMMENT,
+    '.php': _SLASH_COMMENT, '.css': ('/*',), '.scss': _SLASH_COMMENT, '.sql': ('--',),
+    '.html': ('<!--',), '.xml': ('<!--',), '.vue': ('//', '/*', '<!--'),
+}
+
+KIND_LABELS = {
+    'formatting': '代码格式调整',
+    'dependency': '依赖升级',
+    'version': '版本号更新',
+    'docs': '文档更新',
+    'typo': '拼写修正',
+}
+
+STATUS_LABELS = {'added': '新增', 'deleted': '删除', 'renamed': '重命名', 'modified': '修改'}
+
+# 版本号：1.2、v1.2.3、1.2.3-rc.1、^4.0.0、@v4、提交 SHA 等
+_VERSION = re.compile(r'[v^~=<>]*\d+(?:\.[\w-]+)+|(?<=@)v?\d+\b|\b[0-9a-f]{7,40}\b')
+_VERSION_KEY = re.compile(r'\bversion\b|__version__', re.IGNORECASE)
+_DUNDER_VERSION = re.compile(r'^\s*__version__\s*=')
+_DEPENDENCY_SYNTAX = [(patterns, re.compile(regex, re.IGNORECASE)) for patterns, regex in DEPENDENCY_SYNTAX]
+_WORD = re.compile(r'\w+|[^\w\s]')
+# 字符串字面量、Markdown 行内代码和驼峰标识符
+_STRING = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+_CODE_SPAN = re.compile(r'`[^`]*`')
+_CAMEL_CASE = re.compile(r'[a-z][A-Z]')
+# Dependabot / Renovate 的标题
+_BUMP_TITLE = re.compile(r'(?:bump|update|upgrade)\s+(\S+)\s+from\s+(\S+)\s+to\s+(\S+)', re.IGNORECASE)
+_HEADING = re.compile(r'^\+\s{0,3}#{1,6}\s+(.+)$')
+
+
+class Triage:
+    """简单 PR 的识别结果"""
+
+    def __init__(self, kind: str, files: List[FileDiff], details: List[str]):
+        self.kind = kind
+        self.files = files
+        self.details = details
+
+    @property
+    def label(self) -> str:
+        return KIND_LABELS[self.kind]
+
+
+def _matches(patterns: Tuple[str, ...], path: str) -> bool:
+    return any(path_matches(pattern, path) for pattern in patterns)
+
+
+def _is_doc(path: str) -> bool:
+    return _matches(DOC_PATTERNS, path) and not _matches(MANIFEST_PATTERNS, path)
+
+
+def _blocks(file: FileDiff) -> List[Tuple[List[str], List[str]]]:
+    """连续的删除行和新增行组成的变更块"""
+    blocks: List[Tuple[List[str], List[str]]] = []
+    current: Optional[Tuple[List[str], List[str]]] = None
+    for line in file.body:
+        kind = line[:1]
+        if kind in ('+', '-') and not line.startswith('@@'):
+            if current is None:
+                current = ([], [])
+                blocks.append(current)
+            (current[0] if kind == '-' else current[1]).append(line[1:])
+        elif kind != '\\':
+            current = None
+    return blocks
+
+
+def _pairs(file: FileDiff) -> Optional[List[Tuple[str, str]]]:
+    """逐行配对的替换；有纯新增或纯删除的非空行时返回 None"""
+    pairs = []
+    for removed, added in _blocks(file):
+        removed = [line for line in removed if line.strip()]
+        added = [line for line in added if line.strip()]
+        if len(removed) != len(added):
+            return None
+        pairs.extend(zip(removed, added))
+    return pairs
+
+
+def _is_formatting(files: List[FileDiff]) -> bool:
+    blocks = [(file.path, block) for file in files for block in _blocks(file)]
+    return bool(blocks) and all(whitespace_only(path, removed, added) for path, (removed, added) in blocks)
+
+
+def _version_change(old: str, new: str) -> Optional[str]:
+    """两行只有版本号不同时返回 "名称 旧版本 → 新版本"，否则返回 None"""
+    if _VERSION.sub('', old).strip() != _VERSION.sub('', new).strip() or old.strip() == new.strip():
+        return None
+    old_versions, new_versions = _VERSION.findall(old), _VERSION.findall(new)
+    name = _VERSION.sub('', new).strip(' \t"\',:=@<>~^;-')
+    name = re.sub(r'\s*[:=]+\s*$|["\']', '', name).strip() or new.strip()
+    return f"{name} {', '.join(old_versions)} → {', '.join(new_versions)}"
+
+
+def _is_version_line(path: str, line: str) -> bool:
+    """版本号行；包的 __init__.py 中只有 __version__ 算"""
+    if path.rsplit('/', 1)[-1] == '__init__.py':
+        return bool(_DUNDER_VERSION.match(line))
+    return bool(_VERSION_KEY.search(line))
+
+
+def _is_dependency_line(path: str, line: str) -> bool:
+    """依赖清单中的依赖声明行"""
+    return any(regex.match(line) for patterns, regex in _DEPENDENCY_SYNTAX if _matches(patterns, path))
+
+
+def _classify_versions(files: List[FileDiff], rules: DiffRules) -> Optional[Triage]:
+    """依赖升级或版本号更新"""
+    dependency, version, lockfiles = [], [], []
+    for file in files:
+        name = file.path.rsplit('/', 1)[-1]
+        if name in LOCKFILE_FORMATS:
+            lockfiles.append(file)
+        elif rules.classify(file) in ('vendored', 'generated') or _is_doc(file.path):
+            continue
+        elif _matches(MANIFEST_PATTERNS, file.path) or name in VERSION_FILES:
+            pairs = _pairs(file)
+            if not pairs:
+                return None
+            for old, new in pairs:
+                change = _version_change(old, new)
+                if change is None:
+                    return None
+                if _is_version_line(file.path, old) and _is_version_line(file.path, new):
+                    version.append(change)
+                elif _is_dependency_line(file.path, old) and _is_dependency_line(file.path, new):
+                    dependency.append(change)
+                else:
+                    # 常量、超时等其他数值的改动
+                    return None
+        else:
+            return None
+
+    if lockfiles or dependency:
+        details = dependency[:]
+        for file in lockfiles:
+            condensed = condense_lockfile(file.path, file.body)
+            if condensed:
+                details.append(f"{file.path}: " + condensed.replace('\n', '；'))
+        return Triage('dependency', files, details + version)
+    if version:
+        return Triage('version', files, version)
+    return None
+
+
+def _prose_mask(line: str, path: str) -> Optional[List[bool]]:
+    """
+    行中每个字符是否属于自然语言（可以识别拼写修正）
+
+    文档中除行内代码以外都是自然语言；代码文件中只有注释是（字符串字面量可能是比较用的值，
+    不算自然语言）。不认识注释语法的代码文件返回 None。
+    """
+    if _is_doc(path):
+        mask = [True] * len(line)
+        for match in _CODE_SPAN.finditer(line):
+            mask[match.start():match.end()] = [False] * (match.end() - match.start())
+        return mask
+
+    name = path.rsplit('/', 1)[-1]
+    markers = COMMENT_MARKERS.get(os.path.splitext(name)[1].lower())
+    if markers is None:
+        return None
+    mask = [False] * len(line)
+    strings = [match.span() for match in _STRING.finditer(line)]
+    comment = len(line)
+    if line.lstrip().startswith('*') and '/*' in markers:
+        comment = 0  # 块注释的续行
+    for marker in markers:
+        index = line.find(marker)
+        while index != -1 and any(start <= index < end for start, end in strings):
+            index = line.find(marker, index + 1)
+        if index != -1:
+            comment = min(comment, index)
+    mask[comment:] = [True] * (len(line) - comment)
+    return mask
+
+
+def _is_word(token: str) -> bool:
+    """可能拼错的单词：只含字母，且不是驼峰标识符"""
+    return token.isalpha() and not _CAMEL_CASE.search(token)
+
+
+def _word_changes(old: str, new: str, path: str) -> Optional[List[str]]:
+    """
+    一行中被替换的单词；改动超过两处或不像拼写修正时返回 None
+
+    只接受文档和注释中的单词替换：含数字或下划线的词、标识符和数字的改动都不算拼写修正。
+    """
+    old_mask, new_mask = _prose_mask(old, path), _prose_mask(new, path)
+    if old_mask is None or new_mask is None:
+        return None
+    old_tokens, new_tokens = list(_WORD.finditer(old)), list(_WORD.finditer(new))
+    changes = []
+    matcher = difflib.SequenceMatcher(None, [token.group() for token in old_tokens],
+                                      [token.group() for token in new_tokens], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        if tag != 'replace' or i2 - i1 > 2 or j2 - j1 > 2:
+            return None
+        replaced = [(token, old_mask) for token in old_tokens[i1:i2]] + \
+                   [(token, new_mask) for token in new_tokens[j1:j2]]
+        if not all(_is_word(token.group()) and all(mask[token.start():token.end()])
+                   for token, mask in replaced):
+            return None
+        before = ' '.join(token.group() for token in old_tokens[i1:i2])
+        after = ' '.join(token.group() for token in new_tokens[j1:j2])
+        if difflib.SequenceMatcher(None, before.lower(), after.lower()).ratio() < 0.6:
+            return None
+        changes.append(f"{before} → {after}")
+    return changes if 0 < len(changes) <= 2 else None
+
+
+def _classify_typo(files: List[FileDiff]) -> Optional[Triage]:
+    if sum(file.additions + file.deletions for file in files) > MAX_TYPO_LINES:
+        return None
+    corrections = []
+    for file in files:
+        pairs = _pairs(file)
+        if not pairs:
+            return None
+        for old, new in pairs:
+            changes = _word_changes(old, new, file.path)
+            if changes is None:
+                return None
+            corrections.extend(f"{file.path}: {change}" for change in changes)
+    return Triage('typo', files, corrections)
+
+
+def classify_pr(diff_content: str, rules: Optional[DiffRules] = None) -> Optional[Triage]:
+    """
+    识别不需要 LLM 的简单 PR
+
+    Args:
+        diff_content: GitHub PR 差异内容
+        rules: 文件过滤规则，用于识别依赖升级中随之更新的第三方代码
+
+    Returns:
+        识别结果；需要 LLM 分析时返回 None
+    """
+    files = split_file_diffs(diff_content)
+    if not files or any(file.binary and not _is_doc(file.path) for file in files):
+        return None
+    rules = rules or DiffRules.from_env()
+
+    if _is_formatting(files):
+        return Triage('formatting', files, [])
+    triage = _classify_versions(files, rules)
+    if triage is not None:
+        return triage
+    if all(_is_doc(file.path) for file in files):
+        headings = [match.group(1).strip() for file in files for line in file.body
+                    for match in [_HEADING.match(line)] if match]
+        return Triage('docs', files, [f"新增章节：{heading}" for heading in headings])
+    return _classify_typo(files)
+
+
+def render_summary(triage: Triage, pr_info: Dict[str, Any]) -> str:
+    """按 LLM 摘要的格式生成简单 PR 的摘要"""
+    additions = sum(file.additions for file in triage.files)
+    deletions = sum(file.deletions for file in triage.files)
+    author = pr_info.get('author') or pr_info.get('user', '')
+    who = f"{author}{' (机器人)' if str(author).endswith('[bot]') else ''} " if author else ''
+
+    lines = [
+        "## 变更摘要",
+        f"{triage.label}：{who}修改了 {len(triage.files)} 个文件（+{additions} -{deletions}），"
+        f"不涉及业务逻辑。",
+        "",
+        "## 详细分析",
+    ]
+    match = _BUMP_TITLE.search(pr_info.get('title', ''))
+    if triage.kind == 'dependency' and match:
+        lines.append(f"- 将 {match.group(1)} 从 {match.group(2)} 升级到 {match.group(3)}")
+    lines.extend(f"- {detail}" for detail in triage.details[:20])
+    if len(triage.details) > 20:
+        lines.append(f"- …另有 {len(triage.details) - 20} 处")
+    lines.append("- 涉及文件：" + '、'.join(file.path for file in triage.files[:10]) +
+                 (f" 等 {len(triage.files)} 个" if len(triage.files) > 10 else ''))
+    lines.extend([
+        "",
+        "## 建议",
+        "依赖升级请确认 CI 通过并留意上游的变更说明。" if triage.kind == 'dependency' else "无。",
+        "",
+        "（本摘要由本地规则生成，未调用 AI）",
+    ])
+    return '\n'.join(lines)
+
+
+def local_summary(diff_content: str, pr_info: Dict[str, Any],
+                  rules: Optional[DiffRules] = None) -> Optional[Tuple[str, str]]:
+    """
+    简单 PR 的本地摘要
+
+    Returns:
+        (类别, 摘要)；需要 LLM 分析或 MCP_TRIAGE=0 时返回 None
+    """
+    if not TRIAGE_ENABLED or not diff_content:
+        return None
+    triage = classify_pr(diff_content, rules)
+    if triage is None:
+        return None
+    return triage.kind, render_summary(triage, pr_info)
+
+
+def heuristic_summary(diff_content: str, pr_info: Dict[str, Any],
+                      rules: Optional[DiffRules] = None) -> Tuple[str, str]:
+    """
+    不调用 LLM 的摘要：简单 PR 使用对应模板，其余 PR 列出文件统计和变更符号
+
+    Returns:
+        (类别，非简单 PR 为 'heuristic', 摘要)
+    """
+    triage = classify_pr(diff_content, rules) if diff_content else None
+    if triage is not None:
+        return triage.kind, render_summary(triage, pr_info)
+
+    rules = rules or DiffRules.from_env()
+    files = split_file_diffs(diff_content)
+    kept = [file for file in files if rules.classify(file) in ('', 'condense')]
+    additions = sum(file.additions for file in files)
+    deletions = sum(file.deletions for file in files)
+    author = pr_info.get('author') or pr_info.get('user', '')
+
+    lines = [
+        "## 变更摘要",
+        f"{author + ' ' if author else ''}修改了 {len(files)} 个文件（+{additions} -{deletions}）。"
+        f"系统繁忙，本摘要只包含变更统计，未经 AI 分析。",
+        "",
+        "## 详细分析",
+    ]
+    for file in sorted(kept, key=lambda file: file.additions + file.deletions, reverse=True)[:15]:
+        lines.append(f"- {file.path}（{STATUS_LABELS[file.status]}，+{file.additions} -{file.deletions}）")
+    if len(kept) > 15:
+        lines.append(f"- …另有 {len(kept) - 15} 个文件")
+    symbols = extract_changed_symbols([file for file in kept if rules.classify(file) == ''])
+    if symbols:
+        lines.extend(["", "变更的函数/类/方法："] + symbols[:20])
+    lines.extend(["", "## 建议", "请查看 PR 了解完整变更。", "", "（本摘要由本地规则生成，未调用 AI）"])
+    return 'heuristic', '\n'.join(lines)
@@ -0,0 +1,208 @@
+"""
+GitHub PR MCP Server 工作进程
+
+工作进程从共享的 SQLite 队列中认领任务，在独立进程中完成差异解析、
+提示词构建和 AI 分析，绕开单进程 GIL 的限制。
+凭据和通知目标按任务所属仓库从路由表中选择，各仓库同时处理的任务数受路由配额限制。
+队列积压时按 degradation 逐级降级处理，积压消除后可补全降级处理的摘要；
+收到 SIGTERM（stop_workers）时发送未发送的汇总后退出。
+"""
+
+import json
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from .core import DIGEST, MICROBATCHER, process_webhook_payload
+from .degradation import UPGRADE_BATCH, UPGRADE_ENABLED, DegradationController
+from .job_queue import JobQueue
+from .routing import RoutingTable, current_routes
+from .scheduling import SOURCE_BACKFILL, SOURCE_LIVE, webhook_priority
+from . import metrics, tracing
+
+
+POLL_INTERVAL = float(os.getenv('MCP_WORKER_POLL_INTERVAL', 0.5))
+
+
+def handle_job(job: Dict[str, Any], routes: Optional[RoutingTable] = None,
+               degradation: str = 'full') -> Dict[str, Any]:
+    """
+    执行单个任务
+
+    Args:
+        job: 从队列认领的任务
+        routes: 仓库路由表，默认使用 current_routes()
+        degradation: 处理模式（见 degradation）
+
+    Returns:
+        处理结果；补全摘要的任务在降级期间返回 status 为 deferred 的结果，
+        重试也无法成功的错误带有 retryable=False
+    """
+    if job['kind'] == 'process_webhook':
+        if job['payload'].get('upgrade_of') and degradation != 'full':
+            return {'status': 'deferred'}
+        repository = job['payload'].get('repository', '')
+        route = (routes or current_routes()).resolve(repository)
+        if route is None:
+            return {'status': 'error', 'error': f'仓库 {repository} 未配置路由', 'retryable': False}
+        # 回填任务默认不发送飞书通知（notify 为 False）
+        feishu_webhook_url = route.feishu_webhook_url if job['payload'].get('notify', True) else ''
+        # 延续入队时的 trace，使前端和工作进程的 span 属于同一条 trace
+        with tracing.span('worker_job', parent=job['payload'].get('traceparent', ''),
+                          job_id=job['id'], attempt=job['attempts'], repository=repository,
+                          degradation=degradation):
+            return process_webhook_payload(
+                job['payload']['webhook_payload'],
+                route.openai_api_key,
+                feishu_webhook_url,
+                route.github_token,
+                degradation,
+                job['payload'].get('draft_message_id', ''),
+                job['payload'].get('source', SOURCE_LIVE)
+            )
+    return {'status': 'error', 'error': f"未知任务类型: {job['kind']}", 'retryable': False}
+
+
+def _heartbeat_loop(job_queue: JobQueue, job_id: int, worker_id: str, stop: threading.Event,
+                    metrics_process: str = ''):
+    """任务执行期间定期续约，并写入指标快照（前端据此判断进程仍在运行）"""
+    interval = max(job_queue.lease_seconds / 3, 0.1)
+    while not stop.wait(interval):
+        if metrics_process:
+            _push_metrics(job_queue, metrics_process)
+        if not job_queue.heartbeat(job_id, worker_id):
+            print(f"⚠️ [{worker_id}] 任务 {job_id} 的租约已失效")
+            return
+
+
+def _defer_upgrade(job_queue: JobQueue, job: Dict[str, Any]) -> int:
+    """降级处理的任务延后重新入队，积压消除后补全摘要（按回填优先级处理）"""
+    payload = dict(job['payload'], upgrade_of=job['id'])
+    try:
+        priority = webhook_priority(json.loads(payload['webhook_payload']), SOURCE_BACKFILL)
+    except (ValueError, KeyError):
+        priority = 0.0
+    return job_queue.enqueue(job['kind'], payload, priority=priority, deferred=True)
+
+
+def run_worker(queue_path: str, worker_id: str, lease_seconds: float):
+    """
+    工作进程主循环
+
+    Args:
+        queue_path: SQLite 队列文件路径
+        worker_id: 工作进程标识
+        lease_seconds: 租约时长（秒）
+    """
+    job_queue = JobQueue(queue_path, lease_seconds=lease_seconds)
+    controller = DegradationController()
+    tracing.configure_from_env(suffix=f'.{worker_id}')
+    # 工作进程一次处理一个任务，没有可合批的并发调用方
+    MICROBATCHER.enabled = False
+    # 快照按进程保存，重启的工作进程不会覆盖前一个进程的计数
+    metrics_process = f"{worker_id}:{os.getpid()}"
+    pushed_at = 0.0
+    print(f"👷 工作进程 {worker_id} 已启动 (pid={os.getpid()})")
+
+    # 正在处理的任务在租约到期后由其他工作进程重新认领
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+
+    try:
+        while True:
+            if time.monotonic() - pushed_at >= metrics.PUSH_INTERVAL:
+                _push_metrics(job_queue, metrics_process)
+                pushed_at = time.monotonic()
+            mode = controller.observe(job_queue)
+            DIGEST.flush()
+            if UPGRADE_ENABLED and controller.idle():
+                job_queue.release_deferred(UPGRADE_BATCH)
+            routes = current_routes()
+            job = job_queue.claim(worker_id, quota=routes.quota, weight=routes.weight)
+            if job is None:
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            stop = threading.Event()
+            heartbeat = threading.Thread(
+                target=_heartbeat_loop,
+                args=(job_queue, job['id'], worker_id, stop, metrics_process),
+                daemon=True
+            )
+            heartbeat.start()
+            try:
+                result = handle_job(job, routes, mode)
+                if result.get('status') == 'deferred':
+                    job_queue.defer(job['id'], worker_id)
+                elif result.get('status') == 'error':
+                    job_queue.fail(job['id'], worker_id, result.get('error', ''), result.get('retryable', True))
+                else:
+                    if UPGRADE_ENABLED and result.get('degraded'):
+                        result['upgrade_job_id'] = _defer_upgrade(job_queue, job)
+                    job_queue.complete(job['id'], worker_id, result)
+            except Exception as e:
+                job_queue.fail(job['id'], worker_id, str(e))
+            finally:
+                stop.set()
+                heartbeat.join()
+                _push_metrics(job_queue, metrics_process)
+                pushed_at = time.monotonic()
+    finally:
+        _flush_digest(worker_id)
+
+
+def _exit_on_sigterm(signum, frame):
+    raise SystemExit(0)
+
+
+def _flush_digest(worker_id: str):
+    """进程退出前发送所有未发送的汇总"""
+    if DIGEST.size() == 0:
+        return
+    DIGEST.flush(force=True)
+    lost = DIGEST.size()
+    if lost:
+        print(f"⚠️ 工作进程 {worker_id} 退出时 {lost} 个 PR 的汇总发送失败")
+
+
+def _push_metrics(job_queue: JobQueue, process: str):
+    """把本进程的指标快照写入队列数据库，由前端进程合并到 /metrics"""
+    try:
+        job_queue.push_metrics(process, metrics.REGISTRY.snapshot())
+    except Exception as e:
+        print(f"⚠️ 写入指标快照失败: {e}")
+
+
+def start_workers(count: int, job_queue: JobQueue) -> List[multiprocessing.Process]:
+    """
+    启动多个工作进程
+
+    Args:
+        count: 工作进程数量
+        job_queue: 共享任务队列
+
+    Returns:
+        已启动的进程列表
+    """
+    job_queue.clear_metric_snapshots()
+    processes = []
+    for index in range(count):
+        process = multiprocessing.Process(
+            target=run_worker,
+            args=(job_queue.path, f"worker-{index}", job_queue.lease_seconds),
+            name=f"mcp-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def stop_workers(processes: List[multiprocessing.Process], timeout: float = 15):
+    """停止所有工作进程（SIGTERM），等待各进程发送未发送的汇总"""
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join(timeout=timeout)
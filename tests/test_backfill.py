@@ -0,0 +1,154 @@
+"""历史 PR 回填测试"""
+
+import json
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from github_pr_mcp_server import backfill as backfill_module, routing, worker
+from github_pr_mcp_server.backfill import Checkpoint, backfill, backfill_job, run_job
+from github_pr_mcp_server.job_queue import JobQueue
+from github_pr_mcp_server.scheduling import SOURCE_BACKFILL, webhook_priority
+
+SINCE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+UNTIL = datetime(2024, 12, 31, tzinfo=timezone.utc)
+
+
+def _pr(number):
+    return {'number': number, 'title': f'PR {number}', 'user': {'login': 'u'},
+            'created_at': '2024-06-01T00:00:00Z', 'diff_url': f'https://github.com/o/r/pull/{number}.diff'}
+
+
+class FakeClient:
+    def __init__(self, numbers):
+        self.numbers = numbers
+
+    def list_pull_requests(self, repo, since, until):
+        return iter(_pr(number) for number in self.numbers)
+
+
+def test_checkpoint_appends_and_replays(tmp_path):
+    path = str(tmp_path / 'out.checkpoint.jsonl')
+    checkpoint = Checkpoint(path, 'o/r')
+    checkpoint.record(1)
+    checkpoint.record(2, 'timeout')
+    checkpoint.record(2)
+    checkpoint.record(3, 'timeout')
+    with open(path, encoding='utf-8') as f:
+        assert len(f.read().splitlines()) == 5
+
+    reopened = Checkpoint(path, 'o/r')
+    assert reopened.done == {1, 2}
+    assert reopened.failed == {'3': 'timeout'}
+
+
+def test_checkpoint_ignores_torn_last_line(tmp_path):
+    path = str(tmp_path / 'out.checkpoint.jsonl')
+    Checkpoint(path, 'o/r').record(1)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"numb')
+    assert Checkpoint(path, 'o/r').done == {1}
+
+
+def test_checkpoint_rejects_other_repository(tmp_path):
+    path = str(tmp_path / 'out.checkpoint.jsonl')
+    Checkpoint(path, 'o/r')
+    with pytest.raises(ValueError):
+        Checkpoint(path, 'o/other')
+
+
+def test_backfill_job_goes_through_webhook_pipeline():
+    payload = backfill_job('o/r', _pr(7))
+    assert payload['source'] == SOURCE_BACKFILL
+    assert payload['notify'] is False
+    webhook = json.loads(payload['webhook_payload'])
+    assert webhook['action'] == 'opened'
+    assert webhook['repository'] == {'full_name': 'o/r'}
+    assert webhook['pull_request']['number'] == 7
+
+
+def test_backfill_skips_done_and_writes_after_checkpoint(tmp_path, monkeypatch):
+    output = str(tmp_path / 'out.jsonl')
+    checkpoint = Checkpoint(output + '.checkpoint.jsonl', 'o/r')
+    checkpoint.record(1)
+    handled = []
+
+    def handle_job(job):
+        number = json.loads(job['payload']['webhook_payload'])['number']
+        handled.append(number)
+        if number == 3:
+            return {'status': 'error', 'error': '获取 PR 差异失败'}
+        return {'status': 'success', 'summary': f'summary {number}', 'triage': 'llm'}
+
+    record = checkpoint.record
+
+    def record_before_output(number, error=''):
+        # 记录检查点时摘要还没有写入输出
+        with open(output, 'a+', encoding='utf-8') as f:
+            f.seek(0)
+            assert f'"number": {number},' not in f.read()
+        record(number, error)
+
+    monkeypatch.setattr(backfill_module, 'handle_job', handle_job)
+    monkeypatch.setattr(checkpoint, 'record', record_before_output)
+    stats = backfill('o/r', SINCE, UNTIL, output, checkpoint, FakeClient([1, 2, 3]), concurrency=1)
+
+    assert stats == {'listed': 3, 'skipped': 1, 'succeeded': 1, 'failed': 1}
+    assert sorted(handled) == [2, 3]
+    with open(output, encoding='utf-8') as f:
+        assert [json.loads(line)['number'] for line in f] == [2]
+    reopened = Checkpoint(output + '.checkpoint.jsonl', 'o/r')
+    assert reopened.done == {1, 2}
+    assert reopened.failed == {'3': '获取 PR 差异失败'}
+
+
+def test_degraded_result_is_retried_later(tmp_path, monkeypatch):
+    output = str(tmp_path / 'out.jsonl')
+    checkpoint = Checkpoint(output + '.checkpoint.jsonl', 'o/r')
+    monkeypatch.setattr(backfill_module, 'handle_job',
+                        lambda job: {'status': 'success', 'summary': 's', 'degraded': 'heuristic'})
+    stats = backfill('o/r', SINCE, UNTIL, output, checkpoint, FakeClient([1]))
+    assert stats['failed'] == 1
+    assert checkpoint.done == set()
+
+
+def test_run_job_enqueues_with_backfill_priority(tmp_path, monkeypatch):
+    monkeypatch.setattr(backfill_module, 'POLL_INTERVAL', 0.01)
+    job_queue = JobQueue(str(tmp_path / 'jobs.sqlite3'))
+    payload = backfill_job('o/r', _pr(7))
+    claimed = []
+
+    def worker():
+        while True:
+            job = job_queue.claim('w1')
+            if job is not None:
+                claimed.append(job)
+                job_queue.complete(job['id'], 'w1', {'status': 'success', 'summary': 'done'})
+                return
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    result = run_job(payload, job_queue)
+    thread.join()
+
+    assert result == {'status': 'success', 'summary': 'done'}
+    job = claimed[0]
+    assert job['payload']['source'] == SOURCE_BACKFILL
+    assert job['priority'] == webhook_priority(json.loads(payload['webhook_payload']), SOURCE_BACKFILL)
+
+
+def test_backfill_job_skips_feishu_unless_requested(monkeypatch):
+    monkeypatch.setenv('FEISHU_WEBHOOK_URL', 'https://open.feishu.cn/hook')
+    monkeypatch.delenv('MCP_ROUTES_PATH', raising=False)
+    monkeypatch.setattr(routing, '_current', (None, None))
+    calls = []
+    monkeypatch.setattr(worker, 'process_webhook_payload', lambda *args: calls.append(args) or {})
+
+    for notify in (False, True):
+        worker.handle_job({'id': 1, 'kind': 'process_webhook', 'attempts': 1,
+                           'payload': backfill_job('o/r', _pr(7), notify)})
+    (_, _, quiet_feishu, *_, quiet_source), (_, _, feishu, *_) = calls
+    assert quiet_feishu == ''
+    assert quiet_source == SOURCE_BACKFILL
+    assert feishu == 'https://open.feishu.cn/hook'
@@ -0,0 +1,91 @@
+"""批量分析测试"""
+
+import json
+
+import pytest
+
+from github_pr_mcp_server import batch, core, routing
+
+DIFF = "diff --git a/app.py b/app.py\n--- a/app.py\n+++ b/app.py\n@@ -1 +1 @@\n-a = 1\n+a = 2\n"
+
+
+class _Response:
+    def __init__(self, text='', status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.text)
+
+
+@pytest.fixture
+def requests_log(monkeypatch):
+    """记录 core 发出的 GET 请求；PR 元数据请求返回固定的提交"""
+    calls = []
+
+    def get(url, headers=None, params=None, timeout=None):
+        calls.append((url, dict(headers or {})))
+        if url.endswith('/pulls/7') and 'Accept' not in (headers or {}):
+            return _Response(json.dumps({'number': 7, 'title': 't', 'user': {'login': 'u'},
+                                         'head': {'sha': 'h'}, 'base': {'sha': 'b'},
+                                         'additions': 1, 'deletions': 1, 'changed_files': 1}))
+        if 'contents/.gitattributes' in url:
+            return _Response(status_code=404)
+        return _Response(DIFF)
+
+    monkeypatch.setattr(core.requests, 'get', get)
+    monkeypatch.delenv('MCP_ROUTES_PATH', raising=False)
+    # 路由表按文件缓存，测试中修改环境变量后需要重新加载
+    monkeypatch.setattr(routing, '_current', (None, None))
+    return calls
+
+
+def test_token_is_only_sent_to_github(requests_log):
+    core.get_pr_diff('https://github.com/o/r/pull/1.diff', 'secret')
+    core.get_pr_diff('https://example.com/o/r/pull/1.diff', 'secret')
+    (_, github_headers), (_, other_headers) = requests_log
+    assert github_headers == {'Authorization': 'token secret'}
+    assert other_headers == {}
+
+
+def test_rejects_non_github_diff_url():
+    with pytest.raises(ValueError):
+        batch.resolve_batch_item('https://example.com/o/r/pull/1.diff')
+    assert batch.resolve_batch_item('https://github.com/o/r/pull/1.diff')['diff_url']
+
+
+def test_pr_reference_uses_route_rules_and_plan(requests_log, monkeypatch):
+    monkeypatch.setenv('GITHUB_TOKEN', 'route-token')
+    monkeypatch.setenv('OPENAI_API_KEY', 'route-key')
+    calls = []
+
+    def summarize(diff_content, pr_info, openai_api_key, diff_rules, plan):
+        calls.append((pr_info, openai_api_key, diff_rules, plan))
+        return 'llm', 'summary'
+
+    monkeypatch.setattr(batch, 'summarize_changes', summarize)
+    result = batch.analyze_prs_batch(['o/r#7', 'o/r#7'])
+
+    assert result['status'] == 'success'
+    assert [item['summary'] for item in result['results']] == ['summary', 'summary']
+    # 相同的 PR 只获取和分析一次
+    assert len(calls) == 1
+    pr_info, openai_api_key, diff_rules, plan = calls[0]
+    assert openai_api_key == 'route-key'
+    assert pr_info['number'] == '7' and pr_info['user'] == 'u'
+    assert diff_rules is not None
+    assert plan.tier == 'fast'
+    assert all(headers.get('Authorization') == 'token route-token' for _, headers in requests_log)
+    assert any('contents/.gitattributes' in url for url, _ in requests_log)
+
+
+def test_unrouted_repository_is_rejected(requests_log, monkeypatch, tmp_path):
+    routes = tmp_path / 'routes.json'
+    routes.write_text(json.dumps({'default': None, 'repositories': {'o/allowed': {}}}))
+    monkeypatch.setenv('MCP_ROUTES_PATH', str(routes))
+    result = batch.analyze_prs_batch(['o/other#7'])
+    assert result['results'][0]['error'] == '仓库 o/other 未配置路由'
+    assert requests_log == []
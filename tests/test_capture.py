@@ -0,0 +1,89 @@
+"""Webhook 录制与回放测试"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from github_pr_mcp_server.capture import REDACTED, WebhookRecorder, redact_body, sign_payload
+from github_pr_mcp_server.replay import load_corpus, replay
+
+
+def test_redact_body_keeps_original_bytes_without_secrets():
+    body = b'{"action": "opened",  "number": 1}'
+    assert redact_body(body) is body
+
+
+def test_redact_body_masks_nested_secrets():
+    body = json.dumps({'installation': {'access_token': 'ghs_x'}, 'items': [{'client_secret': 's'}]}).encode()
+    payload = json.loads(redact_body(body))
+    assert payload['installation']['access_token'] == REDACTED
+    assert payload['items'][0]['client_secret'] == REDACTED
+
+
+def test_recorder_drops_credentials_and_resigns(tmp_path):
+    path = str(tmp_path / 'corpus.jsonl.gz')
+    recorder = WebhookRecorder(path, test_secret='test')
+    body = b'{"action": "opened"}'
+    recorder.record('/webhook/github', body, {
+        'X-GitHub-Event': 'pull_request',
+        'X-Hub-Signature-256': 'sha256=real',
+        'Authorization': 'token real',
+    })
+    recorder.record('/webhook/github', body, {'X-GitHub-Event': 'ping'})
+
+    records = list(load_corpus(path))
+    assert [r['headers']['X-GitHub-Event'] for r in records] == ['pull_request', 'ping']
+    assert 'Authorization' not in records[0]['headers']
+    assert records[0]['headers']['X-Hub-Signature-256'] == sign_payload(body, 'test')
+    assert records[0]['body'] == body.decode()
+
+
+@pytest.fixture
+def target():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            received.append((self.path, self.headers['X-Hub-Signature-256'], body))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", received
+    server.shutdown()
+    server.server_close()
+
+
+def test_replay_resigns_with_target_secret(target):
+    url, received = target
+    records = [
+        {'ts': 100.0, 'route': '/webhook', 'headers': {'X-Hub-Signature-256': 'sha256=old'}, 'body': '{"n": 1}'},
+        {'ts': 100.5, 'route': '/webhook', 'headers': {}, 'body': '{"n": 2}'},
+    ]
+    stats = replay(records, url, speed=None, secret='target', route='/webhook/github', concurrency=2)
+
+    assert stats['sent'] == 2
+    assert stats['statuses'] == {'200': 2}
+    assert sorted(received) == [
+        ('/webhook/github', sign_payload(b'{"n": 1}', 'target'), b'{"n": 1}'),
+        ('/webhook/github', sign_payload(b'{"n": 2}', 'target'), b'{"n": 2}'),
+    ]
+
+
+def test_replay_keeps_recorded_spacing(target):
+    url, _ = target
+    records = [
+        {'ts': 0.0, 'route': '/webhook', 'headers': {}, 'body': '{}'},
+        {'ts': 1.0, 'route': '/webhook', 'headers': {}, 'body': '{}'},
+    ]
+    # 10 倍速下 1 秒间隔缩放为约 0.1 秒
+    stats = replay(records, url, speed=10)
+    assert 0.09 <= stats['elapsed_seconds'] < 1.0
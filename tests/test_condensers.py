@@ -0,0 +1,86 @@
+"""按文件类型压缩差异测试"""
+
+from github_pr_mcp_server.condensers import condense
+from github_pr_mcp_server.diffs import DiffRules, GitAttributes, filter_diff, split_file_diffs
+
+NOTEBOOK = '''@@ -1,6 +1,14 @@
+   {
+    "cell_type": "code",
+    "source": [
+-    "x = 1\\n",
++    "x = 2\\n",
+     "print(x)"
+    ]
++  },
++  {
++   "cell_type": "markdown",
++   "source": "# Title",
++   "outputs": [
++    "aGVsbG8="
++   ]
+   }'''.splitlines()
+
+POETRY_LOCK = '''@@ -1,6 +1,6 @@
+ [[package]]
+ name = "requests"
+-version = "2.31.0"
++version = "2.32.0"
+ [[package]]
+-name = "six"
+-version = "1.16.0"
++name = "idna"
++version = "3.7"'''.splitlines()
+
+
+def test_notebook_lists_source_changes_and_counts_outputs():
+    summary = condense('nb/a.ipynb', NOTEBOOK)
+    lines = summary.splitlines()
+    assert lines[0] == '### nb/a.ipynb（Jupyter 笔记本，已压缩）'
+    assert lines[1].startswith('单元格：新增 1 个 markdown，删除 0 个')
+    assert lines[3:] == ['- x = 1', '+ x = 2', '+ # Title']
+    assert 'aGVsbG8=' not in summary
+
+
+def test_lockfile_lists_dependency_changes():
+    assert condense('poetry.lock', POETRY_LOCK).splitlines()[1:] == [
+        '依赖变更：新增 1 个，移除 1 个，升级 1 个',
+        '升级: requests 2.31.0 → 2.32.0',
+        '新增: idna 3.7',
+        '移除: six 1.16.0',
+    ]
+
+
+def test_unparsable_lockfile_falls_back_to_line_counts():
+    assert condense('poetry.lock', ['@@ -1 +1 @@', '-garbage', '+junk']).endswith('+1 -1 行（未能解析内容）')
+
+
+def test_svg_counts_elements():
+    summary = condense('icon.svg', ['@@ -1,2 +1,3 @@', ' <svg>', '-<path d="a"/>', '+<path d="b"/>', '+<circle r="1"/>'])
+    assert summary.splitlines()[1] == '+2 -1 行；新增元素: path×1, circle×1；删除元素: path×1'
+
+
+def test_data_file_reports_rows_and_header_change():
+    summary = condense('data/t.csv', ['@@ -1,2 +1,3 @@', '-id,name', '+id,name,email', ' 1,a', '+2,b'])
+    assert summary.splitlines()[1:] == ['数据行：+1 -0；列 (3): id, name, email',
+                                        '表头变更: id, name → id, name, email']
+
+
+def test_unknown_file_type_is_not_condensed():
+    assert condense('src/app.py', ['@@ -1 +1 @@', '-a', '+b']) is None
+
+
+def _lockfile_diff(path):
+    return '\n'.join([f'diff --git a/{path} b/{path}', f'--- a/{path}', f'+++ b/{path}', *POETRY_LOCK])
+
+
+def test_filter_diff_condenses_builtin_generated_files():
+    filtered, stats, _ = filter_diff(_lockfile_diff('poetry.lock'), DiffRules(), minify=False)
+    assert filtered.startswith('### poetry.lock（锁文件，已压缩）')
+    assert stats == []
+
+
+def test_gitattributes_generated_and_vendored_win_over_condensers():
+    rules = DiffRules(gitattributes=GitAttributes('poetry.lock linguist-generated\nnotebooks/** linguist-vendored\n'))
+    assert rules.classify(split_file_diffs(_lockfile_diff('poetry.lock'))[0]) == 'generated'
+    assert rules.classify(split_file_diffs(_lockfile_diff('notebooks/a.ipynb'))[0]) == 'vendored'
+    assert rules.classify(split_file_diffs(_lockfile_diff('other/a.ipynb'))[0]) == 'condense'
@@ -0,0 +1,131 @@
+"""积压降级控制器测试"""
+
+import json
+import multiprocessing
+import time
+
+from github_pr_mcp_server import worker
+from github_pr_mcp_server.degradation import DegradationController, DigestBuffer
+from github_pr_mcp_server.job_queue import JobQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _controller(clock):
+    return DegradationController(depth_thresholds=(10, 20, 40), age_thresholds=(60, 120, 240),
+                                 recover_ratio=0.5, hold_seconds=30, clock=clock)
+
+
+def test_degrades_immediately():
+    controller = _controller(FakeClock())
+    assert controller.update(5, 0) == 'full'
+    assert controller.update(25, 0) == 'heuristic'
+    assert controller.update(0, 300) == 'digest'
+
+
+def test_recovers_one_level_after_hold():
+    clock = FakeClock()
+    controller = _controller(clock)
+    controller.update(45, 0)
+    assert controller.mode == 'digest'
+
+    # 积压缓解但未停留满 hold_seconds
+    clock.now = 10
+    assert controller.update(0, 0) == 'digest'
+    clock.now = 31
+    assert controller.update(0, 0) == 'heuristic'
+    clock.now = 40
+    assert controller.update(0, 0) == 'heuristic'
+    clock.now = 62
+    assert controller.update(0, 0) == 'cheap'
+
+
+def test_does_not_recover_above_recover_ratio():
+    clock = FakeClock()
+    controller = _controller(clock)
+    controller.update(12, 0)
+    clock.now = 100
+    # 低于进入阈值 10 但高于恢复阈值 10 * 0.5
+    assert controller.update(8, 0) == 'cheap'
+    assert controller.update(4, 0) == 'full'
+
+
+def _entry(number):
+    return {'repository': 'o/r', 'number': number}
+
+
+def test_digest_sends_when_due_or_full():
+    clock = FakeClock()
+    sent = []
+    digest = DigestBuffer(lambda url, entries, repository: sent.append((url, entries)) or True,
+                          interval=60, max_items=3, clock=clock)
+    digest.add('hook-a', _entry(1))
+    digest.add('hook-b', _entry(2))
+    assert digest.flush() == 0
+    clock.now = 61
+    digest.add('hook-a', _entry(3))
+    assert digest.flush() == 3
+    assert digest.size() == 0
+    for number in range(3):
+        digest.add('hook-a', _entry(number))
+    # 攒满 max_items 时立即发送
+    assert sent[-1] == ('hook-a', [_entry(0), _entry(1), _entry(2)])
+
+
+def test_failed_digest_is_requeued():
+    clock = FakeClock()
+    results = [False, True]
+    sent = []
+
+    def send(url, entries, repository):
+        sent.append(list(entries))
+        return results.pop(0)
+
+    digest = DigestBuffer(send, interval=60, max_items=30, clock=clock)
+    digest.add('hook', _entry(1))
+    assert digest.flush(force=True) == 0
+    assert digest.size() == 1
+    digest.add('hook', _entry(2))
+    # 失败后重新计时，未到期前不重试
+    clock.now = 30
+    assert digest.flush() == 0
+    clock.now = 61
+    assert digest.flush() == 2
+    assert sent == [[_entry(1)], [_entry(1), _entry(2)]]
+    assert digest.size() == 0
+
+
+def test_worker_flushes_digest_on_stop(tmp_path, monkeypatch):
+    sent_path, loop_path = tmp_path / 'sent.jsonl', tmp_path / 'loop'
+
+    def send(url, entries, repository):
+        with open(sent_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'url': url, 'entries': entries}) + '\n')
+        return True
+
+    class RecordingDigest(DigestBuffer):
+        def flush(self, webhook_url=None, force=False):
+            loop_path.touch()
+            return super().flush(webhook_url, force)
+
+    digest = RecordingDigest(send, interval=3600)
+    digest.add('hook', _entry(7))
+    monkeypatch.setattr(worker, 'DIGEST', digest)
+    job_queue = JobQueue(str(tmp_path / 'jobs.sqlite3'))
+    process = multiprocessing.get_context('fork').Process(
+        target=worker.run_worker, args=(job_queue.path, 'w-test', 30), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 10
+    while not loop_path.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    worker.stop_workers([process])
+    assert process.exitcode == 0
+    assert [json.loads(line) for line in sent_path.read_text(encoding='utf-8').splitlines()] == [
+        {'url': 'hook', 'entries': [_entry(7)]}]
@@ -0,0 +1,81 @@
+"""差异过滤测试"""
+
+from github_pr_mcp_server.diffs import (
+    DiffRules, GitAttributes, filter_diff, format_filtered_stats, path_matches, split_file_diffs,
+)
+
+
+def _file_diff(path, added='+x = 1', header=()):
+    return '\n'.join([f'diff --git a/{path} b/{path}', *header, f'--- a/{path}', f'+++ b/{path}',
+                      '@@ -1 +1 @@', '-x = 0', added])
+
+
+def _classify(path, rules=None, **kwargs):
+    return (rules or DiffRules()).classify(split_file_diffs(_file_diff(path, **kwargs))[0])
+
+
+def test_split_file_diffs_paths_and_status():
+    diff = '\n'.join([
+        'diff --git a/old name.py b/new name.py', 'similarity index 90%',
+        'rename from old name.py', 'rename to new name.py',
+        'diff --git a/img.png b/img.png', 'new file mode 100644', 'Binary files /dev/null and b/img.png differ',
+    ])
+    renamed, image = split_file_diffs(diff)
+    assert (renamed.old_path, renamed.path, renamed.status) == ('old name.py', 'new name.py', 'renamed')
+    assert image.binary and image.status == 'added'
+    assert split_file_diffs('not a diff') == []
+
+
+def test_path_matches():
+    assert path_matches('*.min.js', 'static/app.min.js')
+    assert path_matches('**/vendor/**', 'vendor/lib/a.go')
+    assert path_matches('**/vendor/**', 'src/vendor/lib/a.go')
+    assert path_matches('/docs/*.md', 'docs/a.md')
+    assert not path_matches('docs/*.md', 'docs/sub/a.md')
+
+
+def test_gitattributes_last_matching_rule_wins():
+    attributes = GitAttributes('# comment\n*.pb.go linguist-generated\napi/*.pb.go -linguist-generated\n'
+                               '*.dat binary !diff\n*.txt diff=markdown\n')
+    assert attributes.lookup('x.pb.go') == {'linguist-generated': True}
+    assert attributes.lookup('api/x.pb.go') == {'linguist-generated': False}
+    assert attributes.lookup('a.dat') == {'binary': True, 'diff': None}
+    assert attributes.lookup('a.txt') == {'diff': 'markdown'}
+
+
+def test_builtin_rules():
+    assert _classify('static/app.min.js') == 'generated'
+    assert _classify('proto/api_pb2.py') == 'generated'
+    assert _classify('web/node_modules/left-pad/index.js') == 'vendored'
+    assert _classify('src/app.py') == ''
+    assert _classify('img.png', header=('Binary files a/img.png and b/img.png differ',)) == 'binary'
+
+
+def test_gitattributes_marks_and_unmarks_files():
+    rules = DiffRules(gitattributes=GitAttributes(
+        'gen/** linguist-generated\nlib/** linguist-vendored=true\n*.min.js linguist-generated=false\n'
+        '*.bin binary\n*.enc -diff\n'))
+    assert _classify('gen/client.py', rules) == 'generated'
+    assert _classify('lib/dep.py', rules) == 'vendored'
+    assert _classify('static/app.min.js', rules) == ''
+    assert _classify('firmware.bin', rules) == 'binary'
+    assert _classify('secrets.enc', rules) == 'binary'
+
+
+def test_exclude_patterns_from_env_and_route(monkeypatch):
+    monkeypatch.setenv('MCP_DIFF_EXCLUDE', 'fixtures/**, *.golden')
+    rules = DiffRules.from_env(['*.csv'])
+    assert rules.exclude == ['fixtures/**', '*.golden', '*.csv']
+    assert _classify('fixtures/a.json', rules) == 'excluded'
+    assert _classify('tests/out.golden', rules) == 'excluded'
+    # 配置的排除规则优先于压缩器
+    assert _classify('data/table.csv', rules) == 'excluded'
+
+
+def test_filter_diff_keeps_stats_for_dropped_files():
+    diff = '\n'.join([_file_diff('src/app.py'), _file_diff('vendor/lib.go'), _file_diff('app.min.js')])
+    filtered, stats, _ = filter_diff(diff, DiffRules(), minify=False)
+    assert [file.path for file in split_file_diffs(filtered)] == ['src/app.py']
+    assert stats == ['- vendor/lib.go（第三方代码，+1 -1）', '- app.min.js（生成文件，+1 -1）']
+    assert format_filtered_stats(stats).startswith('已省略 2 个')
+    assert filter_diff('plain text', DiffRules()) == ('plain text', [], {})
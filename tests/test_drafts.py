@@ -0,0 +1,150 @@
+"""草稿卡片通知测试"""
+
+import json
+
+import pytest
+
+from github_pr_mcp_server import core, drafts
+from github_pr_mcp_server.drafts import DraftCard, FeishuApp
+
+PR_INFO = {'repository': 'o/r', 'number': '7', 'title': 'Add retry', 'user': 'u',
+           'html_url': 'https://github.com/o/r/pull/7'}
+
+PAYLOAD = {'action': 'opened', 'pull_request': {
+    'number': 7, 'title': 'Add retry', 'user': {'login': 'u'}, 'changed_files': 2, 'additions': 10,
+    'deletions': 3, 'head': {'ref': 'retry'}, 'base': {'ref': 'main'}, 'draft': True,
+}}
+
+
+class FakeApp:
+    """记录发送和更新的卡片；fail 为 True 时更新失败"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.configured = True
+        self.sent, self.updated = [], []
+
+    def send_card(self, chat_id, card):
+        self.sent.append((chat_id, card))
+        return 'om_1'
+
+    def update_card(self, message_id, card):
+        if self.fail:
+            raise RuntimeError('飞书 API 错误 230001')
+        self.updated.append((message_id, card))
+
+
+def _texts(card):
+    return [element['text']['content'] for element in card['elements'] if element['tag'] == 'div']
+
+
+def _note(card):
+    return card['elements'][-1]['elements'][0]['content']
+
+
+def test_overview_from_payload():
+    assert drafts.pr_overview(PAYLOAD).splitlines() == [
+        '**u** 提交了 PR #7：Add retry。共修改了 2 个文件，新增 10 行，删除 3 行。',
+        '分支：retry → main',
+        '状态：草稿 PR',
+    ]
+
+
+def test_summary_card_states():
+    final = drafts.summary_card(PR_INFO, 'overview', '## 变更摘要\n新增重试')
+    assert final['header']['template'] == 'green'
+    assert _texts(final) == ['overview', '**变更摘要**\n新增重试']
+    failed = drafts.summary_card(PR_INFO, 'overview', '❌ AI 分析失败')
+    assert failed['header']['template'] == 'red'
+    assert _note(failed).startswith('仅显示变更统计')
+    busy = drafts.summary_card(PR_INFO, 'overview', '')
+    assert (busy['header']['template'], _texts(busy)) == ('grey', ['overview'])
+    draft = drafts.draft_card(PR_INFO, 'overview')
+    assert draft['config']['update_multi'] is True
+    assert _note(draft) == '⏳ AI 分析中，完成后将更新此消息'
+
+
+def test_app_caches_access_token(monkeypatch):
+    calls = []
+
+    class Response:
+        def __init__(self, data):
+            self.data = data
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.data
+
+    def post(url, json=None, timeout=None):
+        calls.append(('token', url))
+        return Response({'code': 0, 'tenant_access_token': 't-1', 'expire': 7200})
+
+    def request(method, url, headers=None, timeout=None, **kwargs):
+        calls.append((method, url, headers['Authorization'], kwargs.get('json')))
+        return Response({'code': 0, 'data': {'message_id': 'om_1'}})
+
+    monkeypatch.setattr(drafts.requests, 'post', post)
+    monkeypatch.setattr(drafts.requests, 'request', request)
+    app = FeishuApp('id', 'secret', api_url='https://feishu.test')
+    assert app.send_card('oc_1', {'elements': []}) == 'om_1'
+    app.update_card('om_1', {'elements': []})
+
+    assert [call[0] for call in calls] == ['token', 'POST', 'PATCH']
+    assert calls[2][1] == 'https://feishu.test/open-apis/im/v1/messages/om_1'
+    assert calls[2][2] == 'Bearer t-1'
+    assert json.loads(calls[1][3]['content']) == {'elements': []}
+
+
+def test_post_draft_requires_configured_app(monkeypatch):
+    monkeypatch.setattr(drafts, 'APP', FeishuApp())
+    assert drafts.post_draft('oc_1', PR_INFO, 'overview') is None
+    app = FakeApp()
+    monkeypatch.setattr(drafts, 'APP', app)
+    assert drafts.post_draft('', PR_INFO, 'overview') is None
+    card = drafts.post_draft('oc_1', PR_INFO, 'overview')
+    assert card.message_id == 'om_1'
+    assert app.sent[0][0] == 'oc_1'
+
+
+def test_finish_updates_card_in_place(monkeypatch):
+    app = FakeApp()
+    monkeypatch.setattr(drafts, 'APP', app)
+    assert DraftCard('om_1', PR_INFO, 'overview').finish('摘要', 'o/r')
+    (message_id, card), = app.updated
+    assert message_id == 'om_1'
+    assert _texts(card) == ['overview', '摘要']
+
+    monkeypatch.setattr(drafts, 'APP', FakeApp(fail=True))
+    assert DraftCard('om_1', PR_INFO, 'overview').finish('摘要', 'o/r') is False
+
+
+@pytest.fixture
+def webhook_sends(monkeypatch):
+    """process_github_pr 使用固定摘要，记录退回的 Webhook 消息"""
+    sent = []
+    monkeypatch.setattr(core, 'summarize_changes', lambda *args, **kwargs: ('llm', '## 变更摘要\n新增重试'))
+    monkeypatch.setattr(core, 'send_summary_to_feishu',
+                        lambda message, url, repository='': sent.append((url, message)) or True)
+    return sent
+
+
+def test_process_pr_updates_draft_without_webhook(monkeypatch, webhook_sends):
+    app = FakeApp()
+    monkeypatch.setattr(drafts, 'APP', app)
+    result = core.process_github_pr('', PR_INFO, feishu_webhook_url='https://open.feishu.cn/hook',
+                                    draft=DraftCard('om_1', PR_INFO, 'overview'))
+    assert result['feishu_sent'] is True
+    assert len(app.updated) == 1
+    assert webhook_sends == []
+
+
+def test_process_pr_falls_back_to_webhook_when_update_fails(monkeypatch, webhook_sends):
+    monkeypatch.setattr(drafts, 'APP', FakeApp(fail=True))
+    result = core.process_github_pr('', PR_INFO, feishu_webhook_url='https://open.feishu.cn/hook',
+                                    draft=DraftCard('om_1', PR_INFO, 'overview'))
+    assert result['status'] == 'success'
+    assert result['feishu_sent'] is True
+    (url, _), = webhook_sends
+    assert url == 'https://open.feishu.cn/hook'
@@ -0,0 +1,109 @@
+"""SQLite 任务队列测试"""
+
+import time
+
+import pytest
+
+from github_pr_mcp_server.job_queue import JobQueue
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.sqlite3'), lease_seconds=30, max_attempts=2)
+
+
+def test_claim_and_complete(job_queue):
+    job_id = job_queue.enqueue('webhook', {'repository': 'o/r', 'n': 1})
+    job = job_queue.claim('w1')
+    assert job['id'] == job_id
+    assert job['status'] == 'leased'
+    assert job['attempts'] == 1
+    assert job['payload'] == {'repository': 'o/r', 'n': 1}
+    assert job_queue.claim('w2') is None
+
+    assert job_queue.complete(job_id, 'w1', {'status': 'success'})
+    assert job_queue.get(job_id)['status'] == 'done'
+    assert job_queue.get(job_id)['result'] == {'status': 'success'}
+
+
+def test_complete_requires_lease_owner(job_queue):
+    job_id = job_queue.enqueue('webhook', {})
+    job_queue.claim('w1')
+    assert not job_queue.complete(job_id, 'w2', {})
+
+
+def test_claims_lowest_priority_first(job_queue):
+    job_queue.enqueue('webhook', {'repository': 'o/a'}, priority=10)
+    urgent = job_queue.enqueue('webhook', {'repository': 'o/b'}, priority=1)
+    assert job_queue.claim('w1')['id'] == urgent
+
+
+def test_quota_skips_busy_repository(job_queue):
+    first = job_queue.enqueue('webhook', {'repository': 'o/a'}, priority=1)
+    job_queue.enqueue('webhook', {'repository': 'o/a'}, priority=1)
+    other = job_queue.enqueue('webhook', {'repository': 'o/b'}, priority=5)
+    assert job_queue.claim('w1', quota=lambda repository: 1)['id'] == first
+    assert job_queue.claim('w2', quota=lambda repository: 1)['id'] == other
+    assert job_queue.claim('w3', quota=lambda repository: 1) is None
+
+
+def test_retryable_failure_requeues_until_max_attempts(job_queue):
+    job_id = job_queue.enqueue('webhook', {})
+    job_queue.claim('w1')
+    assert job_queue.fail(job_id, 'w1', 'timeout')
+    assert job_queue.get(job_id)['status'] == 'pending'
+
+    job_queue.claim('w1')
+    job_queue.fail(job_id, 'w1', 'timeout')
+    job = job_queue.get(job_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'timeout'
+
+
+def test_non_retryable_failure_fails_immediately(job_queue):
+    job_id = job_queue.enqueue('webhook', {})
+    job_queue.claim('w1')
+    job_queue.fail(job_id, 'w1', '仓库未配置路由', retryable=False)
+    job = job_queue.get(job_id)
+    assert job['status'] == 'failed'
+    assert job['attempts'] == 1
+    assert job_queue.claim('w1') is None
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    job_queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), lease_seconds=0.05, max_attempts=2)
+    job_id = job_queue.enqueue('webhook', {})
+    job_queue.claim('w1')
+    time.sleep(0.1)
+
+    job = job_queue.claim('w2')
+    assert job['id'] == job_id
+    assert job['lease_owner'] == 'w2'
+    assert job['attempts'] == 2
+    # 原持有者的租约已失效
+    assert not job_queue.heartbeat(job_id, 'w1')
+
+
+def test_expired_lease_fails_after_max_attempts(tmp_path):
+    job_queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), lease_seconds=0.05, max_attempts=1)
+    job_id = job_queue.enqueue('webhook', {})
+    job_queue.claim('w1')
+    time.sleep(0.1)
+
+    assert job_queue.claim('w2') is None
+    assert job_queue.get(job_id)['status'] == 'failed'
+
+
+def test_deferred_jobs_wait_for_release(job_queue):
+    job_id = job_queue.enqueue('webhook', {}, deferred=True)
+    assert job_queue.claim('w1') is None
+    assert job_queue.release_deferred(5) == 1
+    assert job_queue.claim('w1')['id'] == job_id
+
+
+def test_metric_snapshots(job_queue):
+    job_queue.push_metrics('worker-0:1', {'mcp_events_total': [[['o/r', 'opened', 'success'], 1]]})
+    job_queue.push_metrics('worker-0:1', {'mcp_events_total': [[['o/r', 'opened', 'success'], 2]]})
+    assert job_queue.metric_snapshots() == [{'mcp_events_total': [[['o/r', 'opened', 'success'], 2]]}]
+    job_queue.clear_metric_snapshots()
+    assert job_queue.metric_snapshots() == []
@@ -0,0 +1,54 @@
+"""指标导出与快照合并测试"""
+
+from github_pr_mcp_server.metrics import Counter, Gauge, Histogram, Registry
+
+
+def _registry():
+    registry = Registry()
+    counter = Counter('test_events_total', '事件数', ['repository'], registry=registry)
+    histogram = Histogram('test_seconds', '耗时', ['repository'], buckets=(0.1, 1.0), registry=registry)
+    gauge = Gauge('test_level', '级别', registry=registry)
+    return registry, counter, histogram, gauge
+
+
+def test_exposes_counters_and_histograms():
+    registry, counter, histogram, _ = _registry()
+    counter.inc(repository='o/r')
+    counter.inc(2, repository='o/r')
+    histogram.observe(0.05, repository='o/r')
+    histogram.observe(0.5, repository='o/r')
+    text = registry.expose()
+
+    assert '# TYPE test_events_total counter' in text
+    assert 'test_events_total{repository="o/r"} 3' in text
+    assert 'test_seconds_bucket{repository="o/r",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{repository="o/r",le="+Inf"} 2' in text
+    assert 'test_seconds_count{repository="o/r"} 2' in text
+
+
+def test_merges_worker_snapshots():
+    worker, counter, histogram, gauge = _registry()
+    counter.inc(2, repository='o/r')
+    histogram.observe(0.5, repository='o/r')
+    gauge.set(2)
+    snapshot = worker.snapshot()
+
+    front, counter, histogram, gauge = _registry()
+    counter.inc(1, repository='o/r')
+    histogram.observe(0.05, repository='o/r')
+    gauge.set(1)
+    text = front.expose([snapshot, snapshot], [snapshot])
+
+    assert 'test_events_total{repository="o/r"} 5' in text
+    assert 'test_seconds_bucket{repository="o/r",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{repository="o/r",le="1.0"} 3' in text
+    assert 'test_seconds_count{repository="o/r"} 3' in text
+    assert 'test_level 2' in text
+
+
+def test_gauges_ignore_stale_snapshots():
+    worker, _, _, gauge = _registry()
+    gauge.set(3)
+    front, _, _, gauge = _registry()
+    gauge.set(0)
+    assert 'test_level 0' in front.expose([worker.snapshot()], [])
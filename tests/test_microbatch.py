@@ -0,0 +1,90 @@
+"""跨 PR 合批测试"""
+
+import threading
+import time
+
+from github_pr_mcp_server.microbatch import MicroBatcher
+
+
+def _batcher(runs, window=1.0, max_items=8):
+    def run(key, items):
+        runs.append([item['n'] for item in items])
+        return [f"summary {item['n']}" for item in items]
+    return MicroBatcher(run, window=window, max_items=max_items, enabled=True)
+
+
+def test_lone_submitter_does_not_wait():
+    runs = []
+    batcher = _batcher(runs, window=5.0)
+    start = time.monotonic()
+    with batcher.track():
+        assert batcher.submit('k', {'n': 1}) is None
+    assert time.monotonic() - start < 1.0
+    assert runs == []
+
+
+def test_batches_tracked_concurrent_submitters():
+    runs = []
+    batcher = _batcher(runs, window=5.0)
+    results = {}
+    registered = threading.Barrier(3)
+
+    def submit(n):
+        with batcher.track():
+            registered.wait()
+            time.sleep(0.05 * n)
+            results[n] = batcher.submit('k', {'n': n})
+
+    threads = [threading.Thread(target=submit, args=(n,)) for n in range(3)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 所有登记的调用方提交后立即执行，不等满窗口
+    assert time.monotonic() - start < 2.0
+    assert runs == [[0, 1, 2]]
+    assert results == {0: 'summary 0', 1: 'summary 1', 2: 'summary 2'}
+
+
+def test_leaving_caller_releases_leader():
+    runs = []
+    batcher = _batcher(runs, window=5.0)
+    registered = threading.Barrier(2)
+
+    def leave():
+        with batcher.track():
+            registered.wait()
+            time.sleep(0.1)
+
+    thread = threading.Thread(target=leave)
+    thread.start()
+    start = time.monotonic()
+    with batcher.track():
+        registered.wait()
+        assert batcher.submit('k', {'n': 1}) is None
+    thread.join()
+    assert time.monotonic() - start < 2.0
+
+
+def test_full_batch_runs_without_waiting():
+    runs = []
+    batcher = _batcher(runs, window=5.0, max_items=2)
+    results = {}
+    registered = threading.Barrier(3)
+
+    def submit(n):
+        with batcher.track():
+            registered.wait()
+            if n < 2:
+                results[n] = batcher.submit('k', {'n': n})
+            else:
+                time.sleep(0.5)
+
+    threads = [threading.Thread(target=submit, args=(n,)) for n in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(runs[0]) == [0, 1]
+    assert results == {0: 'summary 0', 1: 'summary 1'}
@@ -0,0 +1,46 @@
+"""差异精简（minify）测试"""
+
+from github_pr_mcp_server.diffs import split_file_diffs
+from github_pr_mcp_server.minify import indent_sensitive, minify_files, whitespace_only
+
+
+def test_indent_sensitive():
+    assert indent_sensitive('src/app.py')
+    assert indent_sensitive('deploy/values.yaml')
+    assert indent_sensitive('build/Makefile')
+    assert not indent_sensitive('src/app.js')
+
+
+def test_whitespace_only_ignores_indent_outside_sensitive_files():
+    assert whitespace_only('app.js', ['    return 1;'], ['  return 1;'])
+
+
+def test_whitespace_only_keeps_indent_in_python():
+    assert not whitespace_only('app.py', ['    stop()'], ['stop()'])
+    assert whitespace_only('app.py', ['    x = 1   '], ['    x = 1'])
+    assert whitespace_only('app.py', ['    x = (1,2)'], ['    x = (1, 2)'])
+
+
+def test_whitespace_only_requires_same_content():
+    assert not whitespace_only('app.js', ['return 1;'], ['return 2;'])
+
+
+def _minify(path, removed, added):
+    body = [f"-{line}" for line in removed] + [f"+{line}" for line in added]
+    diff = (f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n"
+            f"@@ -1,{len(removed)} +1,{len(added)} @@\n" + "\n".join(body) + "\n")
+    texts, stats = minify_files(split_file_diffs(diff))
+    return texts[0], stats
+
+
+def test_folds_whitespace_block_in_javascript():
+    _, stats = _minify('app.js', ['if (x) {', '    run();', '}'], ['if (x) {', '  run();', '}'])
+    assert stats['whitespace_blocks'] == 1
+
+
+def test_keeps_indentation_change_in_python():
+    # 回归：改变缩进的 Python 代码块曾被折叠为“仅空白变化”
+    text, stats = _minify('app.py', ['if ready:', '    start()', '    stop()'],
+                          ['if ready:', '    start()', 'stop()'])
+    assert stats['whitespace_blocks'] == 0
+    assert '+stop()' in text
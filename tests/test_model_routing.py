@@ -0,0 +1,63 @@
+"""模型选择测试"""
+
+from github_pr_mcp_server import model_routing
+from github_pr_mcp_server.model_routing import TIERS, TIER_MAX_TOKENS, TIER_MODELS, diff_features, plan_model
+
+
+def _diff(*paths, lines=1):
+    body = '\n'.join(f'+line {index}' for index in range(lines))
+    return '\n'.join(f'diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -0,0 +1,{lines} @@\n{body}'
+                     for path in paths)
+
+
+def test_default_models_increase_by_tier():
+    # 回归：standard 曾默认使用比 fast 档位更弱的模型
+    assert TIER_MODELS == {'fast': 'gpt-4o-mini', 'standard': 'gpt-4.1-mini', 'deep': 'gpt-4.1'}
+    assert [TIER_MAX_TOKENS[tier] for tier in TIERS] == sorted(TIER_MAX_TOKENS.values())
+
+
+def test_tier_by_size():
+    assert plan_model({'additions': 10, 'deletions': 5, 'changed_files': 2}).tier == 'fast'
+    assert plan_model({'additions': 300, 'deletions': 100, 'changed_files': 5}).tier == 'standard'
+    assert plan_model({'additions': 50, 'deletions': 0, 'changed_files': 20}).tier == 'standard'
+    assert plan_model({'additions': 1500, 'deletions': 600, 'changed_files': 5}).tier == 'deep'
+    assert plan_model({'additions': 10, 'deletions': 0, 'changed_files': 60}).tier == 'deep'
+
+
+def test_plan_carries_model_and_max_tokens():
+    plan = plan_model({'additions': 300, 'deletions': 0, 'changed_files': 3})
+    assert plan.to_dict() == {
+        'tier': 'standard', 'model': 'gpt-4.1-mini', 'max_tokens': 1000,
+        'strategy': 'single', 'reasons': ['规模中等（300 行，3 个文件）'],
+    }
+
+
+def test_size_falls_back_to_diff():
+    plan = plan_model(None, _diff('a.py', lines=5))
+    assert plan.tier == 'fast'
+    assert plan.reasons == ['规模小（5 行，1 个文件）']
+
+
+def test_risky_paths_escalate_one_tier():
+    plan = plan_model({'additions': 10, 'deletions': 0, 'changed_files': 1}, _diff('db/migrations/0001.py'))
+    assert plan.tier == 'standard'
+    assert plan.reasons[1] == '涉及敏感路径（db/migrations/0001.py）'
+    deep = plan_model({'additions': 3000, 'deletions': 0, 'changed_files': 1}, _diff('Dockerfile'))
+    assert deep.tier == 'deep'
+
+
+def test_multiple_languages_escalate():
+    features = diff_features(_diff('a.py', 'b.go', 'c.ts', 'README.md'))
+    assert features['languages'] == 3
+    assert plan_model(None, _diff('a.py', 'b.go', 'c.ts')).tier == 'standard'
+
+
+def test_large_prs_are_chunked():
+    assert plan_model({'additions': 700, 'deletions': 0, 'changed_files': 5}).strategy == 'chunked'
+    assert plan_model({'additions': 500, 'deletions': 0, 'changed_files': 5}).strategy == 'single'
+
+
+def test_routing_disabled_uses_standard(monkeypatch):
+    monkeypatch.setattr(model_routing, 'ROUTING_ENABLED', False)
+    plan = plan_model({'additions': 5000, 'deletions': 0, 'changed_files': 100})
+    assert (plan.tier, plan.strategy) == ('standard', 'single')
@@ -0,0 +1,98 @@
+"""在线诊断端点测试"""
+
+import json
+import threading
+
+import pytest
+
+from github_pr_mcp_server import profiling
+
+ADMIN = {'Authorization': 'Bearer secret'}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setenv('MCP_ADMIN_TOKEN', 'secret')
+    yield
+    profiling.MEMORY_TRACKER.stop()
+
+
+def test_endpoints_disabled_without_token(monkeypatch):
+    monkeypatch.delenv('MCP_ADMIN_TOKEN')
+    status, body, _ = profiling.profile_endpoint({}, ADMIN)
+    assert status == 403
+    assert profiling.memory_endpoint({}, ADMIN)[0] == 403
+
+
+def test_rejects_wrong_token():
+    assert profiling.check_admin_token({'X-Admin-Token': 'secret'}) == (200, '')
+    assert profiling.check_admin_token({'Authorization': 'Bearer wrong'})[0] == 401
+    assert profiling.check_admin_token({})[0] == 401
+
+
+def test_profile_collapsed_includes_busy_thread():
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(100))
+
+    thread = threading.Thread(target=busy_loop, name='busy')
+    thread.start()
+    try:
+        status, body, content_type = profiling.profile_endpoint({'seconds': '0.2', 'hz': '50'}, ADMIN)
+    finally:
+        stop.set()
+        thread.join()
+    assert status == 200
+    assert content_type.startswith('text/plain')
+    busy = [line for line in body.splitlines() if line.startswith('busy;')]
+    assert busy and any('busy_loop (test_profiling.py:' in line for line in busy)
+
+
+def test_speedscope_shares_frames_between_threads():
+    outer, inner = ('handle', 'server.py', 10), ('fetch', 'core.py', 20)
+    counts = {('main', (outer, inner)): 3, ('worker', (outer,)): 1}
+    document = profiling.to_speedscope(counts, hz=10)
+    assert document['shared']['frames'] == [
+        {'name': 'handle', 'file': 'server.py', 'line': 10},
+        {'name': 'fetch', 'file': 'core.py', 'line': 20},
+    ]
+    main, worker = document['profiles']
+    assert main['name'] == 'main'
+    assert main['samples'] == [[0, 1]]
+    assert main['endValue'] == pytest.approx(0.3)
+    assert worker['samples'] == [[0]]
+    assert profiling.to_collapsed(counts).splitlines()[0] == 'main;handle (server.py:10);fetch (core.py:20) 3'
+
+
+def test_profile_rejects_bad_parameters():
+    assert profiling.profile_endpoint({'seconds': 'x'}, ADMIN)[0] == 400
+    assert profiling.profile_endpoint({'seconds': '0.01', 'format': 'pprof'}, ADMIN)[0] == 400
+
+
+def test_concurrent_profile_is_rejected():
+    with profiling._profile_lock:
+        assert profiling.profile_endpoint({'seconds': '0.01'}, ADMIN)[0] == 409
+
+
+def test_memory_diff_reports_growth():
+    status, body, _ = profiling.memory_endpoint({}, ADMIN)
+    assert status == 200
+    assert json.loads(body)['status'] == 'started'
+
+    retained = [bytearray(1024) for _ in range(1000)]
+    status, body, _ = profiling.memory_endpoint({'top': '5'}, ADMIN)
+    result = json.loads(body)
+    assert status == 200
+    assert result['status'] == 'success'
+    assert len(result['top']) <= 5
+    assert any('test_profiling.py' in item['location'] and item['size_diff_kb'] > 500
+               for item in result['top'])
+    del retained
+
+    assert json.loads(profiling.memory_endpoint({'stop': '1'}, ADMIN)[1]) == {'status': 'stopped'}
+
+
+def test_memory_rejects_unknown_key():
+    assert profiling.memory_endpoint({'key': 'size'}, ADMIN)[0] == 400
@@ -0,0 +1,130 @@
+"""多仓库路由测试"""
+
+import json
+import os
+import threading
+
+import pytest
+
+from github_pr_mcp_server import routing
+from github_pr_mcp_server.routing import RepositoryLanes, Route, RoutingTable, current_routes
+
+
+@pytest.fixture
+def routes_file(tmp_path, monkeypatch):
+    """写入路由表并指向 MCP_ROUTES_PATH，返回写入函数"""
+    path = tmp_path / 'routes.json'
+    monkeypatch.setenv('MCP_ROUTES_PATH', str(path))
+    monkeypatch.setattr(routing, '_current', (None, None))
+    mtime = [1_000_000]
+
+    def write(config):
+        path.write_text(config if isinstance(config, str) else json.dumps(config), encoding='utf-8')
+        # 文件系统的修改时间精度有限，显式推进以触发重新加载
+        mtime[0] += 10
+        os.utime(path, (mtime[0], mtime[0]))
+
+    return write
+
+
+def test_exact_match_wins_over_patterns():
+    default = Route('*', openai_api_key='env-key')
+    table = RoutingTable.from_config({
+        'repositories': {
+            'org/*': {'concurrency': 2},
+            'org/monorepo': {'concurrency': 5, 'weight': 3},
+        },
+    }, default)
+    assert table.resolve('org/monorepo').concurrency == 5
+    assert table.resolve('org/other').pattern == 'org/*'
+    assert table.resolve('other/repo') is table.default
+    # 仓库路由沿用默认路由中未覆盖的字段
+    assert table.resolve('org/other').openai_api_key == 'env-key'
+    assert table.weight('org/monorepo') == 3
+
+
+def test_env_values_and_unknown_fields(monkeypatch):
+    monkeypatch.setenv('MONOREPO_TOKEN', 'secret')
+    table = RoutingTable.from_config({'repositories': {'org/repo': {'github_token': 'env:MONOREPO_TOKEN'}}},
+                                     Route('*'))
+    assert table.resolve('org/repo').github_token == 'secret'
+    with pytest.raises(ValueError):
+        RoutingTable.from_config({'repositories': {'org/repo': {'token': 'x'}}}, Route('*'))
+
+
+def test_null_default_rejects_unconfigured_repositories():
+    table = RoutingTable.from_config({'default': None, 'repositories': {'org/repo': {}}}, Route('*'))
+    assert table.resolve('org/other') is None
+    assert table.quota('org/other') == 0
+    assert table.quota('org/repo') == routing.DEFAULT_REPO_CONCURRENCY
+
+
+def test_reloads_after_file_changes(routes_file):
+    routes_file({'repositories': {'org/repo': {'concurrency': 2}}})
+    first = current_routes()
+    assert current_routes() is first
+    routes_file({'repositories': {'org/repo': {'concurrency': 3}}})
+    assert current_routes().quota('org/repo') == 3
+
+
+def test_malformed_reload_keeps_last_table(routes_file, capsys):
+    routes_file({'repositories': {'org/repo': {'concurrency': 2}}})
+    good = current_routes()
+    routes_file('{"repositories": {')
+    assert current_routes() is good
+    assert '路由表' in capsys.readouterr().out
+    # 同一份损坏的文件不重复加载
+    assert current_routes() is good
+    assert capsys.readouterr().out == ''
+    routes_file({'repositories': {'org/repo': {'concurrency': 4}}})
+    assert current_routes().quota('org/repo') == 4
+
+
+def test_malformed_initial_load_raises(routes_file):
+    routes_file('{')
+    with pytest.raises(ValueError):
+        current_routes()
+
+
+def test_lanes_are_keyed_by_route():
+    lanes = RepositoryLanes()
+    route = Route('org/*', concurrency=2)
+    for _ in range(3):
+        assert lanes.run(route, lambda x: x * 2, 21) == 42
+    assert len(lanes._lanes) == 1
+
+
+def test_changed_concurrency_replaces_and_shuts_down_lane():
+    lanes = RepositoryLanes()
+    lanes.run(Route('org/repo', concurrency=1), lambda: None)
+    _, old = lanes._lanes['org/repo']
+    lanes.run(Route('org/repo', concurrency=3), lambda: None)
+    concurrency, new = lanes._lanes['org/repo']
+    assert concurrency == 3 and new is not old
+    with pytest.raises(RuntimeError):
+        old.submit(lambda: None)
+
+
+def test_depth_counts_queued_tasks():
+    lanes = RepositoryLanes()
+    route = Route('org/repo', concurrency=1)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait()
+
+    threads = [threading.Thread(target=lanes.run, args=(route, blocking))]
+    threads[0].start()
+    started.wait()
+    threads.append(threading.Thread(target=lanes.run, args=(route, lambda: None)))
+    threads[1].start()
+    for _ in range(100):
+        if lanes.depth() == {'org/repo': 1}:
+            break
+        threading.Event().wait(0.01)
+    assert lanes.depth() == {'org/repo': 1}
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert lanes.depth() == {'org/repo': 0}
@@ -0,0 +1,39 @@
+"""任务调度优先级测试"""
+
+from github_pr_mcp_server.scheduling import (
+    SOURCE_BACKFILL,
+    priority_class,
+    pr_size_cost,
+    webhook_priority,
+)
+
+
+def _payload(action, additions=0, deletions=0, changed_files=0):
+    return {'action': action, 'pull_request': {
+        'additions': additions, 'deletions': deletions, 'changed_files': changed_files
+    }}
+
+
+def test_priority_class():
+    assert priority_class('opened') == 0
+    assert priority_class('ready_for_review') == 0
+    assert priority_class('synchronize') == 1
+    assert priority_class('opened', SOURCE_BACKFILL) == 2
+
+
+def test_pr_size_cost_grows_with_size():
+    assert pr_size_cost({}) == 0
+    assert pr_size_cost({'additions': 10}) < pr_size_cost({'additions': 1000})
+    assert pr_size_cost({'changed_files': 1}) == pr_size_cost({'additions': 20})
+
+
+def test_small_pr_before_large_pr():
+    assert webhook_priority(_payload('opened', 5)) < webhook_priority(_payload('opened', 5000, 100, 40))
+
+
+def test_class_dominates_size():
+    small_sync = _payload('synchronize', 1)
+    huge_open = _payload('opened', 50000, 50000, 300)
+    assert webhook_priority(huge_open) < webhook_priority(small_sync)
+    assert webhook_priority(_payload('opened', 1)) < webhook_priority(small_sync)
+    assert webhook_priority(small_sync) < webhook_priority(_payload('opened', 1), SOURCE_BACKFILL)
@@ -0,0 +1,141 @@
+"""变更符号提取测试"""
+
+import threading
+import time
+
+import pytest
+
+from github_pr_mcp_server import core, symbols
+from github_pr_mcp_server.diffs import split_file_diffs
+from github_pr_mcp_server.symbols import extract_changed_symbols, file_symbols, git_blob_sha, outline
+
+OLD = '''class Client:
+    def get(self):
+        return 1
+
+    def close(self):
+        pass
+'''
+
+NEW = '''class Client:
+    def get(self):
+        return 2
+
+    def retry(self):
+        pass
+'''
+
+
+def _sha(source):
+    return git_blob_sha(source.encode())
+
+
+def _modified_diff(path='app/api.py'):
+    return '\n'.join([
+        f'diff --git a/{path} b/{path}', f'index {_sha(OLD)[:7]}..{_sha(NEW)[:7]} 100644',
+        f'--- a/{path}', f'+++ b/{path}',
+        '@@ -2,5 +2,5 @@ class Client:', '     def get(self):', '-        return 1', '+        return 2',
+        ' ', '-    def close(self):', '+    def retry(self):', '         pass',
+    ])
+
+
+def test_git_blob_sha_matches_git():
+    # git hash-object 对空文件的结果
+    assert git_blob_sha(b'') == 'e69de29bb2d1d6434b8b29ae775ad8c2e48c5391'
+
+
+def test_python_outline_nests_methods():
+    names = [(symbol.kind, symbol.name, symbol.start, symbol.end) for symbol in outline('a.py', OLD)]
+    assert names == [('class', 'Client', 1, 6), ('method', 'Client.get', 2, 3), ('method', 'Client.close', 5, 6)]
+    assert outline('a.py', 'def (') is None
+    assert outline('a.txt', 'x') is None
+
+
+def test_declaration_outline_for_go_and_js():
+    go = outline('main.go', 'type Server struct {\n}\n\nfunc (s *Server) Start() {\n}\n\nfunc main() {\n}\n')
+    assert [symbol.name for symbol in go] == ['Server', 'Server.Start', 'main']
+    js = outline('app.ts', 'export class Api {\n  fetch(url) {\n    return get(url)\n  }\n}\n')
+    assert [(symbol.kind, symbol.name) for symbol in js] == [('class', 'Api'), ('method', 'Api.fetch')]
+
+
+def test_modified_file_compares_both_outlines():
+    file = split_file_diffs(_modified_diff())[0]
+    sources = {'old': OLD, 'new': NEW}
+    changes = file_symbols(file, lambda path, sha, side: outline(path, sources[side]))
+    assert changes == {'added': ['Client.retry'], 'modified': ['Client.get'], 'removed': ['Client.close']}
+
+
+def test_falls_back_to_guess_without_contents():
+    file = split_file_diffs(_modified_diff())[0]
+    changes = file_symbols(file, lambda path, sha, side: None)
+    assert changes == {'added': ['retry'], 'modified': ['Client'], 'removed': ['close']}
+
+
+def test_added_file_is_read_from_diff():
+    diff = '\n'.join(['diff --git a/b.py b/b.py', 'new file mode 100644', '--- /dev/null', '+++ b/b.py',
+                      '@@ -0,0 +1,2 @@', '+def run():', '+    pass'])
+    assert extract_changed_symbols(split_file_diffs(diff)) == ['- b.py: 新增 `run`']
+
+
+def test_fetches_are_bounded_and_concurrent(monkeypatch):
+    monkeypatch.setattr(symbols, 'FETCH_CONCURRENCY', 2)
+    monkeypatch.setattr(symbols, 'MAX_FETCHED_FILES', 3)
+    files = split_file_diffs('\n'.join(_modified_diff(f'm{index}.py') for index in range(5)))
+    lock = threading.Lock()
+    active, peak, loaded = [0], [0], []
+
+    def load(path, sha, side):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            loaded.append(path)
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return outline(path, OLD if side == 'old' else NEW)
+
+    lines = extract_changed_symbols(files, load)
+    assert peak[0] == 2
+    assert sorted(set(loaded)) == ['m0.py', 'm1.py', 'm2.py']
+    # 结果保持文件顺序；超出上限的文件按差异估计
+    assert [line.split(':')[0] for line in lines] == [f'- m{index}.py' for index in range(5)]
+    assert lines[0] == '- m0.py: 新增 `Client.retry`；修改 `Client.get`；删除 `Client.close`'
+    assert lines[4] == '- m4.py: 新增 `retry`；修改 `Client`；删除 `close`'
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+        self.content = text.encode()
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def github_files(monkeypatch):
+    """core 读取文件时按提交返回内容，记录请求"""
+    contents, requested = {}, []
+
+    def get(url, params=None, headers=None, timeout=None):
+        requested.append(params['ref'])
+        return _Response(contents[params['ref']])
+
+    monkeypatch.setattr(core.requests, 'get', get)
+    monkeypatch.setattr(core, 'OUTLINE_CACHE', symbols.OutlineCache())
+    return contents, requested
+
+
+def test_get_outline_checks_blob_sha(github_files):
+    contents, requested = github_files
+    contents.update({'base-tip': NEW, 'head': NEW})
+    # 基础分支上的文件已经变化，与差异中的 blob 不一致
+    assert core.get_outline('o/r', '', 'a.py', _sha(OLD)[:7], 'base-tip') is None
+    assert core.get_outline('o/r', '', 'a.py', _sha(OLD)[:7], 'base-tip') is None
+    assert requested == ['base-tip', 'base-tip']
+
+    found = core.get_outline('o/r', '', 'a.py', _sha(NEW)[:7], 'head')
+    assert [symbol.name for symbol in found] == ['Client', 'Client.get', 'Client.retry']
+    # 一致的内容按 blob SHA 缓存
+    assert core.get_outline('o/r', '', 'a.py', _sha(NEW)[:7], 'other') is found
+    assert requested == ['base-tip', 'base-tip', 'head']
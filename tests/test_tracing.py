@@ -0,0 +1,101 @@
+"""追踪 span 测试"""
+
+import json
+import logging
+
+import pytest
+
+from github_pr_mcp_server import tracing
+
+
+@pytest.fixture
+def exported(tmp_path):
+    """把 span 导出到临时文件，返回读取函数"""
+    path = tmp_path / 'spans.jsonl'
+
+    def read():
+        return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+    def use(fmt='jsonl'):
+        tracing.configure(tracing.SpanExporter(str(path), fmt=fmt))
+        return read
+
+    yield use
+    tracing.configure(None)
+
+
+def test_nested_spans_share_trace(exported):
+    read = exported()
+    with tracing.span('webhook', repository='o/r') as outer:
+        with tracing.span('diff_fetch') as inner:
+            assert tracing.current_trace_id() == outer.trace_id
+    assert tracing.current_span() is None
+
+    spans = {record['name']: record for record in read()}
+    assert spans['diff_fetch']['trace_id'] == outer.trace_id
+    assert spans['diff_fetch']['parent_id'] == outer.span_id
+    assert spans['webhook']['parent_id'] is None
+    assert spans['webhook']['attributes'] == {'repository': 'o/r'}
+    assert inner.span_id != outer.span_id
+
+
+def test_traceparent_continues_trace(exported):
+    read = exported()
+    with tracing.span('webhook') as outer:
+        parent = tracing.traceparent()
+    with tracing.span('job', parent=parent):
+        pass
+    job = read()[-1]
+    assert job['trace_id'] == outer.trace_id
+    assert job['parent_id'] == outer.span_id
+
+
+def test_error_is_recorded(exported):
+    read = exported()
+    with pytest.raises(ValueError):
+        with tracing.span('llm_call'):
+            raise ValueError('boom')
+    record = read()[-1]
+    assert record['status'] == 'error'
+    assert record['error'] == 'ValueError: boom'
+
+
+def test_otlp_format(exported):
+    read = exported('otlp')
+    with tracing.span('llm_call', tokens=3):
+        pass
+    span = read()[-1]['resourceSpans'][0]['scopeSpans'][0]['spans'][0]
+    assert span['name'] == 'llm_call'
+    assert span['attributes'] == [{'key': 'tokens', 'value': {'intValue': '3'}}]
+    assert span['status'] == {'code': 1}
+
+
+def test_run_in_context_keeps_span_across_steps():
+    def steps():
+        with tracing.span('stream'):
+            yield tracing.current_trace_id()
+            yield tracing.current_trace_id()
+
+    first, second = list(tracing.run_in_context(steps()))
+    assert first and first == second
+    assert tracing.current_span() is None
+
+
+def test_log_correlation_leaves_handlers_alone(caplog):
+    root = logging.getLogger()
+    handlers = [(handler, handler.formatter) for handler in root.handlers]
+    tracing.install_log_correlation()
+    tracing.install_log_correlation()
+    assert [(handler, handler.formatter) for handler in root.handlers] == handlers
+
+    logger = logging.getLogger('ai_summarizer')
+    assert sum(isinstance(f, tracing.TraceContextFilter) for f in logger.filters) == 1
+    with caplog.at_level(logging.INFO, logger='ai_summarizer'):
+        logger.info('outside')
+        with tracing.span('webhook') as current:
+            logger.info('inside')
+    outside, inside = caplog.records
+    assert outside.getMessage() == 'outside'
+    assert outside.trace_id == '-'
+    assert inside.getMessage() == f'inside [trace={current.trace_id}]'
+    assert inside.trace_id == current.trace_id
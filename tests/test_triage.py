@@ -0,0 +1,90 @@
+"""简单 PR 识别（triage）测试"""
+
+from github_pr_mcp_server.triage import classify_pr
+
+
+def _diff(path, removed, added):
+    """构造单文件单 hunk 的差异"""
+    body = [f"-{line}" for line in removed] + [f"+{line}" for line in added]
+    return (f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n"
+            f"@@ -1,{len(removed)} +1,{len(added)} @@\n" + "\n".join(body) + "\n")
+
+
+def _kind(diff_content):
+    triage = classify_pr(diff_content)
+    return triage.kind if triage else None
+
+
+def test_typo_in_comment():
+    assert _kind(_diff('app.py', ['# retrun the value'], ['# return the value'])) == 'typo'
+
+
+def test_string_literal_in_code_is_not_typo():
+    # 回归：字符串可能是比较用的值，"admin" → "admins" 曾被识别为拼写修正
+    assert _kind(_diff('app.py', ['return user.role == "admin"'], ['return user.role == "admins"'])) is None
+    assert _kind(_diff('app.js', ['log("recieved event")'], ['log("received event")'])) is None
+
+
+def test_changed_number_is_not_typo():
+    # 回归：timeout = 10 → 100 曾被识别为拼写修正
+    assert _kind(_diff('app.py', ['timeout = 10'], ['timeout = 100'])) is None
+
+
+def test_changed_identifier_is_not_typo():
+    assert _kind(_diff('app.py', ['result = fetch(url)'], ['result = fetch(uri)'])) is None
+
+
+def test_token_with_digits_is_not_typo():
+    assert _kind(_diff('app.py', ['# use sha1 here'], ['# use sha2 here'])) is None
+
+
+def test_camel_case_in_comment_is_not_typo():
+    assert _kind(_diff('app.js', ['// calls getUser first'], ['// calls getUsers first'])) is None
+
+
+def test_unknown_code_extension_is_not_typo():
+    assert _kind(_diff('query.xyz', ['selct value'], ['select value'])) is None
+
+
+def test_whitespace_change_in_javascript_is_formatting():
+    assert _kind(_diff('app.js', ['if (x) {  return 1; }'], ['if (x) { return 1; }'])) == 'formatting'
+
+
+def test_python_indentation_change_is_not_formatting():
+    # 回归：Python 缩进变化会改变语义，曾被识别为格式调整
+    removed = ['if ready:', '    start()', '    stop()']
+    added = ['if ready:', '    start()', 'stop()']
+    assert _kind(_diff('app.py', removed, added)) is None
+
+
+def test_yaml_indentation_change_is_not_formatting():
+    removed = ['jobs:', '  build:', '    runs-on: ubuntu-latest']
+    added = ['jobs:', '  build:', '  runs-on: ubuntu-latest']
+    assert _kind(_diff('ci.yml', removed, added)) is None
+
+
+def test_python_trailing_whitespace_is_formatting():
+    assert _kind(_diff('app.py', ['x = 1   '], ['x = 1'])) == 'formatting'
+
+
+def test_dependency_bump_in_manifests():
+    assert _kind(_diff('requirements.txt', ['requests==2.31.0'], ['requests==2.32.0'])) == 'dependency'
+    assert _kind(_diff('package.json', ['    "lodash": "^4.17.20",'], ['    "lodash": "^4.17.21",'])) == 'dependency'
+    assert _kind(_diff('setup.py', ["    'requests>=2.0',"], ["    'requests>=2.1',"])) == 'dependency'
+    assert _kind(_diff('.github/workflows/ci.yml', ['      - uses: actions/checkout@v3'],
+                       ['      - uses: actions/checkout@v4'])) == 'dependency'
+
+
+def test_version_bump():
+    assert _kind(_diff('pkg/__init__.py', ['__version__ = "1.2.0"'], ['__version__ = "1.3.0"'])) == 'version'
+    assert _kind(_diff('package.json', ['  "version": "1.2.0",'], ['  "version": "1.3.0",'])) == 'version'
+
+
+def test_constant_in_package_init_is_not_version():
+    # 回归：__init__.py 中的 RETRY_DELAY = 0.5 → 50.0 曾被识别为依赖升级
+    assert _kind(_diff('pkg/__init__.py', ['RETRY_DELAY = 0.5'], ['RETRY_DELAY = 50.0'])) is None
+
+
+def test_constant_in_manifest_is_not_dependency():
+    # 回归：setup.py 中的 TIMEOUT = 1.5 → 0.001 曾被识别为依赖升级
+    assert _kind(_diff('setup.py', ['TIMEOUT = 1.5'], ['TIMEOUT = 0.001'])) is None